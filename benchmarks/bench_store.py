@@ -0,0 +1,114 @@
+# -*- encoding: utf-8 -*-
+"""
+Compares `get_transaction_data` served by a `TransactionStore` with the
+query path, where every call goes through the http client.
+
+The query path is answered by a fake http client after `--latency`
+seconds, so the numbers show the client overhead plus the latency of the
+API; use `--live` with `BRASPAG_MERCHANT_ID`, `BRASPAG_MERCHANT_KEY` and
+`BRASPAG_TRANSACTION_ID` set to query the homologation API instead.
+
+    python -m benchmarks.bench_store --requests 2000 --latency 0.05
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from braspag_rest import BraspagRequest  # noqa
+from braspag_rest import TransactionStore  # noqa
+from braspag_rest.constants import PAYMENT_CONFIRMED  # noqa
+from tests.base import FakeHTTPClient  # noqa
+from tests.base import sale_payload  # noqa
+
+
+def create_client(args, store=None):
+    if args.live:
+        return BraspagRequest(
+            os.environ['BRASPAG_MERCHANT_ID'],
+            os.environ['BRASPAG_MERCHANT_KEY'],
+            homologation=True, store=store
+        )
+
+    def handle(request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        return 200, sale_payload(payment_id, PAYMENT_CONFIRMED), args.latency
+
+    client = BraspagRequest('merchant', 'key', store=store)
+    client.http_client = FakeHTTPClient(handle)
+    return client
+
+
+@gen.coroutine
+def run(client, transaction_ids, concurrency):
+    start = time.time()
+    results = yield client.get_transactions_data(
+        transaction_ids, max_concurrency=concurrency
+    )
+    elapsed = time.time() - start
+
+    errors = [r for r in results.values() if isinstance(r, Exception)]
+    if errors:
+        raise errors[0]
+    raise gen.Return(elapsed)
+
+
+def report(name, elapsed, requests):
+    print('{0:<8} {1:>10.0f} req/s {2:>10.1f} us/req'.format(
+        name, requests / elapsed, elapsed / requests * 1e6
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--live', action='store_true')
+    args = parser.parse_args()
+
+    if args.live:
+        transaction_ids = [os.environ['BRASPAG_TRANSACTION_ID']]
+        transaction_ids *= args.requests
+    else:
+        transaction_ids = [
+            str(uuid.uuid4()) for _ in range(args.requests)
+        ]
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = TransactionStore(os.path.join(directory, 'bench.db'))
+        loop = IOLoop.current()
+
+        query = create_client(args)
+        query.coalesce_requests = False
+        elapsed = loop.run_sync(
+            lambda: run(query, transaction_ids, args.concurrency)
+        )
+        report('query', elapsed, args.requests)
+
+        stored = create_client(args, store)
+        loop.run_sync(lambda: run(stored, transaction_ids, args.concurrency))
+        elapsed = loop.run_sync(
+            lambda: run(stored, transaction_ids, args.concurrency)
+        )
+        report('store', elapsed, args.requests)
+        store.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
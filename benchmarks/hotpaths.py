@@ -0,0 +1,135 @@
+# -*- encoding: utf-8 -*-
+"""
+Microbenchmarks of the client hot paths. Every entry of `BENCHMARKS` is a
+factory returning the callable to be measured, so setup is never timed.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+from braspag_rest.core import BraspagRequest
+from braspag_rest.core import BraspagResponse
+from braspag_rest.codec import get_codec
+from braspag_rest.utils import is_valid_guid
+from braspag_rest.stream import JSONArrayParser
+
+from . import payloads
+
+
+MERCHANT_ID = 'a0b1c2d3-e4f5-4a6b-8c7d-9e0f1a2b3c4d'
+MERCHANT_KEY = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789ABCD'
+
+
+def client():
+    # the stdlib codec, so baselines don't depend on what is installed
+    return BraspagRequest(MERCHANT_ID, MERCHANT_KEY, homologation=True,
+                          codec='json')
+
+
+def format_single_sale():
+    payment = payloads.sale()['Payment']
+    return lambda: BraspagResponse.format_transactions(payment)
+
+
+def format_many_payments():
+    payments = payloads.payments(50)
+    return lambda: BraspagResponse.format_transactions(payments)
+
+
+def format_many_records():
+    payments = payloads.payments(50)
+    return lambda: BraspagResponse.format_transactions(payments, records=True)
+
+
+def format_get_transaction_data():
+    sale = payloads.sale()
+    return lambda: BraspagResponse.format_get_transaction_data(sale)
+
+
+def format_errors():
+    braspag = client()
+    errors = payloads.error_body()
+    return lambda: braspag.format_errors(errors)
+
+
+def ensure_json_dict():
+    braspag = client()
+    sale = payloads.sale()
+    return lambda: braspag.ensure_json(sale)
+
+
+def ensure_json_text():
+    braspag = client()
+    body = json.dumps(payloads.sale())
+    return lambda: braspag.ensure_json(body)
+
+
+def headers():
+    braspag = client()
+    return lambda: braspag.headers(None)
+
+
+def get_request():
+    braspag = client()
+    url = braspag._get_resource_url(
+        '/v2/sales/{0}'.format(payloads.guids(1)[0]), query=True
+    )
+    return lambda: braspag._get_request(url, 'GET', None)
+
+
+def valid_guid():
+    guids = payloads.guids(10)
+    return lambda: [is_valid_guid(guid) for guid in guids]
+
+
+def decode_sale():
+    # the stdlib codec, so baselines don't depend on what is installed
+    codec = get_codec('json')
+    body = json.dumps(payloads.sale()).encode('utf-8')
+    return lambda: codec.loads(body)
+
+
+def search_page_body():
+    return json.dumps({'Payments': payloads.payments(50)}).encode('utf-8')
+
+
+def decode_search_page():
+    codec = get_codec('json')
+    body = search_page_body()
+    return lambda: BraspagResponse.format_transactions(
+        codec.loads(body)['Payments']
+    )
+
+
+def stream_search_page():
+    # the same page as `decode_search_page`, in 4KB chunks
+    body = search_page_body()
+    chunks = [body[i:i + 4096] for i in range(0, len(body), 4096)]
+
+    def format_payment(payment):
+        return BraspagResponse.format_transactions(payment)[0]
+
+    def stream():
+        parser = JSONArrayParser('Payments', callback=format_payment)
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close()
+    return stream
+
+
+BENCHMARKS = [
+    ('format_single_sale', format_single_sale),
+    ('format_many_payments', format_many_payments),
+    ('format_many_records', format_many_records),
+    ('format_get_transaction_data', format_get_transaction_data),
+    ('format_errors', format_errors),
+    ('ensure_json_dict', ensure_json_dict),
+    ('ensure_json_text', ensure_json_text),
+    ('headers', headers),
+    ('get_request', get_request),
+    ('valid_guid', valid_guid),
+    ('decode_sale', decode_sale),
+    ('decode_search_page', decode_search_page),
+    ('stream_search_page', stream_search_page),
+]
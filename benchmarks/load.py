@@ -0,0 +1,208 @@
+# -*- encoding: utf-8 -*-
+"""
+Drives `BraspagRequest.get_transaction_data` at a target request rate
+against the Braspag simulator and reports throughput, latency percentiles
+and memory growth.
+
+Requests are started on schedule whatever the latency, and latency is
+measured from the scheduled start, so a slow server can't hide behind a
+slower request rate.
+
+    python -m benchmarks.load --rate 500 --duration 60
+    python -m benchmarks.load --rate 200 --duration 3600 --report-every 60 \\
+        --latency lognormal:0.05:0.6:2 --error-rate 0.01 --timeout-rate 0.001
+
+Use `--port` to target a simulator already running in another process,
+`python -m braspag_rest.simulator`, so it doesn't share the cpu.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import gc
+import time
+import uuid
+import logging
+import argparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from braspag_rest.pool import ConnectionPool  # noqa
+from braspag_rest.retry import RetryPolicy  # noqa
+from braspag_rest.metrics import Histogram  # noqa
+from braspag_rest.simulator import BraspagSimulator  # noqa
+from braspag_rest.simulator import create_client  # noqa
+from braspag_rest.simulator import parse_latency  # noqa
+
+
+def max_rss():
+    """Peak resident memory of the process, in MB"""
+    if resource is None:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macos, kilobytes everywhere else
+    if sys.platform == 'darwin':
+        return rss / 1024.0 / 1024.0
+    return rss / 1024.0
+
+
+class LoadDriver(object):
+    def __init__(self, client, rate, duration, max_in_flight=1000,
+                 transaction_ids=1000):
+        self.client = client
+        self.rate = rate
+        self.duration = duration
+        self.max_in_flight = max_in_flight
+        self.transaction_ids = [
+            str(uuid.uuid4()) for _ in range(transaction_ids)
+        ]
+
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        self.latency = Histogram(max_samples=10000)
+        self.started = 0
+        self.finished = 0
+        self.skipped = 0
+        self.errors = {}
+        self.interval_start = time.time()
+
+    @gen.coroutine
+    def request(self, transaction_id, scheduled):
+        self.in_flight += 1
+        try:
+            response = yield self.client.get_transaction_data(
+                transaction_id=transaction_id
+            )
+            if not response.get('success'):
+                self._error('braspag')
+        except Exception as e:
+            self._error(type(e).__name__)
+        finally:
+            self.in_flight -= 1
+            self.finished += 1
+            self.latency.add(time.time() - scheduled)
+
+    def _error(self, name):
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, rss_start):
+        elapsed = time.time() - self.interval_start
+        snapshot = self.latency.snapshot()
+        print(
+            '{0:>8.0f} req/s  p50 {1:>7.1f}ms  p90 {2:>7.1f}ms  '
+            'p99 {3:>7.1f}ms  max {4:>7.1f}ms  in flight {5:>5}  '
+            'skipped {6:>5}  rss {7:>7.1f}MB (+{8:.1f})  errors {9}'.format(
+                self.finished / elapsed,
+                (snapshot.get('p50') or 0) * 1000,
+                (snapshot.get('p90') or 0) * 1000,
+                (snapshot.get('p99') or 0) * 1000,
+                (snapshot.get('max') or 0) * 1000,
+                self.in_flight, self.skipped, max_rss(),
+                max_rss() - rss_start, self.errors or '-'
+            )
+        )
+        sys.stdout.flush()
+
+    @gen.coroutine
+    def run(self, report_every):
+        gc.collect()
+        rss_start = max_rss()
+        start = time.time()
+        next_report = start + report_every
+        interval = 1.0 / self.rate
+        scheduled = start
+        index = 0
+
+        while scheduled < start + self.duration:
+            now = time.time()
+            if scheduled > now:
+                yield gen.sleep(scheduled - now)
+
+            if self.in_flight >= self.max_in_flight:
+                self.skipped += 1
+            else:
+                transaction_id = self.transaction_ids[
+                    index % len(self.transaction_ids)
+                ]
+                IOLoop.current().add_future(
+                    self.request(transaction_id, scheduled),
+                    lambda future: future.result()
+                )
+                self.started += 1
+            index += 1
+            scheduled += interval
+
+            if scheduled >= next_report:
+                self.report(rss_start)
+                self.reset()
+                next_report += report_every
+
+        while self.in_flight:
+            yield gen.sleep(0.05)
+        self.report(rss_start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test the client against the Braspag simulator'
+    )
+    parser.add_argument('--rate', type=float, default=100,
+                        help='requests started per second')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to run for')
+    parser.add_argument('--report-every', type=float, default=5)
+    parser.add_argument('--max-in-flight', type=int, default=1000)
+    parser.add_argument('--max-clients', type=int, default=100)
+    parser.add_argument('--request-timeout', type=float, default=2)
+    parser.add_argument('--retries', type=int, default=1,
+                        help='attempts per request, 1 for no retries')
+    parser.add_argument('--port', type=int, default=None,
+                        help='port of a running simulator')
+    parser.add_argument('--latency', default='lognormal:0.02:0.5:1')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--throttle', type=float, default=None)
+    args = parser.parse_args()
+
+    # errors are counted by the driver, don't log every one of them
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+    logging.getLogger('tornado.access').setLevel(logging.CRITICAL)
+
+    port = args.port
+    simulator = None
+    if port is None:
+        simulator = BraspagSimulator(
+            latency=parse_latency(args.latency), error_rate=args.error_rate,
+            timeout_rate=args.timeout_rate, throttle=args.throttle,
+            hang=args.request_timeout * 2
+        )
+        port = simulator.listen(0)
+
+    client = create_client(
+        port, request_timeout=args.request_timeout,
+        pool=ConnectionPool(max_clients=args.max_clients),
+        retry_policy=RetryPolicy(max_attempts=args.retries)
+    )
+    driver = LoadDriver(client, args.rate, args.duration, args.max_in_flight)
+    IOLoop.current().run_sync(lambda: driver.run(args.report_every))
+
+    if simulator is not None:
+        print('simulator responses: {0}'.format(
+            sorted(simulator.responses.items())
+        ))
+
+
+if __name__ == '__main__':
+    main()
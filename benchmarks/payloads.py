@@ -0,0 +1,99 @@
+# -*- encoding: utf-8 -*-
+"""
+Synthetic, but realistic, Braspag payloads for the benchmarks. Everything
+is generated from a seed, so every run measures the same data.
+"""
+
+from __future__ import absolute_import
+
+import random
+import uuid
+
+
+STATUSES = [0, 1, 2, 3, 10, 11, 12, 13, 20]
+PROVIDERS = ['Simulado', 'Cielo', 'Redecard', 'Getnet', 'Stone']
+BRANDS = ['Visa', 'Master', 'Amex', 'Elo', 'Hipercard']
+
+
+def payment_id(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+
+def payment(rnd, minimal=False):
+    """A `Payment` as returned by `/v2/sales/{id}`; `minimal` payments,
+    like the ones of a pending sale, lack most optional fields
+    """
+    data = {
+        'PaymentId': payment_id(rnd),
+        'Status': rnd.choice(STATUSES),
+        'Amount': rnd.randint(100, 500000),
+        'Provider': rnd.choice(PROVIDERS),
+        'Country': 'BRA',
+        'Type': 'CreditCard',
+        'Installments': rnd.randint(1, 12),
+        'ReceivedDate': '2015-06-{0:02d} {1:02d}:{2:02d}:{3:02d}'.format(
+            rnd.randint(1, 30), rnd.randint(0, 23), rnd.randint(0, 59),
+            rnd.randint(0, 59)
+        ),
+        'CreditCard': {
+            'CardNumber': '{0:06d}******{1:04d}'.format(
+                rnd.randint(0, 999999), rnd.randint(0, 9999)
+            ),
+            'Holder': 'Jose da Silva',
+            'ExpirationDate': '{0:02d}/20{1}'.format(
+                rnd.randint(1, 12), rnd.randint(16, 30)
+            ),
+            'Brand': rnd.choice(BRANDS),
+        },
+    }
+    if minimal:
+        return data
+
+    data.update({
+        'AcquirerTransactionId': str(rnd.randint(10 ** 12, 10 ** 13)),
+        'AuthorizationCode': str(rnd.randint(100000, 999999)),
+        'ProofOfSale': str(rnd.randint(10 ** 8, 10 ** 9)),
+        'VoidedAmount': 0,
+        'ReturnCode': '6',
+        'ReturnMessage': 'Operation Successful',
+        'Capture': rnd.random() < 0.5,
+        'Authenticate': False,
+        'ServiceTaxAmount': 0,
+        'Interest': 'ByMerchant',
+        'ReasonCode': 0,
+        'ReasonMessage': 'Successful',
+        'ProviderReturnCode': '6',
+        'ProviderReturnMessage': 'Operation Successful',
+    })
+    return data
+
+
+def sale(seed=42, minimal=False):
+    """A `/v2/sales/{id}` response with a single payment"""
+    rnd = random.Random(seed)
+    return {
+        'MerchantOrderId': str(rnd.randint(10 ** 9, 10 ** 10)),
+        'Customer': {'Name': 'Jose da Silva'},
+        'Payment': payment(rnd, minimal),
+    }
+
+
+def payments(count=50, seed=42):
+    """A list of payments, a quarter of them minimal, like a multi-payment
+    order or a page of a sales search
+    """
+    rnd = random.Random(seed)
+    return [payment(rnd, minimal=rnd.random() < 0.25) for _ in range(count)]
+
+
+def error_body(count=2):
+    """A Braspag 400 response body"""
+    return [
+        {'Code': 100 + i, 'Message': 'RequestId is required'}
+        for i in range(count)
+    ]
+
+
+def guids(count=100, seed=42):
+    rnd = random.Random(seed)
+    return [payment_id(rnd) for _ in range(count)]
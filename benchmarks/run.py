@@ -0,0 +1,173 @@
+# -*- encoding: utf-8 -*-
+"""
+Runs the hot path microbenchmarks and compares them with the baselines
+stored in `benchmarks/baselines.json`.
+
+Speed is stored relative to a pure python calibration loop run in the
+same process, so baselines recorded on one machine hold on another.
+Allocations are the peak bytes allocated by a single call, measured with
+`tracemalloc` (python 3 only).
+
+    python -m benchmarks.run               # compare, exit 1 on regressions
+    python -m benchmarks.run --save        # record new baselines
+    python -m benchmarks.run -k format     # only benchmarks matching
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from .hotpaths import BENCHMARKS
+
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+def calibration():
+    data = dict((str(i), i) for i in range(20))
+    return sorted(data.items(), key=lambda item: -item[1])
+
+
+def ops_per_second(func, repeat=5, min_time=0.1):
+    """Best of `repeat` runs, each one at least `min_time` seconds long"""
+    number = 1
+    while True:
+        start = time.time()
+        for _ in range(number):
+            func()
+        elapsed = time.time() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.time()
+        for _ in range(number):
+            func()
+        best = min(best, time.time() - start)
+    return number / best
+
+
+def peak_bytes(func):
+    if tracemalloc is None:
+        return None
+
+    func()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure(benchmarks, repeat):
+    measured = []
+    for name, factory in benchmarks:
+        func = factory()
+        measured.append((name, ops_per_second(func, repeat), peak_bytes(func)))
+
+    # calibrated after warming up, so the cpu runs at the same speed
+    reference = ops_per_second(calibration, repeat * 2)
+    results = {}
+    for name, ops, allocated in measured:
+        results[name] = {
+            'ops': round(ops, 1),
+            'relative': round(ops / reference, 4),
+            'peak_bytes': allocated,
+        }
+    return results
+
+
+def compare(name, result, baseline, threshold):
+    """Return the regressions of `result` over `baseline`"""
+    problems = []
+    if baseline is None:
+        return problems
+
+    if result['relative'] < baseline['relative'] * (1 - threshold):
+        problems.append('{0}: {1:.1%} slower'.format(
+            name, 1 - result['relative'] / baseline['relative']
+        ))
+
+    allocated, expected = result['peak_bytes'], baseline.get('peak_bytes')
+    # small absolute slack, as the interpreter allocates in chunks
+    if allocated is not None and expected is not None and \
+            allocated > expected * (1 + threshold) + 512:
+        problems.append('{0}: allocates {1} bytes per call, was {2}'.format(
+            name, allocated, expected
+        ))
+    return problems
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baselines:
+        return json.load(baselines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Client hot path microbenchmarks'
+    )
+    parser.add_argument('--save', action='store_true',
+                        help='record the results as the new baselines')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fraction a benchmark may regress by')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('-k', dest='pattern', default='',
+                        help='only run benchmarks with this in their name')
+    args = parser.parse_args(argv)
+
+    benchmarks = [b for b in BENCHMARKS if args.pattern in b[0]]
+    results = measure(benchmarks, args.repeat)
+    baselines = load_baselines(args.baselines)
+
+    print('{0:<30} {1:>12} {2:>10} {3:>10} {4:>12}'.format(
+        'benchmark', 'ops/sec', 'relative', 'baseline', 'peak bytes'
+    ))
+    problems = []
+    for name, _ in benchmarks:
+        result = results[name]
+        baseline = baselines.get(name)
+        print('{0:<30} {1:>12,.0f} {2:>10.4f} {3:>10} {4:>12}'.format(
+            name, result['ops'], result['relative'],
+            '-' if baseline is None else '{0:.4f}'.format(
+                baseline['relative']
+            ),
+            '-' if result['peak_bytes'] is None else result['peak_bytes']
+        ))
+        problems.extend(compare(name, result, baseline, args.threshold))
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baselines, 'w') as output:
+            json.dump(baselines, output, indent=2, sort_keys=True)
+            output.write('\n')
+        print('\nBaselines saved to {0}'.format(args.baselines))
+        return 0
+
+    if problems:
+        print('\nRegressions over {0:.0%}:'.format(args.threshold))
+        for problem in problems:
+            print('  ' + problem)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,54 @@
 # -*- encoding: utf-8 -*-
 
+import sys
+
+import tornado
+
 from .core import BraspagRequest
+from .cache import TransactionCache
+from .store import TransactionStore
+from .pool import ConnectionPool
+from .registry import MerchantRegistry
+from .poller import StatusPoller
+from .notifications import NotificationReceiver
+from .notifications import NotificationHandler
+from .bulk import BulkProcessor
+from .retry import RetryPolicy
+from .retry import RetryBudget
+from .circuitbreaker import CircuitBreaker
+from .hedging import HedgingPolicy
+from .deadline import Deadline
+from .ratelimit import RateLimiter
+from .logs import RequestLogger
+from .metrics import MetricsSink
+from .metrics import CallbackMetricsSink
+from .metrics import InMemoryMetricsSink
+
+__all__ = [
+    'BraspagRequest',
+    'TransactionCache',
+    'TransactionStore',
+    'ConnectionPool',
+    'MerchantRegistry',
+    'StatusPoller',
+    'NotificationReceiver',
+    'NotificationHandler',
+    'BulkProcessor',
+    'RetryPolicy',
+    'RetryBudget',
+    'CircuitBreaker',
+    'HedgingPolicy',
+    'Deadline',
+    'RateLimiter',
+    'RequestLogger',
+    'MetricsSink',
+    'CallbackMetricsSink',
+    'InMemoryMetricsSink',
+]
+
+# needs an IOLoop running on asyncio
+ASYNCIO = sys.version_info >= (3, 5) and tornado.version_info >= (5,)
 
-__all__ = ['BraspagRequest']
+if ASYNCIO:
+    from .aio import AsyncioBraspagRequest  # noqa
+    __all__.append('AsyncioBraspagRequest')
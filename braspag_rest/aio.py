@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+"""
+Native asyncio client, for Python 3.5+ and Tornado 5+, where the Tornado
+IOLoop runs on top of asyncio.
+"""
+
+import types
+import asyncio
+import functools
+
+import tornado
+
+from tornado import gen
+
+from .core import BraspagRequest
+
+
+if tornado.version_info < (5,):
+    # older IOLoops don't run on asyncio
+    raise ImportError('AsyncioBraspagRequest requires Tornado 5+')
+
+
+async def run_steps(steps):
+    """Run the generator of a `gen.coroutine` to completion, awaiting what
+    it yields. Futures are shielded, so cancelling the caller doesn't
+    cancel a future it shares, like a coalesced request, which is what
+    Tornado does.
+    """
+    if not isinstance(steps, types.GeneratorType):
+        # a `gen.coroutine` that never yields
+        return steps
+
+    value = error = None
+    while True:
+        try:
+            if error is None:
+                yielded = steps.send(value)
+            else:
+                yielded = steps.throw(error)
+        except StopIteration as e:
+            return e.value
+        except gen.Return as e:
+            return e.value
+
+        value = error = None
+        try:
+            if isinstance(yielded, (list, dict)):
+                value = await gen.multi(yielded)
+            elif asyncio.iscoroutine(yielded):
+                value = await yielded
+            elif yielded.done():
+                value = yielded.result()
+            else:
+                value = await asyncio.shield(yielded)
+        except (Exception, asyncio.CancelledError) as e:
+            error = e
+
+
+def native_coroutine(method):
+    """Return an `async def` version of the `gen.coroutine` `method`"""
+    steps = method.__wrapped__
+
+    @functools.wraps(steps)
+    async def wrapper(*args, **kwargs):
+        return await run_steps(steps(*args, **kwargs))
+    return wrapper
+
+
+def native_coroutines(cls):
+    """Replace every `gen.coroutine` method `cls` inherits by its
+    `native_coroutine` version
+    """
+    for name in dir(cls):
+        method = getattr(cls, name)
+        if getattr(method, '__tornado_coroutine__', False):
+            setattr(cls, name, native_coroutine(method))
+    return cls
+
+
+@native_coroutines
+class AsyncioBraspagRequest(BraspagRequest):
+    """
+    `BraspagRequest` with `async def` methods instead of `gen.coroutine`
+    ones, avoiding the generator trampoline on asyncio applications.
+
+    The methods are not a copy: each one runs the very generator of its
+    `BraspagRequest` counterpart, driven by `run_steps` with plain
+    `await`s instead of Tornado's `Runner`, so both clients share their
+    whole behavior, control flow included.
+    """
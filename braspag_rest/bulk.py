@@ -0,0 +1,263 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+import json
+import uuid
+import logging
+
+from collections import namedtuple
+
+import six
+
+from tornado import gen
+from tornado.httpclient import HTTPError
+
+from .ratelimit import BULK
+from .exceptions import CircuitBreakerOpenError
+from .exceptions import RateLimitExceededError
+
+
+log = logging.getLogger('braspag')
+
+CAPTURE = 'capture'
+VOID = 'void'
+REFUND = 'refund'
+
+ACTIONS = {
+    CAPTURE: 'capture_transaction',
+    VOID: 'void_transaction',
+    REFUND: 'refund_transaction',
+}
+
+# failures worth trying again on a later run
+TRANSIENT_ERRORS = (IOError, CircuitBreakerOpenError, RateLimitExceededError)
+TRANSIENT_CODES = (429, 599)
+
+# namespace of the request ids derived from the operations
+REQUEST_ID_NAMESPACE = uuid.UUID('6f1c1a8e-3f0b-4b8e-9d1a-5c2e7d4b9a10')
+
+
+def is_transient(error):
+    """Whether an operation that failed with `error` may succeed on a later
+    run: timeouts, server errors, throttling and connection failures
+    """
+    if isinstance(error, HTTPError):
+        return error.code in TRANSIENT_CODES or 500 <= error.code < 600
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class Operation(namedtuple('Operation',
+                           'action transaction_id amount request_id')):
+    """A capture, void or refund of a transaction, by `BulkProcessor`"""
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return self.request_id
+
+
+def operation(action, transaction_id, amount=None, request_id=None):
+    """Return an `Operation`. Without a `request_id`, one is derived from
+    the other fields, so the same operation always has the same request
+    id, on retries and on resumed runs alike.
+
+    A payment may be partially voided or refunded many times by the same
+    amount, which a derived id would take for a single operation, so
+    those require a `request_id` of their own.
+    """
+    if action not in ACTIONS:
+        raise ValueError('Unknown action: {0}'.format(action))
+    if request_id is None and amount is not None and action != CAPTURE:
+        raise ValueError(
+            'A partial {0} requires a request_id'.format(action)
+        )
+    if request_id is None:
+        request_id = six.text_type(uuid.uuid5(
+            REQUEST_ID_NAMESPACE,
+            '{0}:{1}:{2}'.format(action, transaction_id, amount)
+        ))
+    return Operation(action, transaction_id, amount, request_id)
+
+
+class Checkpoint(object):
+    """
+    Append-only journal of the finished operations of a bulk run, one json
+    line per operation, read back to resume a crashed run.
+    """
+
+    def __init__(self, path, sync_every=100):
+        self.path = path
+        self.sync_every = sync_every
+        self._file = None
+        self._unsynced = 0
+
+    def load(self):
+        """Return the outcomes recorded so far, by operation key"""
+        outcomes = {}
+        if not os.path.exists(self.path):
+            return outcomes
+
+        with open(self.path) as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line of a crashed run may be cut short
+                    continue
+                outcomes[entry['key']] = entry['outcome']
+        return outcomes
+
+    def _open(self):
+        self._file = open(self.path, 'a+')
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell():
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != '\n':
+                # end the line a crashed run left cut short
+                self._file.write('\n')
+
+    def record(self, key, outcome):
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps({'key': key, 'outcome': outcome}))
+        self._file.write('\n')
+        self._file.flush()
+
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class BulkProcessor(object):
+    """
+    Runs many captures, voids and refunds, keeping at most
+    `max_concurrency` requests in flight. Operations are read lazily from
+    the iterable given to `run`, so it can be a generator over tens of
+    thousands of them.
+
+    Every operation is sent with its own stable `RequestId`, see
+    `operation`, so the client `RetryPolicy` retries them safely.
+
+    With `checkpoint`, a file path, finished operations are journaled
+    there and skipped when the run is repeated, their recorded outcome
+    returned instead. Operations that failed for transient reasons, like
+    timeouts, 5xx or 429 responses, are not journaled, so the next run tries
+    them again.
+
+    Outcomes are formatted responses: `BraspagResponse` ones for successes,
+    `format_errors` ones for failures, with `retryable` set on the
+    transient ones. A failing operation never stops the others.
+    """
+
+    def __init__(self, client, max_concurrency=10, checkpoint=None,
+                 sync_every=100):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.checkpoint = None
+        if checkpoint is not None:
+            self.checkpoint = Checkpoint(checkpoint, sync_every)
+
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def _format_exception(self, error, retryable):
+        code = getattr(error, 'code', None)
+        outcome = self.client.format_errors([
+            {'Code': code, 'Message': str(error) or repr(error)}
+        ])
+        if retryable:
+            outcome['retryable'] = True
+        return outcome
+
+    @gen.coroutine
+    def _run_operation(self, op, **kwargs):
+        method = getattr(self.client, ACTIONS[op.action])
+        try:
+            outcome = yield method(
+                transaction_id=op.transaction_id, amount=op.amount,
+                request_id=op.request_id, **kwargs
+            )
+        except Exception as e:
+            if is_transient(e):
+                log.info('Bulk %s of %s failed: %r',
+                         op.action, op.transaction_id, e)
+                raise gen.Return(self._format_exception(e, retryable=True))
+            if isinstance(e, HTTPError):
+                # e.g. a 404 for an unknown transaction
+                log.warning('Bulk %s of %s failed: %r',
+                            op.action, op.transaction_id, e)
+            else:
+                # e.g. an invalid transaction id or an undecodable response
+                log.exception('Bulk %s of %s failed',
+                              op.action, op.transaction_id)
+            # failing the same way on every run
+            raise gen.Return(self._format_exception(e, retryable=False))
+        raise gen.Return(outcome)
+
+    def _finish(self, op, outcome, callback):
+        if outcome.get('success'):
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+        if self.checkpoint is not None and not outcome.get('retryable'):
+            self.checkpoint.record(op.key, outcome)
+        if callback is not None:
+            callback(op, outcome)
+
+    @gen.coroutine
+    def run(self, operations, callback=None, **kwargs):
+        """Run every operation, resolving to a dict mapping operation keys
+        (request ids) to outcomes. `callback(operation, outcome)` is called
+        as each one finishes. Other keyword arguments, like `deadline`, are
+        given to every request.
+        """
+        done = {}
+        if self.checkpoint is not None:
+            done = self.checkpoint.load()
+
+        # a deadline covers the whole run
+        kwargs = self.client._with_deadline(kwargs)
+        kwargs.setdefault('priority', BULK)
+        results = {}
+        pending = iter(operations)
+
+        @gen.coroutine
+        def worker():
+            for op in pending:
+                if op.key in done:
+                    self.skipped += 1
+                    results[op.key] = done[op.key]
+                    continue
+
+                outcome = yield self._run_operation(op, **kwargs)
+                results[op.key] = outcome
+                self._finish(op, outcome, callback)
+
+        try:
+            yield [worker() for _ in range(self.max_concurrency)]
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+        raise gen.Return(results)
+
+    def stats(self):
+        return {
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,100 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import time
+
+from collections import OrderedDict
+
+from .constants import TERMINAL_STATUSES
+
+
+class TransactionCache(object):
+    """
+    In-process LRU cache for `get_transaction_data` responses.
+
+    How long a response is kept depends on the status of its transaction:
+    payments on a terminal status (captured, voided, denied...) are kept for
+    `terminal_ttl` seconds, any other for `pending_ttl` seconds. A ttl of
+    `0` disables caching for that status. `ttls` maps status codes to
+    custom ttls and takes precedence over both.
+
+    Cached responses are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_size=1024, terminal_ttl=3600, pending_ttl=0,
+                 ttls=None, clock=time.time):
+        self.max_size = max_size
+        self.terminal_ttl = terminal_ttl
+        self.pending_ttl = pending_ttl
+        self.ttls = ttls or {}
+        self.clock = clock
+
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl(self, status):
+        """Return for how many seconds a transaction on `status` is cached"""
+        if status in self.ttls:
+            return self.ttls[status]
+        if status in TERMINAL_STATUSES:
+            return self.terminal_ttl
+        return self.pending_ttl
+
+    def get(self, key):
+        """Return the cached response for `key` or None"""
+        try:
+            expires_at, response = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if expires_at <= self.clock():
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        # re-insert to mark it as the most recently used
+        self._entries[key] = (expires_at, response)
+        self.hits += 1
+        return response
+
+    def set(self, key, response):
+        """Cache a formatted `get_transaction_data` response.
+        Failed responses are never cached.
+        """
+        if not response.get('success'):
+            return
+
+        ttl = self.ttl(response['transaction'].get('status'))
+        if not ttl:
+            return
+
+        self._entries.pop(key, None)
+        self._entries[key] = (self.clock() + ttl, response)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
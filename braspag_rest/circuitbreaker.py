@@ -0,0 +1,150 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import time
+import socket
+
+from collections import deque
+
+from tornado.httpclient import HTTPError
+
+from .exceptions import CircuitBreakerOpenError
+from .exceptions import DeadlineExceededError
+from .exceptions import RateLimitExceededError
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# raised before the request is sent, telling nothing about the endpoint
+NOT_SENT_ERRORS = (DeadlineExceededError, RateLimitExceededError)
+
+
+def is_failure(error):
+    """Whether `error` means the endpoint is unhealthy. Client errors, like
+    a 400 for an invalid request, and calls out of time, do not count.
+    """
+    if isinstance(error, DeadlineExceededError):
+        return False
+    if isinstance(error, HTTPError):
+        return error.code >= 500
+    return isinstance(error, socket.error)
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker for a single endpoint.
+
+    Calls are tracked over the last `window` seconds. Once there are at
+    least `min_requests` of them and the share of failed calls reaches
+    `failure_rate`, or the share of calls slower than `slow_call_duration`
+    seconds reaches `slow_call_rate`, the circuit opens and every call
+    fails fast with `CircuitBreakerOpenError`.
+
+    After `reset_timeout` seconds the circuit becomes half open and lets
+    `half_open_requests` probes through: it closes again if they succeed
+    and re-opens on the first failure.
+    """
+
+    def __init__(self, name=None, failure_rate=0.5, min_requests=20,
+                 window=30, slow_call_duration=None, slow_call_rate=0.5,
+                 reset_timeout=30, half_open_requests=1, clock=time.time):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+        self.clock = clock
+
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        # (timestamp, failed, slow) for every call in the window
+        self._calls = deque()
+
+    @property
+    def state(self):
+        if self._state == OPEN and \
+                self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        return self._state
+
+    def before_request(self):
+        """Raise `CircuitBreakerOpenError` if the call is not allowed"""
+        state = self.state
+        if state == CLOSED:
+            return
+
+        if state == HALF_OPEN and self._probes < self.half_open_requests:
+            self._probes += 1
+            return
+
+        retry_after = 0
+        if state == OPEN:
+            retry_after = self._opened_at + self.reset_timeout - self.clock()
+        raise CircuitBreakerOpenError(self.name, retry_after)
+
+    def record(self, duration, error=None):
+        """Record the outcome of a call allowed by `before_request`"""
+        if isinstance(error, NOT_SENT_ERRORS):
+            # the endpoint was never contacted, give the probe slot back
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+            return
+
+        failed = error is not None and is_failure(error)
+        slow = self.slow_call_duration is not None and \
+            duration >= self.slow_call_duration
+
+        if self._state == HALF_OPEN:
+            if failed or slow:
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_requests:
+                    self._close()
+            return
+
+        now = self.clock()
+        self._calls.append((now, failed, slow))
+        while self._calls and self._calls[0][0] <= now - self.window:
+            self._calls.popleft()
+
+        if self._state == CLOSED and self._should_open():
+            self._open()
+
+    def _should_open(self):
+        total = len(self._calls)
+        if total < self.min_requests:
+            return False
+
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, slow in self._calls if slow)
+        return failures >= self.failure_rate * total or \
+            slow >= self.slow_call_rate * total
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._calls.clear()
+
+    def _close(self):
+        self._state = CLOSED
+        self._opened_at = None
+        self._calls.clear()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'calls': len(self._calls),
+            'failures': sum(1 for _, failed, _ in self._calls if failed),
+            'slow_calls': sum(1 for _, _, slow in self._calls if slow),
+        }
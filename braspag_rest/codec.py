@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import sys
+import json
+
+import six
+
+
+# json.loads only accepts bytes on python 2 and python >= 3.6
+_STDLIB_LOADS_BYTES = six.PY2 or sys.version_info >= (3, 6)
+
+
+class JSONCodec(object):
+    """
+    Encodes request bodies and decodes response bodies.
+
+    `dumps` returns `str` or `bytes`, whatever is cheaper for the backend,
+    since both can be used as the body of an `HTTPRequest`. `loads` accepts
+    the raw `bytes` of a response body.
+    """
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        if not _STDLIB_LOADS_BYTES and isinstance(data, six.binary_type):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class UjsonCodec(JSONCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.dumps = ujson.dumps
+        self.loads = ujson.loads
+
+
+# in order of preference
+CODECS = [OrjsonCodec, UjsonCodec, JSONCodec]
+
+
+# codecs are stateless, so a single instance of each is shared
+_codecs = {}
+
+
+def get_codec(name=None):
+    """Return the codec called `name` ('orjson', 'ujson' or 'json'), or the
+    fastest one installed when no name is given.
+    """
+    if name in _codecs:
+        return _codecs[name]
+
+    _codecs[name] = _create_codec(name)
+    return _codecs[name]
+
+
+def _create_codec(name):
+    for codec_class in CODECS:
+        if name is not None and codec_class.name != name:
+            continue
+        try:
+            return codec_class()
+        except ImportError:
+            if name is not None:
+                raise
+
+    raise ValueError('Unknown json codec: {0}'.format(name))
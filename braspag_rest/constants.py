@@ -0,0 +1,17 @@
+# -*- encoding: utf-8 -*-
+
+# Payment status codes, as returned on the `Status` field of a payment
+NOT_FINISHED = 0
+AUTHORIZED = 1
+PAYMENT_CONFIRMED = 2
+DENIED = 3
+VOIDED = 10
+REFUNDED = 11
+PENDING = 12
+ABORTED = 13
+SCHEDULED = 20
+
+# A payment on one of these statuses will not change anymore
+TERMINAL_STATUSES = frozenset([
+    PAYMENT_CONFIRMED, DENIED, VOIDED, REFUNDED, ABORTED
+])
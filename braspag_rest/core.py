@@ -2,58 +2,160 @@
 
 from __future__ import absolute_import
 
-import json
+import time
 import uuid
 import logging
 
+from datetime import timedelta
+
 import six
 
 try:
     import urlparse
+    from urllib import urlencode
 except ImportError:
     from urllib.parse import urlparse, urljoin
-
-from datetime import datetime
-
+    from urllib.parse import urlencode
+
+from .metrics import ERRORS
+from .metrics import RETRIES
+from .metrics import TIMEOUTS
+from .metrics import RESPONSES
+from .metrics import DECODE_TIME
+from .metrics import FORMAT_TIME
+from .metrics import REQUEST_TIME
+from .metrics import TIME_INFO_PREFIX
+from .logs import RequestLogger
+from .codec import get_codec
+from .ratelimit import BULK
+from .ratelimit import INTERACTIVE
+from .deadline import Deadline
 from .utils import is_valid_guid
+from .records import SaleResult
+from .records import format_transaction_record
+from .formatters import format_transaction
+from .formatters import format_update
+from .circuitbreaker import CircuitBreaker
+from .search import SalesCursor
+from .search import format_date
+from .stream import JSONArrayParser
+from .stream import StreamedResponse
+from .stream import restore_error_body
 from .exceptions import BraspagException
 from .exceptions import HTTPTimeoutError
+from .exceptions import DeadlineExceededError
 
 from tornado.httpclient import HTTPRequest
 from tornado.httpclient import HTTPError
 from tornado import httpclient
 from tornado import gen
+from tornado.locks import Semaphore
+
+
+log = logging.getLogger('braspag')
+default_request_logger = RequestLogger(log)
+
+BODY_METHODS = frozenset(['POST', 'PUT', 'PATCH'])
 
 
 class BaseRequest(object):
     def __init__(self, merchant_id=None, merchant_key=None, homologation=False,
-                 request_timeout=10):
-        self.merchant_id = merchant_id
-        self.merchant_key = merchant_key
-
-        self.log = logging.getLogger('braspag')
-        self.http_client = httpclient.AsyncHTTPClient()
+                 request_timeout=10, connect_timeout=None, pool=None,
+                 retry_policy=None, codec=None, request_logger=None,
+                 metrics=None, hedging_policy=None, rate_limiter=None,
+                 max_concurrency=None, compress=True):
+        self._merchant_id = merchant_id
+        self._merchant_key = merchant_key
+        # ask for gzipped responses, decompressed as they arrive
+        self._compress = compress
+        self._build_static_headers()
+
+        self.log = log
+        # logs every request and its outcome, see `RequestLogger`
+        self.request_logger = request_logger or default_request_logger
+        # optional `MetricsSink` receiving timings and counters
+        self.metrics = metrics
+
+        # a `ConnectionPool` may be shared by many clients, otherwise the
+        # default AsyncHTTPClient of the IOLoop is used
+        self.pool = pool
+        if pool is not None:
+            self.http_client = pool
+        else:
+            self.http_client = httpclient.AsyncHTTPClient()
 
-        # timeout
+        # timeouts
         self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+
+        # optional `RetryPolicy`, failed requests are not retried without one
+        self.retry_policy = retry_policy
+        # optional `HedgingPolicy` for the GETs on the query endpoint
+        self.hedging_policy = hedging_policy
+        # optional `RateLimiter`, usually shared by many clients
+        self.rate_limiter = rate_limiter
+        # caps the requests this client has in flight, e.g. so a merchant
+        # can't take every connection of a shared `ConnectionPool`
+        self.max_concurrency = max_concurrency
+        self._concurrency = None
+        if max_concurrency:
+            self._concurrency = Semaphore(max_concurrency)
+
+        # a `JSONCodec` or the name of one, defaults to the fastest installed
+        if codec is None or isinstance(codec, six.string_types):
+            codec = get_codec(codec)
+        self.codec = codec
+
+    @property
+    def merchant_id(self):
+        return self._merchant_id
+
+    @merchant_id.setter
+    def merchant_id(self, merchant_id):
+        self._merchant_id = merchant_id
+        self._build_static_headers()
+
+    @property
+    def merchant_key(self):
+        return self._merchant_key
+
+    @merchant_key.setter
+    def merchant_key(self, merchant_key):
+        self._merchant_key = merchant_key
+        self._build_static_headers()
+
+    @property
+    def compress(self):
+        return self._compress
+
+    @compress.setter
+    def compress(self, compress):
+        self._compress = compress
+        self._build_static_headers()
+
+    def _build_static_headers(self):
+        self._static_headers = {
+            "Content-Type": "application/json",
+            "MerchantId": self._merchant_id,
+            "MerchantKey": self._merchant_key,
+        }
+        if self._compress:
+            self._static_headers["Accept-Encoding"] = "gzip"
 
     def headers(self, request_id):
         """default headers to be sent on http requests"""
-        return {
-            "Content-Type": "application/json",
-            "MerchantId": self.merchant_id,
-            "MerchantKey": self.merchant_key,
-            "RequestId": request_id or unicode(uuid.uuid4())
-        }
+        headers = self._static_headers.copy()
+        headers["RequestId"] = request_id or six.text_type(uuid.uuid4())
+        return headers
 
     def ensure_json(self, payload):
         if not payload:
             return None
 
-        if isinstance(payload, str):
+        if isinstance(payload, (six.text_type, six.binary_type)):
             return payload
 
-        return json.dumps(payload)
+        return self.codec.dumps(payload)
 
     def _get_url(self, url, resource):
         """
@@ -64,20 +166,39 @@ class BaseRequest(object):
         else:
             return urljoin(url, resource)
 
-    def _get_request(self, url, method, payload, **kwargs):
+    def _get_request(self, url, method, payload, parser=None, **kwargs):
         """Return an instance of HTTPRequest with optionally custom headers.
         The body is automatically encoded to json if it's not already.
+        With a `deadline` the timeouts never go past it. With a `parser`,
+        a `JSONArrayParser`, the response body is streamed to it.
         """
         headers = kwargs.get('headers') or self.headers(
             kwargs.get('request_id')
         )
 
+        request_timeout = self.request_timeout
+        connect_timeout = self.connect_timeout
+        deadline = kwargs.get('deadline')
+        if deadline is not None:
+            # tornado takes a timeout of 0 as no timeout at all
+            remaining = max(deadline.remaining(), 0.001)
+            request_timeout = min(request_timeout, remaining)
+            connect_timeout = min(connect_timeout or remaining, remaining)
+
+        body = self.ensure_json(payload)
+        if body is None and method in BODY_METHODS:
+            # tornado refuses these without a body
+            body = ''
+
         return HTTPRequest(
             url=url,
             method=method,
-            body=self.ensure_json(payload),
-            request_timeout=self.request_timeout,
-            headers=headers
+            body=body,
+            request_timeout=request_timeout,
+            connect_timeout=connect_timeout,
+            headers=headers,
+            decompress_response=self.compress,
+            streaming_callback=parser.feed if parser is not None else None
         )
 
     def format_errors(self, errors):
@@ -91,29 +212,298 @@ class BaseRequest(object):
             'errors': errors
         }
 
+    def _translate_http_error(self, error):
+        """Return the exception `fetch` raises for an `HTTPError`"""
+        if error.code == 599:
+            return HTTPTimeoutError(error.code, error.message)
+        if error.code == 400:
+            return BraspagException(error.response)
+        return error
+
+    def _retry_delay(self, error, attempt, method, url, **kwargs):
+        """Return how many seconds to wait before retrying a request that
+        failed with `error` on its `attempt`-th try, or None when it must
+        not be retried.
+        """
+        retry_policy = self.retry_policy
+        if retry_policy is None:
+            return None
+
+        # a retry the deadline leaves no time for spends no budget
+        delay = retry_policy.delay(attempt + 1)
+        deadline = kwargs.get('deadline')
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+
+        if not retry_policy.should_retry(error, attempt, method, **kwargs):
+            return None
+
+        if self.metrics is not None:
+            self.metrics.increment(
+                RETRIES, endpoint=self._get_endpoint(**kwargs),
+                method=method
+            )
+        self.log.info('Retrying %s %s in %.3fs (attempt %d): %r',
+                      method, url, delay, attempt + 1, error)
+        return delay
+
+    def _get_endpoint(self, **kwargs):
+        return 'query' if kwargs.get('query') else 'transaction'
+
+    def _record_request(self, request, duration, response=None, error=None,
+                        **kwargs):
+        tags = {
+            'endpoint': self._get_endpoint(**kwargs),
+            'method': request.method
+        }
+        self.metrics.timing(REQUEST_TIME, duration, **tags)
+
+        code = getattr(error, 'code', None)
+        if error is not None:
+            response = getattr(error, 'response', None)
+        else:
+            code = response.code
+
+        if code == 599:
+            self.metrics.increment(TIMEOUTS, **tags)
+        elif code:
+            self.metrics.increment(RESPONSES, code=code, **tags)
+        else:
+            self.metrics.increment(ERRORS, **tags)
+
+        time_info = getattr(response, 'time_info', None) or {}
+        for phase, value in time_info.items():
+            self.metrics.timing(TIME_INFO_PREFIX + phase, value, **tags)
+
     @gen.coroutine
-    def fetch(self, url, method, payload, **kwargs):
-        self.log.warning('Request: %s' % payload)
+    def _wait_concurrency_slot(self, deadline):
         try:
-            response = yield self.http_client.fetch(
-                self._get_request(url, method, payload, **kwargs)
+            yield self._concurrency.acquire(
+                timedelta(seconds=deadline.remaining())
             )
-        except HTTPError as e:
-            if e.code == 599:
-                raise HTTPTimeoutError(e.code, e.message)
-            if e.code == 400:
-                raise BraspagException(e.response)
+        except gen.TimeoutError:
+            raise DeadlineExceededError()
 
-            raise
+    def _acquire_concurrency_slot(self, **kwargs):
+        """Return a future resolved once the request fits under
+        `max_concurrency`, or None when there's no cap.
+        """
+        if self._concurrency is None:
+            return None
+
+        deadline = kwargs.get('deadline')
+        if deadline is None:
+            return self._concurrency.acquire()
+        return self._wait_concurrency_slot(deadline)
+
+    def _release_abandoned_slot(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self._concurrency.release()
+
+    def _acquire_rate_limit(self, **kwargs):
+        """Return a future resolved once the `RateLimiter` lets the request
+        go, or None without one. Takes the `priority` of the call, by
+        default `INTERACTIVE`.
+        """
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.acquire(
+            self.merchant_id, self._get_endpoint(**kwargs),
+            priority=kwargs.get('priority', INTERACTIVE),
+            deadline=kwargs.get('deadline')
+        )
 
-        self.log.warning(
-            'Response code: {} body: {}'.format(
-                response.code, response.body
+    def _get_stream_parser(self, **kwargs):
+        """Return a new parser from the `stream` factory of the call, if
+        any; every attempt of a request streams to a parser of its own.
+        """
+        stream = kwargs.get('stream')
+        if stream is None:
+            return None
+        return stream()
+
+    def _handle_fetch_error(self, request, error, start, **kwargs):
+        """Log and record a failed request, returning the exception that
+        must be raised for it.
+        """
+        duration = time.time() - start
+        self.request_logger.log(request, error=error, duration=duration)
+        if self.metrics is not None:
+            self._record_request(request, duration, error=error, **kwargs)
+        if self.rate_limiter is not None and getattr(error, 'code', None):
+            self.rate_limiter.record(
+                self.merchant_id, self._get_endpoint(**kwargs), error.code
+            )
+
+        if isinstance(error, HTTPError):
+            return self._translate_http_error(error)
+        return error
+
+    def _handle_fetch_response(self, request, response, start, **kwargs):
+        duration = time.time() - start
+        self.request_logger.log(request, response, duration=duration)
+        if self.metrics is not None:
+            self._record_request(request, duration, response, **kwargs)
+        if self.rate_limiter is not None:
+            self.rate_limiter.record(
+                self.merchant_id, self._get_endpoint(**kwargs), response.code
+            )
+
+    def _with_deadline(self, kwargs):
+        """Return `kwargs` with its `deadline`, if any, as a `Deadline`.
+
+        Callers may pass `deadline` as a `Deadline` or as the number of
+        seconds left to complete the call.
+        """
+        deadline = kwargs.get('deadline')
+        if deadline is None or isinstance(deadline, Deadline):
+            return kwargs
+        return dict(kwargs, deadline=Deadline.coerce(deadline))
+
+    @gen.coroutine
+    def fetch(self, url, method, payload, **kwargs):
+        kwargs = self._with_deadline(kwargs)
+        if self.retry_policy is not None:
+            self.retry_policy.budget.deposit()
+
+        attempt = 1
+        while True:
+            try:
+                if self._should_hedge(method, **kwargs):
+                    response = yield self._hedged_fetch(
+                        url, method, payload, **kwargs
+                    )
+                else:
+                    response = yield self._fetch(
+                        url, method, payload, **kwargs
+                    )
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, method, url, **kwargs)
+                if delay is None:
+                    raise
+                attempt += 1
+                yield gen.sleep(delay)
+            else:
+                raise gen.Return(response)
+
+    def _should_hedge(self, method, **kwargs):
+        return self.hedging_policy is not None and method == 'GET' and \
+            bool(kwargs.get('query'))
+
+    def _start_hedged_request(self, request_future):
+        """Record the latency of the first request of a hedged fetch"""
+        policy = self.hedging_policy
+        policy.start_request()
+        start = time.time()
+
+        def done(future):
+            if not future.cancelled() and future.exception() is None:
+                policy.record_latency(time.time() - start)
+
+        request_future.add_done_callback(done)
+
+    @gen.coroutine
+    def _hedged_fetch(self, url, method, payload, **kwargs):
+        """Fetch, sending an identical second request if the first one is
+        slower than the `HedgingPolicy` delay, and return the first
+        successful response. The slower request is ignored.
+        """
+        policy = self.hedging_policy
+        # futures even when `_fetch` is a native coroutine, see `aio`
+        first = gen.convert_yielded(
+            self._fetch(url, method, payload, **kwargs)
+        )
+        self._start_hedged_request(first)
+
+        try:
+            response = yield gen.with_timeout(
+                timedelta(seconds=policy.delay()), first,
+                quiet_exceptions=(Exception,)
             )
+        except gen.TimeoutError:
+            pass
+        else:
+            raise gen.Return(response)
+
+        if not policy.allow_hedge():
+            response = yield first
+            raise gen.Return(response)
+
+        hedge = gen.convert_yielded(
+            self._fetch(url, method, payload, **kwargs)
         )
+        error = None
+        waiter = gen.WaitIterator(first, hedge)
+        while not waiter.done():
+            try:
+                response = yield waiter.next()
+            except Exception as e:
+                error = e
+                continue
+
+            if waiter.current_future is hedge:
+                policy.hedge_wins += 1
+            # the other request keeps running, retrieve its outcome so a
+            # failure is not reported as unhandled
+            other = first if waiter.current_future is hedge else hedge
+            other.add_done_callback(lambda future: future.exception())
+            raise gen.Return(response)
+
+        raise error
+
+    @gen.coroutine
+    def _fetch(self, url, method, payload, **kwargs):
+        if kwargs.get('deadline') is not None:
+            kwargs['deadline'].check()
+
+        waiting = self._acquire_concurrency_slot(**kwargs)
+        if waiting is not None:
+            waiting = gen.convert_yielded(waiting)
+            try:
+                yield waiting
+            except BaseException:
+                # the caller stopped waiting, like when it is cancelled,
+                # but the slot may still be taken: give it back then
+                waiting.add_done_callback(self._release_abandoned_slot)
+                raise
+        try:
+            waiting = self._acquire_rate_limit(**kwargs)
+            if waiting is not None:
+                yield waiting
+
+            parser = self._get_stream_parser(**kwargs)
+            request = self._get_request(
+                url, method, payload, parser=parser, **kwargs
+            )
+            start = time.time()
+            try:
+                response = yield self.http_client.fetch(request)
+            except Exception as e:
+                if parser is not None:
+                    restore_error_body(e, parser)
+                error = self._handle_fetch_error(request, e, start, **kwargs)
+                if error is e:
+                    raise
+                raise error
+        finally:
+            if self._concurrency is not None:
+                self._concurrency.release()
+
+        self._handle_fetch_response(request, response, start, **kwargs)
+        if parser is not None:
+            response = StreamedResponse(response, parser)
         raise gen.Return(response)
 
 
+def _outlasts(deadline, other):
+    """Whether a request bound by `deadline` may run for as long as one bound
+    by `other`, None meaning no deadline
+    """
+    if deadline is None:
+        return True
+    return other is not None and deadline.at >= other.at
+
+
 class BraspagRequest(BaseRequest):
     """
     Implements Braspag Pagador REST API.
@@ -121,9 +511,50 @@ class BraspagRequest(BaseRequest):
     """
 
     def __init__(self, merchant_id=None, merchant_key=None, homologation=False,
-                 request_timeout=10):
-        super(BraspagRequest, self).__init__(merchant_id, merchant_key,
-                                             request_timeout)
+                 request_timeout=10, connect_timeout=None, pool=None,
+                 retry_policy=None, codec=None, cache=None,
+                 coalesce_requests=True, circuit_breaker=None,
+                 records=False, request_logger=None, metrics=None,
+                 hedging_policy=None, rate_limiter=None,
+                 max_concurrency=None, store=None, compress=True):
+        super(BraspagRequest, self).__init__(
+            merchant_id, merchant_key,
+            request_timeout=request_timeout,
+            connect_timeout=connect_timeout,
+            pool=pool,
+            retry_policy=retry_policy,
+            codec=codec,
+            request_logger=request_logger,
+            metrics=metrics,
+            hedging_policy=hedging_policy,
+            rate_limiter=rate_limiter,
+            max_concurrency=max_concurrency,
+            compress=compress
+        )
+        # optional `TransactionCache` for `get_transaction_data`
+        self.cache = cache
+        # optional `TransactionStore`, shared by every process on the host
+        self.store = store
+
+        # concurrent GETs to the same url share a single http request
+        self.coalesce_requests = coalesce_requests
+        self._in_flight = {}
+
+        # `True`, or a dict of `CircuitBreaker` options, enables one circuit
+        # breaker for the query endpoint and another for the transaction one
+        self.circuit_breakers = {}
+        if circuit_breaker:
+            options = {}
+            if isinstance(circuit_breaker, dict):
+                options = circuit_breaker
+            self.circuit_breakers = {
+                'query': CircuitBreaker('query', **options),
+                'transaction': CircuitBreaker('transaction', **options),
+            }
+
+        # return `SaleResult` records instead of dicts
+        self.records = records
+
         if homologation:
             self.query_url = 'https://apiqueryhomolog.braspag.com.br'
             self.transaction_url = 'https://apihomolog.braspag.com.br'
@@ -132,20 +563,153 @@ class BraspagRequest(BaseRequest):
             self.query_url = 'https://apiquery.braspag.com.br'
             self.transaction_url = 'https://api.braspag.com.br'
 
+    def _get_resource_url(self, resource, **kwargs):
+        url = self.transaction_url
+        if kwargs.get('query'):
+            url = self.query_url
+        return self._get_url(url, resource)
+
     @gen.coroutine
     def _request(self, resource, method, payload, **kwargs):
         """Make the http request to Braspag.
         """
-        url = self.transaction_url
-        if kwargs.get('query'):
-            url = self.query_url
-        url = self._get_url(url, resource)
+        kwargs = self._with_deadline(kwargs)
+        url = self._get_resource_url(resource, **kwargs)
+
+        # streamed responses are parsed by the caller's own parser
+        if method != 'GET' or not self.coalesce_requests or \
+                kwargs.get('stream') is not None:
+            response = yield self._fetch_json(url, method, payload, **kwargs)
+            raise gen.Return(response)
+
+        # single-flight: callers asking for a url that is already being
+        # fetched at their priority wait on the same future, sharing its
+        # result or error, as long as its timeouts, trimmed to the deadline
+        # of the caller that started it, are not shorter than theirs
+        key = (method, url, kwargs.get('priority', INTERACTIVE))
+        deadline = kwargs.get('deadline')
+        shared = self._in_flight.get(key)
+        if shared is not None and _outlasts(shared[1], deadline):
+            future = shared[0]
+        else:
+            future = gen.convert_yielded(self._coalesced_fetch_json(
+                key, url, method, payload, **kwargs
+            ))
+            if not future.done():
+                self._in_flight[key] = (future, deadline)
 
-        response = yield self.fetch(url, method, payload, **kwargs)
-        if six.PY2:
-            raise gen.Return(json.loads(response.body))
+        if deadline is None:
+            response = yield future
+            raise gen.Return(response)
+
+        # a waiter gives up on its own deadline, not on the first caller's
+        try:
+            response = yield gen.with_timeout(
+                timedelta(seconds=deadline.remaining()), future,
+                quiet_exceptions=(Exception,)
+            )
+        except gen.TimeoutError:
+            raise DeadlineExceededError()
+        raise gen.Return(response)
+
+    @gen.coroutine
+    def _coalesced_fetch_json(self, key, url, method, payload, **kwargs):
+        try:
+            response = yield self._fetch_json(url, method, payload, **kwargs)
+        finally:
+            # unless a caller with a later deadline took the key over
+            shared = self._in_flight.get(key)
+            if shared is not None and shared[1] is kwargs.get('deadline'):
+                del self._in_flight[key]
+        raise gen.Return(response)
+
+    @gen.coroutine
+    def _fetch_json(self, url, method, payload, **kwargs):
+        circuit_breaker = self.circuit_breakers.get(
+            self._get_endpoint(**kwargs)
+        )
+        if circuit_breaker is None:
+            response = yield self.fetch(url, method, payload, **kwargs)
         else:
-            raise gen.Return(json.loads(response.body.decode()))
+            circuit_breaker.before_request()
+            start = time.time()
+            try:
+                response = yield self.fetch(url, method, payload, **kwargs)
+            except Exception as e:
+                circuit_breaker.record(time.time() - start, e)
+                raise
+            circuit_breaker.record(time.time() - start)
+
+        raise gen.Return(self._decode_json(response, method, **kwargs))
+
+    def _loads(self, response):
+        if isinstance(response, StreamedResponse):
+            # parsed as it arrived, only the end of the document is left
+            return response.parser.close()
+        # codecs parse the raw bytes, without decoding them to text first
+        return self.codec.loads(response.body)
+
+    def _decode_json(self, response, method, **kwargs):
+        if self.metrics is None:
+            return self._loads(response)
+
+        start = time.time()
+        data = self._loads(response)
+        self.metrics.timing(
+            DECODE_TIME, time.time() - start,
+            endpoint=self._get_endpoint(**kwargs), method=method
+        )
+        return data
+
+    def circuit_breaker_state(self):
+        """Return the state of the circuit breaker of every endpoint,
+        e.g. `{'query': 'closed', 'transaction': 'open'}`
+        """
+        return dict(
+            (endpoint, circuit_breaker.state)
+            for endpoint, circuit_breaker in self.circuit_breakers.items()
+        )
+
+    def _get_cached_transaction_data(self, transaction_id):
+        """Return the formatted response from the cache, or from the store,
+        or None when the transaction must be fetched
+        """
+        if self.cache is not None:
+            response = self.cache.get((self.merchant_id, transaction_id))
+            if response is not None:
+                return response
+
+        if self.store is not None:
+            response = self.store.get(self.merchant_id, transaction_id)
+            if response is not None:
+                return self._format_transaction_data(
+                    transaction_id, response, stored=True
+                )
+        return None
+
+    def _format_transaction_data(self, transaction_id, response,
+                                 stored=False):
+        if self.store is not None and not stored:
+            self.store.set(self.merchant_id, transaction_id, response)
+
+        if self.metrics is None:
+            response = BraspagResponse.format_get_transaction_data(
+                response, records=self.records
+            )
+        else:
+            start = time.time()
+            response = BraspagResponse.format_get_transaction_data(
+                response, records=self.records
+            )
+            self.metrics.timing(FORMAT_TIME, time.time() - start,
+                                endpoint='query', method='GET')
+        if self.cache is not None:
+            self.cache.set((self.merchant_id, transaction_id), response)
+        return response
+
+    def _format_braspag_error(self, error):
+        """Format the body of a `BraspagException`"""
+        return self.format_errors(self.codec.loads(error.response.body))
 
     @gen.coroutine
     def get_transaction_data(self, **kwargs):
@@ -155,10 +719,16 @@ class BraspagRequest(BaseRequest):
         as keyword arguments and are:
 
         :arg transaction_id: The id of the transaction
+        :arg deadline: Optional `Deadline`, or seconds left, for the whole
+            call, retries included
         """
         trasaction_id = kwargs.get('transaction_id')
         assert is_valid_guid(trasaction_id), 'Invalid Transaction ID'
 
+        response = self._get_cached_transaction_data(trasaction_id)
+        if response is not None:
+            raise gen.Return(response)
+
         resource = '/v2/sales/{0}'.format(kwargs.get('transaction_id', ''))
 
         try:
@@ -170,119 +740,211 @@ class BraspagRequest(BaseRequest):
                 **kwargs
             )
         except BraspagException as e:
-            error_body = json.loads(e.response.body)
-            raise gen.Return(self.format_errors(error_body))
-
-        response = BraspagResponse.format_get_transaction_data(response)
-        raise gen.Return(response)
-
-
-class BraspagResponse(object):
-    @classmethod
-    def format_transactions(cls, braspag_transactions):
-        transactions = []
-
-        if not isinstance(braspag_transactions, list):
-            braspag_transactions = [braspag_transactions]
+            raise gen.Return(self._format_braspag_error(e))
 
-        for transaction in braspag_transactions:
-            data = {
-                'status': int(transaction.get('Status')),
-                'braspag_transaction_id': transaction.get('PaymentId'),
-                'acquirer_transaction_id': transaction.get(
-                    'AcquirerTransactionId'
-                ),
-                'authorization_code': transaction.get('AuthorizationCode'),
-                'proof_of_sale': transaction.get('ProofOfSale'),
-            }
-
-            credit_card = transaction.get('CreditCard', {})
+        raise gen.Return(
+            self._format_transaction_data(trasaction_id, response)
+        )
 
-            if 'Amount' in transaction:
-                data['amount'] = int(transaction.get('Amount'))
+    def _format_sales_page(self, payments):
+        return BraspagResponse.format_transactions(
+            payments, records=self.records
+        )
 
-            if 'VoidedAmount' in transaction:
-                data['voided_amount'] = int(transaction.get('VoidedAmount'))
+    def _format_sale(self, payment):
+        return BraspagResponse.format_transactions(
+            payment, records=self.records
+        )[0]
 
-            if 'CardNumber' in credit_card:
-                data['masked_credit_card_number'] = credit_card.get(
-                    'CardNumber'
-                )
+    def _sales_page_parser(self):
+        """Return a parser formatting the payments of a sales search as
+        they arrive
+        """
+        return JSONArrayParser('Payments', callback=self._format_sale)
 
-            if 'Brand' in credit_card:
-                data['payment_method_name'] = credit_card.get('Brand')
+    def find_sales_by_order_id(self, merchant_order_id, **kwargs):
+        """Return a `SalesCursor` over the payments of a `MerchantOrderId`.
 
-            if 'Holder' in credit_card:
-                data['holder_name'] = credit_card.get('Holder')
+        :arg merchant_order_id: The order id sent when creating the sale
+        :arg stream: Format the payments while the response arrives
+        """
+        return SalesCursor(
+            self, '/v2/sales', {'merchantOrderId': merchant_order_id},
+            **kwargs
+        )
 
-            if 'ExpirationDate' in credit_card:
-                data['expiration_date'] = credit_card.get('ExpirationDate')
+    def find_sales(self, start_date, end_date, page_size=100, **kwargs):
+        """Return a `SalesCursor` over the sales received from `start_date`
+        to `end_date`, fetched `page_size` at a time.
 
-            if 'ReturnCode' in transaction:
-                data['return_code'] = transaction.get('ReturnCode')
+        :arg start_date: A `date`, `datetime` or `YYYY-MM-DD` string
+        :arg end_date: A `date`, `datetime` or `YYYY-MM-DD` string
+        :arg page_size: How many sales are fetched per request
+        :arg stream: Format the payments while each page arrives, without
+            buffering whole response bodies
+        """
+        params = {
+            'initialDate': format_date(start_date),
+            'finalDate': format_date(end_date),
+        }
+        return SalesCursor(
+            self, '/v2/sales', params, page_size=page_size, **kwargs
+        )
 
-            if 'ReturnMessage' in transaction:
-                data['return_message'] = transaction.get('ReturnMessage')
+    def invalidate_transaction_data(self, transaction_id):
+        """Drop the transaction from the cache and the store, so the next
+        `get_transaction_data` asks Braspag, e.g. once it's known to have
+        changed
+        """
+        if self.cache is not None:
+            self.cache.invalidate((self.merchant_id, transaction_id))
+        if self.store is not None:
+            self.store.invalidate(self.merchant_id, transaction_id)
+
+    def _get_update_resource(self, action, **kwargs):
+        transaction_id = kwargs.get('transaction_id')
+        assert is_valid_guid(transaction_id), 'Invalid Transaction ID'
+
+        params = []
+        if kwargs.get('amount') is not None:
+            params.append(('amount', kwargs['amount']))
+        if kwargs.get('service_tax_amount') is not None:
+            params.append(('serviceTaxAmount', kwargs['service_tax_amount']))
+
+        resource = '/v2/sales/{0}/{1}'.format(transaction_id, action)
+        if params:
+            resource = '{0}?{1}'.format(resource, urlencode(params))
+        return resource
 
-            if 'Provider' in transaction:
-                data['payment_method'] = transaction.get('Provider')
+    @gen.coroutine
+    def _update_transaction(self, action, **kwargs):
+        resource = self._get_update_resource(action, **kwargs)
+        try:
+            response = yield self._request(resource, 'PUT', None, **kwargs)
+        except BraspagException as e:
+            raise gen.Return(self._format_braspag_error(e))
+        finally:
+            self.invalidate_transaction_data(kwargs['transaction_id'])
 
-            if 'Capture' in transaction:
-                data['capture'] = transaction.get('Capture')
+        raise gen.Return(BraspagResponse.format_update_transaction(response))
 
-            if 'Authenticate' in transaction:
-                data['autenticate'] = transaction.get('Authenticate')
+    def capture_transaction(self, **kwargs):
+        """Capture an authorized transaction.
 
-            if 'Type' in transaction:
-                data['transaction_type'] = transaction.get('Type')
+        :arg transaction_id: The id of the transaction
+        :arg amount: Amount to capture, in cents; the whole authorized
+            amount when missing
+        :arg service_tax_amount: Optional service tax amount, in cents
+        :arg request_id: Optional `RequestId`; reusing it makes retries
+            safe, as Braspag runs a request id only once
+        """
+        return self._update_transaction('capture', **kwargs)
 
-            if 'Installments' in transaction:
-                data['installments'] = int(transaction.get('Installments'))
+    def void_transaction(self, **kwargs):
+        """Void a transaction, which refunds it when already captured.
 
-            if 'Country' in transaction:
-                data['country'] = transaction.get('Country')
+        :arg transaction_id: The id of the transaction
+        :arg amount: Amount to void, in cents; the whole amount when missing
+        :arg request_id: Optional `RequestId`; reusing it makes retries
+            safe, as Braspag runs a request id only once
+        """
+        return self._update_transaction('void', **kwargs)
 
-            if 'ServiceTaxAmount' in transaction:
-                data['service_tax_amount'] = int(
-                    transaction.get('ServiceTaxAmount')
-                )
+    def refund_transaction(self, **kwargs):
+        """Refund a captured transaction, wholly or partially with `amount`.
 
-            if 'ReceivedDate' in transaction:
-                data['received_date'] = datetime.strptime(
-                    transaction.get('ReceivedDate'), '%Y-%m-%d %H:%M:%S'
-                )
+        Braspag refunds through the void endpoint, so this is the same as
+        `void_transaction`, named for readability.
+        """
+        return self._update_transaction('void', **kwargs)
 
-            if 'Interest' in transaction:
-                data['interest'] = transaction.get('Interest')
+    @gen.coroutine
+    def get_transactions_data(self, transaction_ids, max_concurrency=10,
+                              callback=None, **kwargs):
+        """Get the data from many transactions, keeping at most
+        `max_concurrency` requests in flight.
+
+        Each result is handed to `callback(transaction_id, result)` as soon
+        as its request finishes. The coroutine resolves to a dict mapping
+        every transaction id to its formatted response, or to the exception
+        raised while fetching it (e.g. `HTTPTimeoutError`).
+
+        :arg transaction_ids: An iterable of transaction ids
+        :arg max_concurrency: Maximum number of concurrent requests
+        :arg callback: Optional callable called for every finished request
+        """
+        # a deadline covers the whole batch, which is rate limited as bulk
+        kwargs = self._with_deadline(kwargs)
+        kwargs.setdefault('priority', BULK)
+        pending = iter(transaction_ids)
+        results = {}
+
+        @gen.coroutine
+        def worker():
+            # every worker pulls from the same iterator, so there are never
+            # more than `max_concurrency` requests in flight
+            for transaction_id in pending:
+                try:
+                    result = yield self.get_transaction_data(
+                        transaction_id=transaction_id, **kwargs
+                    )
+                except Exception as e:
+                    result = e
+
+                results[transaction_id] = result
+                if callback is not None:
+                    callback(transaction_id, result)
+
+        yield [worker() for _ in range(max_concurrency)]
+        raise gen.Return(results)
 
-            if 'ReasonCode' in transaction:
-                data['reason_code'] = transaction.get('ReasonCode')
 
-            if 'ReasonMessage' in transaction:
-                data['reason_message'] = transaction.get('ReasonMessage')
+class BraspagResponse(object):
+    """
+    Formats Braspag responses as dicts or, with `records=True`, as the
+    compact `Transaction` and `SaleResult` records, which have the same
+    field names and a `to_dict()` method.
+    """
 
-            if 'ProviderReturnCode' in transaction:
-                data['acquirer_return_code'] = transaction.get(
-                    'ProviderReturnCode'
-                )
+    @classmethod
+    def format_transactions(cls, braspag_transactions, records=False):
+        if not isinstance(braspag_transactions, list):
+            braspag_transactions = [braspag_transactions]
 
-            if 'ProviderReturnMessage' in transaction:
-                data['acquirer_return_message'] = transaction.get(
-                    'ProviderReturnMessage'
-                )
+        if records:
+            return [format_transaction_record(t) for t in braspag_transactions]
+        return [format_transaction(t) for t in braspag_transactions]
 
-            transactions.append(data)
+    @classmethod
+    def format_get_transaction_data(cls, response, records=False):
+        transaction = cls.format_transactions(
+            response.get('Payment'), records=records
+        )[0]
 
-        return transactions
+        if records:
+            return SaleResult(
+                True, response.get('MerchantOrderId'), transaction
+            )
 
-    @classmethod
-    def format_get_transaction_data(cls, response):
         data = {
             'success': True,
             'order_id': response.get('MerchantOrderId'),
         }
 
-        data['transaction'] = cls.format_transactions(
-            response.get('Payment')
-        )[0]
+        data['transaction'] = transaction
         return data
+
+    @classmethod
+    def format_get_transactions_data(cls, responses, records=False):
+        """Format many `/v2/sales/{id}` responses in one call"""
+        format_response = cls.format_get_transaction_data
+        return [format_response(response, records=records)
+                for response in responses]
+
+    @classmethod
+    def format_update_transaction(cls, response):
+        """Format the response to a capture, void or refund"""
+        return {
+            'success': True,
+            'transaction': format_update(response),
+        }
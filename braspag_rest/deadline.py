@@ -0,0 +1,49 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import time
+
+from .exceptions import DeadlineExceededError
+
+
+class Deadline(object):
+    """
+    Point in time by which a whole call, including retries, backoff and
+    connection queueing, must be done.
+
+    Built from the `timeout` seconds left from now, or the `at` timestamp.
+    """
+
+    def __init__(self, timeout=None, at=None, clock=time.time):
+        if at is None:
+            if timeout is None:
+                raise ValueError('Either timeout or at must be given')
+            at = clock() + timeout
+        self.at = at
+        self.clock = clock
+
+    @classmethod
+    def coerce(cls, deadline):
+        """Return a `Deadline` from a Deadline, a number of seconds left,
+        or None.
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(timeout=deadline)
+
+    def remaining(self):
+        """Seconds left, never negative"""
+        return max(0.0, self.at - self.clock())
+
+    @property
+    def expired(self):
+        return self.at <= self.clock()
+
+    def check(self):
+        """Raise `DeadlineExceededError` if the deadline is gone"""
+        if self.expired:
+            raise DeadlineExceededError()
+
+    def __repr__(self):
+        return 'Deadline(remaining={0:.3f})'.format(self.remaining())
@@ -16,3 +16,42 @@ class HTTPTimeoutError(HTTPError):
     Timeout Exception
     """
     pass
+
+
+class CircuitBreakerOpenError(Exception):
+    """
+    Raised without sending the request while the circuit breaker of an
+    endpoint is open
+    """
+    def __init__(self, endpoint, retry_after):
+        super(CircuitBreakerOpenError, self).__init__(
+            'Circuit breaker for {0} is open, retry after {1:.1f}s'.format(
+                endpoint, retry_after
+            )
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(HTTPTimeoutError):
+    """
+    The deadline of a call ran out, raised without sending the request
+    when there's no time left for it
+    """
+    def __init__(self, message='Deadline exceeded'):
+        super(DeadlineExceededError, self).__init__(599, message)
+
+
+class RateLimitExceededError(Exception):
+    """
+    Raised without sending the request when it waited too long for the
+    client-side rate limiter
+    """
+    def __init__(self, key, waited):
+        super(RateLimitExceededError, self).__init__(
+            'Rate limit for {0} exceeded after waiting {1:.3f}s'.format(
+                key, waited
+            )
+        )
+        self.key = key
+        self.waited = waited
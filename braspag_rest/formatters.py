@@ -0,0 +1,155 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import re
+
+from collections import namedtuple
+from datetime import datetime
+
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_DATETIME_RE = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})\Z'
+)
+
+
+def parse_datetime(value):
+    """Parse a Braspag date, like `2015-06-24 10:52:51`.
+
+    Much faster than `datetime.strptime` for dates on the fixed format
+    Braspag uses, falling back to it for anything else so the result, or
+    the error, is always the same.
+    """
+    match = _DATETIME_RE.match(value)
+    if match is not None:
+        try:
+            return datetime(*[int(part) for part in match.groups()])
+        except ValueError:
+            pass
+    return datetime.strptime(value, DATETIME_FORMAT)
+
+
+# `name` is the key on the formatted transaction and `key` the Braspag one.
+# `credit_card` fields are read from the `CreditCard` of the payment.
+# `optional` fields are left out when missing from the payment, the others
+# are always set, to None when missing. Fields are set in table order,
+# the ones that are not optional first.
+Field = namedtuple('Field', 'name key convert credit_card optional')
+
+
+def field(name, key, convert=None, credit_card=False, optional=True):
+    return Field(name, key, convert, credit_card, optional)
+
+
+TRANSACTION_FIELDS = (
+    field('status', 'Status', int, optional=False),
+    field('braspag_transaction_id', 'PaymentId', optional=False),
+    field('acquirer_transaction_id', 'AcquirerTransactionId', optional=False),
+    field('authorization_code', 'AuthorizationCode', optional=False),
+    field('proof_of_sale', 'ProofOfSale', optional=False),
+    field('amount', 'Amount', int),
+    field('voided_amount', 'VoidedAmount', int),
+    field('masked_credit_card_number', 'CardNumber', credit_card=True),
+    field('payment_method_name', 'Brand', credit_card=True),
+    field('holder_name', 'Holder', credit_card=True),
+    field('expiration_date', 'ExpirationDate', credit_card=True),
+    field('return_code', 'ReturnCode'),
+    field('return_message', 'ReturnMessage'),
+    field('payment_method', 'Provider'),
+    field('capture', 'Capture'),
+    field('autenticate', 'Authenticate'),
+    field('transaction_type', 'Type'),
+    field('installments', 'Installments', int),
+    field('country', 'Country'),
+    field('service_tax_amount', 'ServiceTaxAmount', int),
+    field('received_date', 'ReceivedDate', parse_datetime),
+    field('interest', 'Interest'),
+    field('reason_code', 'ReasonCode'),
+    field('reason_message', 'ReasonMessage'),
+    field('acquirer_return_code', 'ProviderReturnCode'),
+    field('acquirer_return_message', 'ProviderReturnMessage'),
+)
+
+
+def compile_formatter(fields, func_name='format_transaction',
+                      record_class=None):
+    """Compile a field table into a function formatting a single payment.
+
+    The function is generated as straight-line python code, once, so
+    formatting a payment costs no more than a hand written if-chain. It
+    returns a dict, or an instance of `record_class` with the fields set as
+    attributes when one is given.
+    """
+    namespace = {'record_class': record_class, 'new': object.__new__}
+    lookups = []
+    required = []
+    optional = []
+
+    for index, f in enumerate(fields):
+        source = 'credit_card' if f.credit_card else 'transaction'
+        if f.convert is not None:
+            namespace['convert_{0}'.format(index)] = f.convert
+            wrap = 'convert_{0}({{0}})'.format(index)
+        else:
+            wrap = '{0}'
+
+        if record_class is not None:
+            target = 'data.{0}'.format(f.name)
+        else:
+            target = 'data[{0!r}]'.format(f.name)
+
+        if f.optional:
+            value = wrap.format('{0}[{1!r}]'.format(source, f.key))
+            optional.append(
+                '    if {key!r} in {source}:\n'
+                '        {target} = {value}\n'.format(
+                    key=f.key, source=source, target=target, value=value
+                )
+            )
+        else:
+            value = '{0}.get({1!r})'.format(source, f.key)
+            if f.convert is not None:
+                # missing fields, e.g. on search results, stay None
+                local = 'value_{0}'.format(index)
+                lookups.append('    {0} = {1}\n'.format(local, value))
+                value = '{0} if {1} is not None else None'.format(
+                    wrap.format(local), local
+                )
+            if record_class is not None:
+                required.append('    {0} = {1}\n'.format(target, value))
+            else:
+                required.append('        {0!r}: {1},\n'.format(f.name, value))
+
+    if record_class is not None:
+        create = '    data = new(record_class)\n{0}'.format(''.join(required))
+    else:
+        create = '    data = {{\n{0}    }}\n'.format(''.join(required))
+    create = ''.join(lookups) + create
+
+    code = (
+        'def {0}(transaction):\n'
+        '    credit_card = transaction.get(\'CreditCard\', {{}})\n'
+        '{1}'
+        '{2}'
+        '    return data\n'
+    ).format(func_name, create, ''.join(optional))
+
+    exec(compile(code, '<{0}>'.format(func_name), 'exec'), namespace)
+    return namespace[func_name]
+
+
+# fields of the response to a capture or void
+UPDATE_FIELDS = (
+    field('status', 'Status', int, optional=False),
+    field('reason_code', 'ReasonCode'),
+    field('reason_message', 'ReasonMessage'),
+    field('return_code', 'ReturnCode'),
+    field('return_message', 'ReturnMessage'),
+    field('acquirer_return_code', 'ProviderReturnCode'),
+    field('acquirer_return_message', 'ProviderReturnMessage'),
+)
+
+
+format_transaction = compile_formatter(TRANSACTION_FIELDS)
+format_update = compile_formatter(UPDATE_FIELDS, 'format_update')
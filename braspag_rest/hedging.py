@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from .retry import RetryBudget
+from .metrics import Histogram
+
+
+class HedgingPolicy(object):
+    """
+    Decides when to send a second, identical query request.
+
+    A hedge is sent when the first request has not answered after the
+    `percentile` latency observed so far, kept between `min_delay` and
+    `max_delay` seconds; `max_delay` is used until `min_samples` requests
+    have been observed. Whichever response arrives first is used. The
+    percentile is recomputed every `refresh_every` observed requests, not
+    on every request, as it sorts the latency samples.
+
+    Hedges draw from a token bucket that every request fills with
+    `max_hedge_ratio` tokens, so at most that fraction of the requests is
+    ever hedged, once the initial `burst` is spent.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.01, max_delay=1.0,
+                 min_samples=20, max_hedge_ratio=0.05, burst=5,
+                 max_samples=1024, refresh_every=50):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.budget = RetryBudget(ratio=max_hedge_ratio, max_tokens=burst)
+        self.latencies = Histogram(max_samples)
+        self.refresh_every = refresh_every
+        self._delay = None
+        self._delay_count = 0
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self):
+        """Seconds to wait for the first response before hedging"""
+        if self.latencies.count < self.min_samples:
+            return self.max_delay
+
+        count = self.latencies.count
+        if self._delay is None or \
+                count - self._delay_count >= self.refresh_every:
+            delay = self.latencies.percentile(self.percentile)
+            self._delay = min(self.max_delay, max(self.min_delay, delay))
+            self._delay_count = count
+        return self._delay
+
+    def start_request(self):
+        self.requests += 1
+        self.budget.deposit()
+
+    def allow_hedge(self):
+        if not self.budget.withdraw():
+            return False
+        self.hedges += 1
+        return True
+
+    def record_latency(self, latency):
+        """Record the latency of a first, not hedged, request"""
+        self.latencies.add(latency)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'delay': self.delay(),
+        }
@@ -0,0 +1,122 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import re
+import random
+import logging
+
+import six
+
+from .utils import mask_credit_card_number
+from .utils import mask_value
+
+
+# fields masked on logged bodies, and how
+REDACTED_FIELDS = {
+    'CardNumber': mask_credit_card_number,
+    'SecurityCode': mask_value,
+}
+
+
+@six.python_2_unicode_compatible
+class LazyBody(object):
+    """Redacts and truncates a request or response body, only when the log
+    record is actually formatted.
+    """
+    __slots__ = ('body', 'request_logger')
+
+    def __init__(self, body, request_logger):
+        self.body = body
+        self.request_logger = request_logger
+
+    def __str__(self):
+        return self.request_logger.format_body(self.body)
+
+
+class RequestLogger(object):
+    """
+    Logs every request sent to Braspag along with its outcome, as a single
+    record on the `braspag` logger.
+
+    Successful requests are logged on `level` and failed ones on
+    `error_level`. Nothing is formatted unless the logger is enabled for
+    the level, and only a `sample_rate` (or `error_sample_rate`) fraction
+    of the requests is logged, e.g. `sample_rate=0.01` logs 1% of the
+    successful requests while still logging every error.
+
+    Bodies are cut at `max_body_length` characters and the `redact_fields`
+    are masked, so card data never reaches the logs.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG,
+                 error_level=logging.WARNING, sample_rate=1.0,
+                 error_sample_rate=1.0, max_body_length=2048,
+                 redact_fields=None):
+        self.logger = logger or logging.getLogger('braspag')
+        self.level = level
+        self.error_level = error_level
+        self.sample_rate = sample_rate
+        self.error_sample_rate = error_sample_rate
+        self.max_body_length = max_body_length
+        if redact_fields is None:
+            redact_fields = REDACTED_FIELDS
+        self.redact_fields = redact_fields
+        self._redact_re = re.compile(
+            r'("({0})"\s*:\s*)(?:"([^"]*)"|(\d+))'.format(
+                '|'.join(re.escape(field) for field in redact_fields)
+            )
+        )
+
+    def _redact_match(self, match):
+        prefix, field, value, number = match.groups()
+        if value is None:
+            value = number
+        masked = self.redact_fields[field](value)
+        return u'{0}"{1}"'.format(prefix, masked)
+
+    def redact(self, body):
+        """Mask the `redact_fields` of a json body"""
+        if not self.redact_fields:
+            return body
+        return self._redact_re.sub(self._redact_match, body)
+
+    def format_body(self, body):
+        if body is None:
+            return u''
+        if isinstance(body, six.binary_type):
+            body = body.decode('utf-8', 'replace')
+        elif not isinstance(body, six.text_type):
+            body = six.text_type(body)
+
+        body = self.redact(body)
+        if len(body) > self.max_body_length:
+            body = u'{0}... ({1} chars)'.format(
+                body[:self.max_body_length], len(body)
+            )
+        return body
+
+    def log(self, request, response=None, error=None, duration=0.0):
+        """Log the outcome of `request`, either a `response` or an `error`
+        """
+        failed = error is not None
+        level = self.error_level if failed else self.level
+        if not self.logger.isEnabledFor(level):
+            return
+
+        sample_rate = self.error_sample_rate if failed else self.sample_rate
+        if sample_rate < 1 and random.random() >= sample_rate:
+            return
+
+        if failed:
+            response = getattr(error, 'response', None)
+            outcome = getattr(error, 'code', None) or repr(error)
+        else:
+            outcome = response.code
+
+        self.logger.log(
+            level, 'Braspag %s %s -> %s in %.3fs request: %s response: %s',
+            request.method, request.url, outcome, duration,
+            LazyBody(request.body, self),
+            LazyBody(response.body if response is not None else None, self)
+        )
@@ -0,0 +1,157 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import random
+
+
+# timings recorded by the clients, in seconds. Every one is tagged with the
+# `endpoint` ('query' or 'transaction') and the http `method`.
+REQUEST_TIME = 'request.time'  # a single http request, retries apart
+DECODE_TIME = 'response.decode_time'  # json decoding of a response
+FORMAT_TIME = 'response.format_time'  # `BraspagResponse` formatting
+# phases reported by the curl client on `HTTPResponse.time_info`, like
+# 'request.queue', 'request.namelookup', 'request.connect'...
+TIME_INFO_PREFIX = 'request.'
+
+# time spent waiting for a connection on a `ConnectionPool`, tagged with the
+# `host` instead
+QUEUE_WAIT = 'pool.queue_wait'
+
+# counters
+RESPONSES = 'request.responses'  # tagged with the http status `code`
+TIMEOUTS = 'request.timeouts'
+ERRORS = 'request.errors'  # failures without an http response
+RETRIES = 'request.retries'
+
+
+class MetricsSink(object):
+    """
+    Receives the metrics recorded by a client. Subclass it and override
+    `timing` and `increment` to push them to any metrics system.
+    """
+
+    def timing(self, name, value, **tags):
+        """Record a duration of `value` seconds"""
+
+    def increment(self, name, value=1, **tags):
+        """Increment a counter"""
+
+
+class CallbackMetricsSink(MetricsSink):
+    """Calls `callback(kind, name, value, tags)` for every metric recorded,
+    with `kind` being either 'timing' or 'counter'.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def timing(self, name, value, **tags):
+        self.callback('timing', name, value, tags)
+
+    def increment(self, name, value=1, **tags):
+        self.callback('counter', name, value, tags)
+
+
+def _percentile(sorted_samples, percent):
+    if not sorted_samples:
+        return None
+    index = int(round(percent / 100.0 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+class Histogram(object):
+    """
+    Latency histogram keeping exact count, sum, min and max, and a uniform
+    sample of up to `max_samples` values to estimate percentiles.
+    """
+
+    def __init__(self, max_samples=1024):
+        self.max_samples = max_samples
+        self.samples = []
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        # reservoir sampling, every value has the same chance to be kept
+        if len(self.samples) < self.max_samples:
+            self.samples.append(value)
+        else:
+            index = random.randint(0, self.count - 1)
+            if index < self.max_samples:
+                self.samples[index] = value
+
+    def percentile(self, percent):
+        """Return the `percent` percentile of the values, None when empty"""
+        return _percentile(sorted(self.samples), percent)
+
+    def snapshot(self, percentiles=(50, 90, 95, 99)):
+        samples = sorted(self.samples)
+        data = {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+        }
+        for percent in percentiles:
+            data['p{0}'.format(percent)] = _percentile(samples, percent)
+        return data
+
+
+def metric_key(name, tags):
+    """Return a key like `request.time{endpoint=query,method=GET}`"""
+    if not tags:
+        return name
+    return '{0}{{{1}}}'.format(
+        name, ','.join('{0}={1}'.format(k, v) for k, v in sorted(tags.items()))
+    )
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """Keeps a `Histogram` per timing and a total per counter, for every
+    combination of tags.
+    """
+
+    def __init__(self, max_samples=1024):
+        self.max_samples = max_samples
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name, **tags):
+        key = metric_key(name, tags)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(self.max_samples)
+        return self.histograms[key]
+
+    def timing(self, name, value, **tags):
+        self.histogram(name, **tags).add(value)
+
+    def increment(self, name, value=1, **tags):
+        key = metric_key(name, tags)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name, **tags):
+        return self.counters.get(metric_key(name, tags), 0)
+
+    def snapshot(self, percentiles=(50, 90, 95, 99)):
+        """Return the counters and percentiles of every timing, by key"""
+        return {
+            'timings': dict(
+                (key, histogram.snapshot(percentiles))
+                for key, histogram in self.histograms.items()
+            ),
+            'counters': dict(self.counters),
+        }
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
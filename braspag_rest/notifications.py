@@ -0,0 +1,191 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import hmac
+import logging
+
+from collections import OrderedDict
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.queues import QueueFull
+from tornado.web import HTTPError
+from tornado.web import RequestHandler
+
+from .codec import get_codec
+from .utils import is_valid_guid
+
+
+log = logging.getLogger('braspag')
+
+# `ChangeType` values of a Braspag notification
+PAYMENT_STATUS_CHANGED = 1
+BOLETO_RECONCILED = 2
+RECURRENCE_CREATED = 3
+ANTIFRAUD_STATUS_CHANGED = 4
+RECURRENCE_DEACTIVATED = 5
+
+
+class NotificationReceiver(object):
+    """
+    Receives Braspag change notifications and turns them into formatted
+    transactions.
+
+    Notifications are held for `coalesce_delay` seconds, and every burst
+    for the same `PaymentId`, duplicates included, is delivered once. With
+    a `client`, the transaction is then fetched with a single
+    `get_transaction_data`, at most `max_concurrency` at a time. A
+    notification arriving while its payment is being fetched is delivered
+    again after it, so the last change is never lost.
+
+    Every delivery calls `callback(payment_id, change_types, response)`
+    and/or puts that tuple on `queue`, e.g. a `tornado.queues.Queue`.
+    `change_types` is the set of `ChangeType`s seen and `response` the
+    formatted `get_transaction_data` response, the exception raised
+    fetching it, or None without a `client`.
+    """
+
+    def __init__(self, client=None, callback=None, queue=None,
+                 coalesce_delay=0.5, max_concurrency=10):
+        self.client = client
+        self.callback = callback
+        self.queue = queue
+        self.coalesce_delay = coalesce_delay
+        self.max_concurrency = max_concurrency
+
+        self._pending = OrderedDict()
+        self._timer = None
+        self._running = False
+
+        self.received = 0
+        self.coalesced = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def receive(self, payment_id, change_type=PAYMENT_STATUS_CHANGED):
+        self.received += 1
+        if payment_id in self._pending:
+            self.coalesced += 1
+            self._pending[payment_id].add(change_type)
+            return
+
+        self._pending[payment_id] = set([change_type])
+        self._set_timer()
+
+    def _set_timer(self):
+        if self._timer is None and not self._running and self._pending:
+            self._timer = IOLoop.current().call_later(
+                self.coalesce_delay, self._on_timer
+            )
+
+    def _on_timer(self):
+        self._timer = None
+        IOLoop.current().add_future(
+            self.flush(), lambda future: future.result()
+        )
+
+    @gen.coroutine
+    def flush(self):
+        """Deliver every pending notification now"""
+        if self._running:
+            return
+
+        pending, self._pending = self._pending, OrderedDict()
+        self._running = True
+        try:
+            if self.client is None:
+                for payment_id, change_types in pending.items():
+                    self._deliver(payment_id, change_types, None)
+            else:
+                # the notified transactions changed, what is cached is stale
+                for payment_id in pending:
+                    self.client.invalidate_transaction_data(payment_id)
+                yield self.client.get_transactions_data(
+                    list(pending), max_concurrency=self.max_concurrency,
+                    callback=lambda payment_id, response: self._deliver(
+                        payment_id, pending[payment_id], response
+                    )
+                )
+        finally:
+            self._running = False
+            self._set_timer()
+
+    def _deliver(self, payment_id, change_types, response):
+        self.delivered += 1
+        if self.callback is not None:
+            try:
+                self.callback(payment_id, change_types, response)
+            except Exception:
+                log.exception('Notification callback failed for %s',
+                              payment_id)
+
+        if self.queue is not None:
+            try:
+                self.queue.put_nowait((payment_id, change_types, response))
+            except QueueFull:
+                self.dropped += 1
+                log.warning('Notification queue is full, dropping %s',
+                            payment_id)
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'received': self.received,
+            'coalesced': self.coalesced,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
+
+
+class NotificationHandler(RequestHandler):
+    """
+    Tornado handler for the Braspag notification url, POSTed a json body
+    like `{"PaymentId": "...", "ChangeType": 1}`:
+
+        app = Application([
+            (r'/braspag/notifications', NotificationHandler,
+             {'receiver': receiver, 'token': 'secret'}),
+        ])
+
+    With a `token`, the notification url must carry it as the `token`
+    query argument, e.g. `/braspag/notifications?token=secret`. Malformed
+    notifications are answered with 400, so Braspag doesn't retry them.
+    Braspag sends no XSRF token, so the handler is exempt from the
+    `xsrf_cookies` check.
+    """
+
+    def initialize(self, receiver, token=None, codec=None):
+        self.receiver = receiver
+        self.token = token
+        self.codec = get_codec(codec)
+
+    def check_xsrf_cookie(self):
+        pass
+
+    def check_token(self):
+        if self.token is None:
+            return
+        token = self.get_query_argument('token', '')
+        if not hmac.compare_digest(token.encode('utf-8'),
+                                   self.token.encode('utf-8')):
+            raise HTTPError(403)
+
+    def parse(self):
+        """Return `(payment_id, change_type)` from the request body"""
+        try:
+            notification = self.codec.loads(self.request.body)
+            payment_id = notification['PaymentId']
+            change_type = int(notification.get('ChangeType',
+                                               PAYMENT_STATUS_CHANGED))
+        except (ValueError, TypeError, KeyError):
+            raise HTTPError(400, 'Invalid notification')
+
+        if not is_valid_guid(payment_id):
+            raise HTTPError(400, 'Invalid PaymentId')
+        return payment_id, change_type
+
+    def post(self):
+        self.check_token()
+        self.receiver.receive(*self.parse())
+        self.set_status(200)
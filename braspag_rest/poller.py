@@ -0,0 +1,235 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import heapq
+import logging
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.queues import Queue
+from tornado.queues import QueueFull
+
+from .constants import TERMINAL_STATUSES
+
+
+log = logging.getLogger('braspag')
+
+
+class WatchedTransaction(object):
+    __slots__ = ('transaction_id', 'status', 'changed_at', 'due_at',
+                 'checks', 'errors')
+
+    def __init__(self, transaction_id, status, changed_at):
+        self.transaction_id = transaction_id
+        self.status = status
+        self.changed_at = changed_at
+        self.due_at = changed_at
+        self.checks = 0
+        self.errors = 0
+
+
+class StatusPoller(object):
+    """
+    Polls the status of pending transactions until they reach a terminal
+    status (captured, voided, denied...).
+
+    Every watched transaction is checked again after an interval that grows
+    with how long it has been on its current status: `age_ratio` times its
+    age, never less than the interval set for its status in `intervals`
+    (`min_interval` for statuses not there) nor more than `max_interval`.
+    Failed checks are retried after the same interval.
+
+    Due checks are run in batches by `client.get_transactions_data`, at
+    most `max_concurrency` at a time. When the status of a transaction
+    changes, `callback(transaction_id, response)` is called, or without a
+    `callback` the pair is put on the `changes` queue:
+
+        poller = StatusPoller(braspag)
+        poller.watch(transaction_id)
+        poller.start()
+        while True:
+            transaction_id, response = yield poller.changes.get()
+
+    With `changes_size` the queue holds at most that many changes, newer
+    ones being dropped (and logged) while it is full.
+
+    Transactions are no longer watched once they reach a terminal status.
+    The client should not cache pending transactions, which is the
+    `TransactionCache` default.
+    """
+
+    def __init__(self, client, max_concurrency=10, min_interval=5,
+                 max_interval=600, age_ratio=0.1, intervals=None,
+                 callback=None, changes_size=0, clock=time.time):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_ratio = age_ratio
+        self.intervals = intervals or {}
+        self.callback = callback
+        self.clock = clock
+
+        self.changes = Queue(maxsize=changes_size)
+
+        self._watched = {}
+        self._schedule = []
+        self._timer = None
+        self._timer_due_at = None
+        self._running = False
+        self._started = False
+
+        self.checks = 0
+        self.errors = 0
+
+    def __len__(self):
+        return len(self._watched)
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._watched
+
+    def interval(self, watched, now):
+        """Return in how many seconds `watched` is checked again"""
+        base = self.intervals.get(watched.status, self.min_interval)
+        age = (now - watched.changed_at) * self.age_ratio
+        return min(self.max_interval, max(base, age))
+
+    def watch(self, transaction_id, status=None, delay=0):
+        """Start polling `transaction_id`, first checked in `delay` seconds.
+
+        Pass its last known `status` so the first change reported is a real
+        one; watching a transaction on a terminal status is a no-op.
+        """
+        if status in TERMINAL_STATUSES or transaction_id in self._watched:
+            return
+
+        now = self.clock()
+        watched = WatchedTransaction(transaction_id, status, now)
+        self._watched[transaction_id] = watched
+        self._push(watched, now + delay)
+
+    def unwatch(self, transaction_id):
+        # entries left on the schedule are skipped when popped
+        self._watched.pop(transaction_id, None)
+
+    def start(self):
+        self._started = True
+        self._set_timer()
+
+    def stop(self):
+        self._started = False
+        self._cancel_timer()
+
+    def _push(self, watched, due_at):
+        watched.due_at = due_at
+        heapq.heappush(self._schedule, (due_at, watched.transaction_id))
+        if self._started and (self._timer_due_at is None or
+                              due_at < self._timer_due_at):
+            self._set_timer()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            IOLoop.current().remove_timeout(self._timer)
+        self._timer = None
+        self._timer_due_at = None
+
+    def _set_timer(self):
+        self._cancel_timer()
+        if self._running or not self._schedule:
+            return
+
+        self._timer_due_at = self._schedule[0][0]
+        delay = max(self._timer_due_at - self.clock(), 0)
+        self._timer = IOLoop.current().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_due_at = None
+        IOLoop.current().add_future(
+            self.poll(), lambda future: future.result()
+        )
+
+    def _pop_due(self, now):
+        due = []
+        while self._schedule and self._schedule[0][0] <= now:
+            due_at, transaction_id = heapq.heappop(self._schedule)
+            watched = self._watched.get(transaction_id)
+            # skip stale entries: unwatched, or rescheduled since
+            if watched is not None and watched.due_at == due_at:
+                due.append(transaction_id)
+        return due
+
+    @gen.coroutine
+    def poll(self):
+        """Check every transaction due now. Called by the poller timer once
+        started, but can also be driven by hand.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        try:
+            due = self._pop_due(self.clock())
+            if due:
+                yield self.client.get_transactions_data(
+                    due, max_concurrency=self.max_concurrency,
+                    callback=self._on_result
+                )
+        finally:
+            self._running = False
+            if self._started:
+                self._set_timer()
+
+    def _on_result(self, transaction_id, response):
+        watched = self._watched.get(transaction_id)
+        if watched is None:
+            return
+
+        now = self.clock()
+        self.checks += 1
+        watched.checks += 1
+
+        if isinstance(response, Exception) or not response['success']:
+            self.errors += 1
+            watched.errors += 1
+            log.info('Failed to poll transaction %s: %r',
+                     transaction_id, response)
+            self._push(watched, now + self.interval(watched, now))
+            return
+
+        status = response['transaction']['status']
+        if status != watched.status:
+            watched.status = status
+            watched.changed_at = now
+            self._notify(transaction_id, response)
+
+        if status in TERMINAL_STATUSES:
+            del self._watched[transaction_id]
+            return
+
+        self._push(watched, now + self.interval(watched, now))
+
+    def _notify(self, transaction_id, response):
+        if self.callback is not None:
+            try:
+                self.callback(transaction_id, response)
+            except Exception:
+                log.exception('Status poller callback failed for %s',
+                              transaction_id)
+            return
+
+        try:
+            self.changes.put_nowait((transaction_id, response))
+        except QueueFull:
+            log.warning('Status poller changes queue is full, dropping %s',
+                        transaction_id)
+
+    def stats(self):
+        return {
+            'watched': len(self._watched),
+            'checks': self.checks,
+            'errors': self.errors,
+            'changes': self.changes.qsize(),
+        }
@@ -0,0 +1,166 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import time
+
+from datetime import timedelta
+
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit
+
+from tornado import gen
+from tornado import httpclient
+from tornado.httpclient import HTTPRequest
+from tornado.locks import Semaphore
+
+from .metrics import QUEUE_WAIT
+from .exceptions import HTTPTimeoutError
+
+
+def create_http_client(max_clients=10, use_curl=False):
+    """Return a new, unshared AsyncHTTPClient instance.
+
+    With `use_curl` the client is a `CurlAsyncHTTPClient`, which keeps
+    connections alive between requests; it requires `pycurl`.
+    """
+    if use_curl:
+        try:
+            from tornado.curl_httpclient import CurlAsyncHTTPClient
+        except ImportError:
+            raise ImportError('use_curl=True requires pycurl to be installed')
+        return CurlAsyncHTTPClient(
+            force_instance=True, max_clients=max_clients
+        )
+
+    return httpclient.AsyncHTTPClient(
+        force_instance=True, max_clients=max_clients
+    )
+
+
+class ConnectionPool(object):
+    """
+    Connection pool to be used as the `http_client` of a `BraspagRequest`.
+
+    Requests are queued here, not inside Tornado: at most `max_clients`
+    requests are in flight, and at most `max_per_host` of them to the same
+    host. The time every request spent waiting for a free connection is
+    tracked and exposed by `stats()`; requests waiting longer than
+    `queue_timeout` seconds, or than their own `request_timeout`, fail with
+    `HTTPTimeoutError`. Time spent queued counts against the
+    `request_timeout` of the request, so a deadline set on it holds.
+
+    With `keep_alive=False` every request asks the server to close its
+    connection. Connections are only reused by the curl backend.
+
+    Queue waits are also sent to the `metrics` sink, if any, as the
+    `pool.queue_wait` timing tagged with the `host`.
+    """
+
+    def __init__(self, max_clients=10, max_per_host=None, keep_alive=True,
+                 use_curl=False, queue_timeout=None, http_client=None,
+                 metrics=None):
+        self.max_clients = max_clients
+        self.max_per_host = max_per_host
+        self.keep_alive = keep_alive
+        self.queue_timeout = queue_timeout
+        self.http_client = http_client or create_http_client(
+            max_clients, use_curl
+        )
+
+        self.metrics = metrics
+
+        self._slots = Semaphore(max_clients)
+        self._host_slots = {}
+
+        self.in_flight = 0
+        self.queued = 0
+        self.requests = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.queue_wait_last = 0.0
+
+    def _semaphores(self, url):
+        if not self.max_per_host:
+            return [self._slots]
+
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = Semaphore(self.max_per_host)
+
+        # host slot first, so we never hold a global slot while waiting
+        # for a busy host
+        return [self._host_slots[host], self._slots]
+
+    @gen.coroutine
+    def _acquire(self, semaphores, timeout):
+        acquired = []
+        try:
+            for semaphore in semaphores:
+                yield semaphore.acquire(timeout)
+                acquired.append(semaphore)
+        except gen.TimeoutError:
+            for semaphore in acquired:
+                semaphore.release()
+            raise HTTPTimeoutError(599, 'Timeout waiting for a connection')
+
+    def _record_queue_wait(self, wait):
+        self.requests += 1
+        self.queue_wait_last = wait
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+
+    @gen.coroutine
+    def fetch(self, request, **kwargs):
+        if not isinstance(request, HTTPRequest):
+            request = HTTPRequest(request, **kwargs)
+
+        if not self.keep_alive:
+            request.headers['Connection'] = 'close'
+
+        timeout = self.queue_timeout
+        if request.request_timeout:
+            timeout = min(timeout or request.request_timeout,
+                          request.request_timeout)
+        if timeout is not None:
+            timeout = timedelta(seconds=timeout)
+
+        semaphores = self._semaphores(request.url)
+        start = time.time()
+        self.queued += 1
+        try:
+            yield self._acquire(semaphores, timeout)
+        finally:
+            self.queued -= 1
+        self._record_queue_wait(time.time() - start)
+        if request.request_timeout:
+            # tornado takes a timeout of 0 as no timeout at all
+            request.request_timeout = max(
+                request.request_timeout - self.queue_wait_last, 0.001
+            )
+        if self.metrics is not None:
+            self.metrics.timing(QUEUE_WAIT, self.queue_wait_last,
+                                host=urlsplit(request.url).netloc)
+
+        self.in_flight += 1
+        try:
+            response = yield self.http_client.fetch(request)
+        finally:
+            self.in_flight -= 1
+            for semaphore in semaphores:
+                semaphore.release()
+
+        raise gen.Return(response)
+
+    def stats(self):
+        requests = self.requests or 1
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'requests': self.requests,
+            'queue_wait_avg': self.queue_wait_total / requests,
+            'queue_wait_max': self.queue_wait_max,
+            'queue_wait_last': self.queue_wait_last,
+        }
@@ -0,0 +1,180 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import time
+import heapq
+import itertools
+
+from datetime import timedelta
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.concurrent import Future
+
+from .exceptions import DeadlineExceededError
+from .exceptions import RateLimitExceededError
+
+
+# priority classes, lower values go first
+INTERACTIVE = 0
+BULK = 10
+
+
+class TokenBucket(object):
+    """Token bucket refilled with `rate` tokens per second, holding at most
+    `burst` tokens. Keeps the requests waiting for a token, by priority.
+    """
+
+    def __init__(self, rate, burst, clock=time.time):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+        # heap of (priority, sequence, future)
+        self.waiters = []
+        self.timer = None
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def time_to_next_token(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter(object):
+    """
+    Client-side rate limiter, to be shared by every `BraspagRequest` using
+    the same credentials.
+
+    Requests are limited by a token bucket per merchant and endpoint, with
+    `rate` requests per second and bursts of up to `burst`. `limits`
+    overrides them, mapping a `(merchant_id, endpoint)` pair, a merchant
+    id or an endpoint name to a `(rate, burst)` tuple.
+
+    Requests over the limit wait in line rather than fail, lower
+    `priority` values first (see `INTERACTIVE` and `BULK`), and only fail
+    with `RateLimitExceededError` after waiting `max_wait` seconds.
+
+    The rate adapts to the server: every throttled response, one of
+    `throttle_codes`, multiplies it by `decrease_factor` (down to
+    `min_rate`), and every other response adds `increase_step` back, up
+    to the configured rate.
+    """
+
+    def __init__(self, rate=10, burst=None, limits=None, max_wait=5.0,
+                 min_rate=0.5, decrease_factor=0.5, increase_step=None,
+                 throttle_codes=(429,), clock=time.time):
+        self.rate = rate
+        self.burst = burst or rate
+        self.limits = limits or {}
+        self.max_wait = max_wait
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.throttle_codes = frozenset(throttle_codes)
+        self.clock = clock
+
+        self._buckets = {}
+        self._sequence = itertools.count()
+
+        self.throttled = 0
+        self.rejected = 0
+
+    def _limit(self, merchant_id, endpoint):
+        for key in ((merchant_id, endpoint), merchant_id, endpoint):
+            if key in self.limits:
+                return self.limits[key]
+        return self.rate, self.burst
+
+    def bucket(self, merchant_id, endpoint):
+        key = (merchant_id, endpoint)
+        if key not in self._buckets:
+            rate, burst = self._limit(merchant_id, endpoint)
+            self._buckets[key] = TokenBucket(rate, burst, self.clock)
+        return self._buckets[key]
+
+    @gen.coroutine
+    def acquire(self, merchant_id, endpoint, priority=INTERACTIVE,
+                deadline=None):
+        """Wait for a token to send a request"""
+        bucket = self.bucket(merchant_id, endpoint)
+        bucket.refill()
+        if not bucket.waiters and bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return
+
+        timeout = self.max_wait
+        if deadline is not None and deadline.remaining() < timeout:
+            timeout = deadline.remaining()
+
+        entry = (priority, next(self._sequence), Future())
+        heapq.heappush(bucket.waiters, entry)
+        self._schedule(bucket)
+
+        start = self.clock()
+        try:
+            yield gen.with_timeout(timedelta(seconds=timeout), entry[2])
+        except gen.TimeoutError:
+            if entry[2].done():
+                # got its token just as it was giving up
+                return
+            bucket.waiters.remove(entry)
+            heapq.heapify(bucket.waiters)
+            if timeout < self.max_wait:
+                raise DeadlineExceededError()
+            self.rejected += 1
+            raise RateLimitExceededError(
+                (merchant_id, endpoint), self.clock() - start
+            )
+
+    def _schedule(self, bucket):
+        if bucket.timer is None:
+            bucket.timer = IOLoop.current().call_later(
+                bucket.time_to_next_token(), self._drain, bucket
+            )
+
+    def _drain(self, bucket):
+        bucket.timer = None
+        bucket.refill()
+        while bucket.waiters and bucket.tokens >= 1:
+            _, _, future = heapq.heappop(bucket.waiters)
+            bucket.tokens -= 1
+            future.set_result(None)
+
+        if bucket.waiters:
+            self._schedule(bucket)
+
+    def record(self, merchant_id, endpoint, code):
+        """Adapt the rate to the http status `code` of a response"""
+        bucket = self.bucket(merchant_id, endpoint)
+        if code in self.throttle_codes:
+            self.throttled += 1
+            bucket.refill()
+            bucket.rate = max(
+                self.min_rate, bucket.rate * self.decrease_factor
+            )
+        elif bucket.rate < bucket.max_rate:
+            step = self.increase_step or bucket.max_rate / 20.0
+            bucket.refill()
+            bucket.rate = min(bucket.max_rate, bucket.rate + step)
+
+    def stats(self):
+        return {
+            'throttled': self.throttled,
+            'rejected': self.rejected,
+            'buckets': dict(
+                ('{0}:{1}'.format(*key), {
+                    'rate': bucket.rate,
+                    'tokens': bucket.tokens,
+                    'waiting': len(bucket.waiters),
+                })
+                for key, bucket in self._buckets.items()
+            ),
+        }
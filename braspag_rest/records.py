@@ -0,0 +1,140 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from .formatters import TRANSACTION_FIELDS
+from .formatters import compile_formatter
+from .formatters import parse_datetime
+
+
+class Record(object):
+    """
+    Compact, `__slots__` based alternative to the dicts returned by
+    `BraspagResponse`, with the same field names.
+
+    Fields are read as attributes, or with the read-only part of the dict
+    interface (`record['amount']`, `record.get('amount')`, `'amount' in
+    record`). Fields missing from the Braspag payment read as None as
+    attributes and are left out by `to_dict`, which returns exactly the
+    dict `BraspagResponse` would have.
+    """
+    __slots__ = ()
+
+    # names of the fields, in the order `to_dict` sets them
+    _fields = ()
+
+    def __getattr__(self, name):
+        # only called for slots that were never set
+        if name in self._fields:
+            return None
+        raise AttributeError(name)
+
+    def _get(self, name):
+        """Return the value of a field, raising AttributeError if unset"""
+        return object.__getattribute__(self, name)
+
+    def __getitem__(self, name):
+        if name not in self._fields:
+            raise KeyError(name)
+        try:
+            return self._get(name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def to_dict(self):
+        data = {}
+        for name in self._fields:
+            try:
+                data[name] = self._get(name)
+            except AttributeError:
+                pass
+        return data
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.to_dict())
+
+
+class Transaction(Record):
+    """A formatted payment, see `BraspagResponse.format_transactions`.
+
+    `received_date` is kept as the raw Braspag string and only parsed to a
+    datetime on first access.
+    """
+    _fields = tuple(
+        [f.name for f in TRANSACTION_FIELDS if not f.optional] +
+        [f.name for f in TRANSACTION_FIELDS if f.optional]
+    )
+    __slots__ = tuple(
+        name for name in _fields if name != 'received_date'
+    ) + ('_received_date_raw', '_received_date')
+
+    def _get(self, name):
+        if name == 'received_date':
+            # raises AttributeError when the payment had no ReceivedDate
+            object.__getattribute__(self, '_received_date_raw')
+            return self.received_date
+        return object.__getattribute__(self, name)
+
+    @property
+    def received_date(self):
+        try:
+            return object.__getattribute__(self, '_received_date')
+        except AttributeError:
+            pass
+
+        try:
+            raw = object.__getattribute__(self, '_received_date_raw')
+        except AttributeError:
+            return None
+
+        self._received_date = parse_datetime(raw)
+        return self._received_date
+
+
+class SaleResult(Record):
+    """A formatted sale, see `BraspagResponse.format_get_transaction_data`
+    """
+    _fields = ('success', 'order_id', 'transaction')
+    __slots__ = _fields
+
+    def __init__(self, success, order_id, transaction):
+        self.success = success
+        self.order_id = order_id
+        self.transaction = transaction
+
+    def to_dict(self):
+        data = super(SaleResult, self).to_dict()
+        data['transaction'] = self.transaction.to_dict()
+        return data
+
+
+format_transaction_record = compile_formatter(
+    [f._replace(name='_received_date_raw', convert=None)
+     if f.name == 'received_date' else f
+     for f in TRANSACTION_FIELDS],
+    func_name='format_transaction_record',
+    record_class=Transaction
+)
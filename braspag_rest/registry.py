@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from .core import BraspagRequest
+from .pool import ConnectionPool
+
+
+class MerchantRegistry(object):
+    """
+    Hands out one client per merchant, all of them sharing the same
+    `ConnectionPool`, so a process serving many merchants keeps a single,
+    tuned set of connections.
+
+    Every client is created once, on `register`, with its static headers
+    already built; `get` is a plain dict lookup. With
+    `max_concurrency_per_merchant` (or `max_concurrency` on `register`) a
+    merchant never holds more than that many of the pool's connections, so
+    one busy merchant can't starve the others.
+
+    Any other keyword argument, like `cache`, `retry_policy`, `metrics` or
+    `rate_limiter`, is given to every client. The `cache` is keyed by
+    merchant, so it is safe to share.
+
+        registry = MerchantRegistry(ConnectionPool(max_clients=50),
+                                    max_concurrency_per_merchant=10)
+        registry.register(merchant_id, merchant_key)
+        response = yield registry.get(merchant_id).get_transaction_data(
+            transaction_id=transaction_id)
+    """
+
+    def __init__(self, pool=None, max_concurrency_per_merchant=None,
+                 client_class=BraspagRequest, **client_options):
+        self.pool = pool or ConnectionPool()
+        self.max_concurrency_per_merchant = max_concurrency_per_merchant
+        self.client_class = client_class
+        self.client_options = client_options
+        self._clients = {}
+
+    def register(self, merchant_id, merchant_key, max_concurrency=None,
+                 **client_options):
+        """Create, or replace, the client of `merchant_id` and return it.
+
+        Keyword arguments override the registry defaults for this merchant.
+        """
+        options = dict(self.client_options)
+        options.update(client_options)
+        options['pool'] = self.pool
+        options['max_concurrency'] = (
+            max_concurrency or self.max_concurrency_per_merchant
+        )
+
+        client = self.client_class(merchant_id, merchant_key, **options)
+        self._clients[merchant_id] = client
+        return client
+
+    def unregister(self, merchant_id):
+        self._clients.pop(merchant_id, None)
+
+    def get(self, merchant_id):
+        """Return the client of `merchant_id`, raising KeyError for merchants
+        never registered.
+        """
+        return self._clients[merchant_id]
+
+    def __contains__(self, merchant_id):
+        return merchant_id in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    def stats(self):
+        return {
+            'merchants': len(self._clients),
+            'pool': self.pool.stats(),
+        }
@@ -0,0 +1,111 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import random
+import socket
+
+from tornado.httpclient import HTTPError
+
+from .exceptions import DeadlineExceededError
+
+
+# methods that can always be retried
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class RetryBudget(object):
+    """
+    Token bucket that caps retries to a fraction of the requests made.
+
+    Every request deposits `ratio` tokens and every retry spends a whole
+    one, so once the initial `max_tokens` are gone at most `ratio` retries
+    are made per request. This keeps retries from multiplying the load
+    during an acquirer outage.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# shared by every `RetryPolicy` created without an explicit budget
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+class RetryPolicy(object):
+    """
+    Decides if and when a failed request is sent again.
+
+    Requests failing with a connection error or with one of `retry_codes`
+    (599 is how Tornado reports timeouts) are retried up to `max_attempts`
+    times in total. Before each retry the policy sleeps for an exponential
+    backoff of `backoff * 2 ** (retry - 1)` seconds, capped at
+    `max_backoff`; with `jitter` the actual delay is picked uniformly
+    between zero and that value.
+
+    GET requests are always retried. Writes are only retried when the
+    caller passed its own `request_id`, since Braspag uses the reused
+    `RequestId` header to detect the duplicate.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=2.0,
+                 jitter=True, retry_codes=(502, 503, 504, 599), budget=None):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_codes = frozenset(retry_codes)
+        if budget is None:
+            budget = DEFAULT_RETRY_BUDGET
+        self.budget = budget
+
+        self.retries = 0
+        self.budget_exhausted = 0
+
+    def is_idempotent(self, method, **kwargs):
+        return method in IDEMPOTENT_METHODS or bool(kwargs.get('request_id'))
+
+    def is_retryable(self, error):
+        if isinstance(error, DeadlineExceededError):
+            return False
+        if isinstance(error, HTTPError):
+            return error.code in self.retry_codes
+        return isinstance(error, socket.error)
+
+    def should_retry(self, error, attempt, method, **kwargs):
+        """Return whether a request that failed with `error` on its
+        `attempt`-th try must be retried. Spends from the retry budget.
+        """
+        if attempt >= self.max_attempts:
+            return False
+
+        if not self.is_retryable(error):
+            return False
+
+        if not self.is_idempotent(method, **kwargs):
+            return False
+
+        if not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return False
+
+        self.retries += 1
+        return True
+
+    def delay(self, attempt):
+        """Seconds to wait before sending the `attempt`-th try"""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 2))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
@@ -0,0 +1,161 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from collections import deque
+
+import six
+
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
+
+from tornado import gen
+
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def format_date(value):
+    """Format a `date` or `datetime` for a sales search, strings are sent
+    as they are
+    """
+    if isinstance(value, six.string_types):
+        return value
+    return value.strftime(DATE_FORMAT)
+
+
+class SalesCursor(object):
+    """
+    Iterates over the sales found by a search on the query API, page by
+    page, formatted by `BraspagResponse.format_transactions`.
+
+    A page is fetched only when the previous one starts being consumed, so
+    at most two pages are in memory, and the next page is on its way while
+    the current one is processed. Searches without a `page_size` are a
+    single page.
+
+    Like a motor cursor:
+
+        cursor = braspag.find_sales_by_order_id('2015062401')
+        while (yield cursor.fetch_next):
+            transaction = cursor.next_object()
+
+    or, on python 3.5+:
+
+        async for transaction in braspag.find_sales(start, end):
+            ...
+
+    Errors, like `BraspagException`, are raised by the `fetch_next` that
+    needs the failed page; the next `fetch_next` asks for that page again,
+    so retrying never skips a page.
+
+    With `stream`, pages are not buffered before being decoded: payments
+    are decoded and formatted one by one as the response arrives.
+    """
+
+    def __init__(self, client, resource, params, page_size=None,
+                 stream=False, **kwargs):
+        self.client = client
+        self.resource = resource
+        self.params = params
+        self.page_size = page_size
+        self.stream = stream
+        self.kwargs = kwargs
+
+        self._page_index = 1
+        self._next_page = None
+        self._last_page = False
+        self._buffer = deque()
+
+        self.pages = 0
+
+    def _get_resource(self, page_index):
+        params = dict(self.params)
+        if self.page_size:
+            params['pageSize'] = self.page_size
+            params['pageIndex'] = page_index
+        return '{0}?{1}'.format(
+            self.resource, urlencode(sorted(params.items()))
+        )
+
+    @gen.coroutine
+    def _fetch_page(self, page_index):
+        """Resolve to the formatted payments of a page"""
+        kwargs = self.kwargs
+        if self.stream:
+            kwargs = dict(kwargs, stream=self.client._sales_page_parser)
+
+        response = yield self.client._request(
+            self._get_resource(page_index), 'GET', None, query=True,
+            **kwargs
+        )
+        if self.stream:
+            raise gen.Return(response.get('Payments') or [])
+        raise gen.Return(
+            self.client._format_sales_page(response.get('Payments') or [])
+        )
+
+    def _prefetch(self):
+        if self._next_page is None and not self._last_page:
+            self._next_page = self._fetch_page(self._page_index)
+            self._page_index += 1
+
+    @property
+    def alive(self):
+        """False once every sale was consumed"""
+        return bool(self._buffer) or not self._last_page
+
+    @property
+    def fetch_next(self):
+        """A future resolving to True if there are more sales to consume
+        with `next_object()`, False otherwise
+        """
+        return self._fetch_next()
+
+    @gen.coroutine
+    def _fetch_next(self):
+        if not self._buffer and not self._last_page:
+            self._prefetch()
+            future, self._next_page = self._next_page, None
+            try:
+                page = yield future
+            except Exception:
+                # no later page was requested yet, fetch this one again
+                self._page_index -= 1
+                raise
+
+            self.pages += 1
+            if not self.page_size or len(page) < self.page_size:
+                self._last_page = True
+            self._buffer.extend(page)
+
+        if self._buffer:
+            self._prefetch()
+        raise gen.Return(bool(self._buffer))
+
+    def next_object(self):
+        """Return the next sale, only after `fetch_next` resolved to True"""
+        return self._buffer.popleft()
+
+    @gen.coroutine
+    def to_list(self, length=None):
+        """Return up to `length` sales, all of them when None"""
+        results = []
+        while length is None or len(results) < length:
+            more = yield self._fetch_next()
+            if not more:
+                break
+            results.append(self.next_object())
+        raise gen.Return(results)
+
+    def __aiter__(self):
+        return self
+
+    @gen.coroutine
+    def __anext__(self):
+        more = yield self._fetch_next()
+        if not more:
+            raise StopAsyncIteration()  # noqa: F821, python 3.5+ only
+        raise gen.Return(self.next_object())
@@ -0,0 +1,376 @@
+# -*- encoding: utf-8 -*-
+"""
+Local stand-in for the Braspag REST API, to load and soak test clients
+without touching Braspag.
+
+    python -m braspag_rest.simulator --port 8888 --latency lognormal:0.05:0.5
+
+or, in process:
+
+    simulator = BraspagSimulator(latency=lognormal_latency(0.05))
+    port = simulator.listen(0)
+    braspag = create_client(port, request_timeout=2)
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+
+from datetime import datetime
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.web import Application
+from tornado.web import RequestHandler
+
+from .constants import AUTHORIZED
+from .constants import DENIED
+from .constants import PAYMENT_CONFIRMED
+from .constants import REFUNDED
+from .constants import VOIDED
+from .utils import is_valid_guid
+
+
+def constant_latency(seconds):
+    return lambda rnd: seconds
+
+
+def uniform_latency(low, high):
+    return lambda rnd: rnd.uniform(low, high)
+
+
+def lognormal_latency(median, sigma=0.5, maximum=None):
+    """Latencies with a long tail, like the ones of a real API: half of
+    them under `median`, a few many times over it
+    """
+    mu = math.log(median)
+
+    def latency(rnd):
+        value = rnd.lognormvariate(mu, sigma)
+        if maximum is not None:
+            value = min(value, maximum)
+        return value
+    return latency
+
+
+def parse_latency(spec):
+    """Parse a latency given as `constant:S`, `uniform:LOW:HIGH` or
+    `lognormal:MEDIAN[:SIGMA[:MAX]]`, e.g. on the command line
+    """
+    name, _, args = spec.partition(':')
+    args = [float(arg) for arg in args.split(':') if arg]
+    distributions = {
+        'constant': constant_latency,
+        'uniform': uniform_latency,
+        'lognormal': lognormal_latency,
+    }
+    if name not in distributions:
+        raise ValueError('Unknown latency distribution: {0}'.format(name))
+    return distributions[name](*args)
+
+
+class Throttle(object):
+    """Token bucket allowing `rate` requests per second per merchant"""
+
+    def __init__(self, rate, burst=None, clock=time.time):
+        self.rate = rate
+        self.burst = burst or rate
+        self.clock = clock
+        self._buckets = {}
+
+    def allow(self, key):
+        now = self.clock()
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+
+class BraspagSimulator(object):
+    """
+    Simulates the `/v2/sales` query and transaction endpoints.
+
+    Every response is delayed by `latency(rnd)` seconds, see
+    `lognormal_latency` and friends. `error_rate` of the requests fail with
+    a 500, and `timeout_rate` of them hang for `hang` seconds, so clients
+    see their 599 timeouts. With `throttle`, merchants making more than
+    that many requests per second get 429s.
+
+    Unknown payment ids are answered with a sale generated from the id,
+    on one of the `statuses` (a dict of status: weight), so any valid id
+    can be queried. Sales created, captured or voided are kept.
+    """
+
+    def __init__(self, latency=None, error_rate=0.0, timeout_rate=0.0,
+                 hang=30.0, throttle=None, statuses=None, seed=None):
+        self.latency = latency or constant_latency(0)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.throttle = Throttle(throttle) if throttle else None
+        self.statuses = statuses or {
+            PAYMENT_CONFIRMED: 0.7, AUTHORIZED: 0.2, DENIED: 0.1
+        }
+        self.random = random.Random(seed)
+
+        self.sales = {}
+        self.responses = {}
+
+    def _count(self, code):
+        self.responses[code] = self.responses.get(code, 0) + 1
+
+    def _status(self, rnd):
+        point = rnd.random() * sum(self.statuses.values())
+        for status, weight in sorted(self.statuses.items()):
+            point -= weight
+            if point < 0:
+                return status
+        return status
+
+    def generate_sale(self, payment_id):
+        rnd = random.Random(payment_id)
+        return {
+            'MerchantOrderId': str(rnd.randint(10 ** 9, 10 ** 10)),
+            'Customer': {'Name': 'Jose da Silva'},
+            'Payment': {
+                'PaymentId': payment_id,
+                'Status': self._status(rnd),
+                'Amount': rnd.randint(100, 500000),
+                'Provider': 'Simulado',
+                'Country': 'BRA',
+                'Type': 'CreditCard',
+                'Installments': rnd.randint(1, 12),
+                'ReceivedDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'CreditCard': {
+                    'CardNumber': '000000******0001',
+                    'Holder': 'Jose da Silva',
+                    'ExpirationDate': '05/2030',
+                    'Brand': 'Visa',
+                },
+            },
+        }
+
+    def get_sale(self, payment_id):
+        if payment_id not in self.sales:
+            return self.generate_sale(payment_id)
+        return self.sales[payment_id]
+
+    def create_sale(self, sale):
+        payment = dict(sale.get('Payment') or {})
+        payment_id = str(uuid.uuid4())
+        payment.update({
+            'PaymentId': payment_id,
+            'Status': (PAYMENT_CONFIRMED if payment.get('Capture')
+                       else AUTHORIZED),
+            'ReceivedDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'ReturnCode': '4',
+            'ReturnMessage': 'Operation Successful',
+        })
+        card = dict(payment.get('CreditCard') or {})
+        number = card.get('CardNumber', '')
+        if number:
+            card['CardNumber'] = number[:6] + '*' * 6 + number[-4:]
+        card.pop('SecurityCode', None)
+        payment['CreditCard'] = card
+
+        sale = dict(sale, Payment=payment)
+        self.sales[payment_id] = sale
+        return sale
+
+    def update_sale(self, payment_id, action, amount=None):
+        sale = self.get_sale(payment_id)
+        payment = dict(sale['Payment'])
+        status = payment['Status']
+        if action == 'capture' and status == AUTHORIZED:
+            payment['Status'] = PAYMENT_CONFIRMED
+            payment['CapturedAmount'] = amount or payment.get('Amount')
+        elif action == 'void' and status == AUTHORIZED:
+            payment['Status'] = VOIDED
+            payment['VoidedAmount'] = amount or payment.get('Amount')
+        elif action == 'void' and status == PAYMENT_CONFIRMED:
+            payment['Status'] = REFUNDED
+            payment['VoidedAmount'] = amount or payment.get('Amount')
+        else:
+            return None
+
+        self.sales[payment_id] = dict(sale, Payment=payment)
+        return {
+            'Status': payment['Status'],
+            'ReturnCode': '0',
+            'ReturnMessage': 'Operation Successful',
+        }
+
+    def search_sales(self, query):
+        """Return the payments of the kept sales, of a `merchantOrderId`
+        when given, a `pageSize` at a time
+        """
+        sales = sorted(self.sales.values(),
+                       key=lambda sale: sale['Payment']['ReceivedDate'])
+        order_id = query.get('merchantOrderId')
+        if order_id is not None:
+            sales = [sale for sale in sales
+                     if sale.get('MerchantOrderId') == order_id]
+
+        payments = [sale['Payment'] for sale in sales]
+        if query.get('pageSize'):
+            size = int(query['pageSize'])
+            start = (int(query.get('pageIndex', 1)) - 1) * size
+            payments = payments[start:start + size]
+        return {'Payments': payments}
+
+    @gen.coroutine
+    def handle(self, method, payment_id, action, merchant_id, body,
+               amount=None, query=None):
+        """Return `(code, body)` for a request, after the simulated
+        latency and faults
+        """
+        if not merchant_id:
+            raise gen.Return((401, [{'Code': 114,
+                                     'Message': 'MerchantId is required'}]))
+
+        if self.throttle is not None and not self.throttle.allow(merchant_id):
+            raise gen.Return((429, [{'Code': 429,
+                                     'Message': 'Too many requests'}]))
+
+        yield gen.sleep(self.latency(self.random))
+
+        roll = self.random.random()
+        if roll < self.timeout_rate:
+            yield gen.sleep(self.hang)
+            raise gen.Return((504, ''))
+        if roll < self.timeout_rate + self.error_rate:
+            raise gen.Return((500, ''))
+
+        if payment_id is not None and not is_valid_guid(payment_id):
+            raise gen.Return((400, [{'Code': 114,
+                                     'Message': 'Invalid PaymentId'}]))
+
+        if method == 'GET' and payment_id is not None:
+            raise gen.Return((200, self.get_sale(payment_id)))
+        if method == 'GET':
+            raise gen.Return((200, self.search_sales(query or {})))
+        if method == 'POST' and payment_id is None:
+            raise gen.Return((201, self.create_sale(body or {})))
+        if method == 'PUT' and action is not None:
+            result = self.update_sale(
+                payment_id, action, int(amount) if amount else None
+            )
+            if result is None:
+                raise gen.Return((400, [{
+                    'Code': 308, 'Message': 'Transaction not available to '
+                                            '{0}'.format(action)
+                }]))
+            raise gen.Return((200, result))
+        raise gen.Return((404, ''))
+
+    def application(self):
+        # gzips the larger responses, for clients asking for it
+        return Application([
+            (r'/v2/sales/?', SimulatorHandler, {'simulator': self}),
+            (r'/v2/sales/([^/]+)/?', SimulatorHandler, {'simulator': self}),
+            (r'/v2/sales/([^/]+)/(capture|void)/?', SimulatorHandler,
+             {'simulator': self}),
+        ], compress_response=True)
+
+    def listen(self, port=0, address='127.0.0.1'):
+        """Start serving on the current IOLoop, returning the port"""
+        from tornado.httpserver import HTTPServer
+        from tornado.netutil import bind_sockets
+
+        sockets = bind_sockets(port, address)
+        self.server = HTTPServer(self.application())
+        self.server.add_sockets(sockets)
+        return sockets[0].getsockname()[1]
+
+    def stop(self):
+        self.server.stop()
+
+
+def create_client(port, client_class=None, **kwargs):
+    """Return a client, `BraspagRequest` by default, pointed at the
+    simulator listening on `port`
+    """
+    if client_class is None:
+        from .core import BraspagRequest as client_class
+
+    kwargs.setdefault('merchant_id', 'simulator')
+    kwargs.setdefault('merchant_key', 'simulator')
+    client = client_class(**kwargs)
+    client.query_url = client.transaction_url = (
+        'http://127.0.0.1:{0}'.format(port)
+    )
+    return client
+
+
+class SimulatorHandler(RequestHandler):
+    def initialize(self, simulator):
+        self.simulator = simulator
+
+    @gen.coroutine
+    def respond(self, method, payment_id=None, action=None):
+        body = None
+        if self.request.body:
+            try:
+                body = json.loads(self.request.body.decode('utf-8'))
+            except ValueError:
+                self.simulator._count(400)
+                self.set_status(400)
+                self.write(json.dumps([{'Code': 126,
+                                        'Message': 'Invalid json'}]))
+                return
+
+        code, response = yield self.simulator.handle(
+            method, payment_id, action,
+            self.request.headers.get('MerchantId'), body,
+            self.get_query_argument('amount', None),
+            dict((name, self.get_query_argument(name))
+                 for name in self.request.query_arguments)
+        )
+        self.simulator._count(code)
+        self.set_status(code)
+        if response != '':
+            self.set_header('Content-Type', 'application/json')
+            self.write(json.dumps(response))
+
+    def get(self, payment_id=None):
+        return self.respond('GET', payment_id)
+
+    def post(self):
+        return self.respond('POST')
+
+    def put(self, payment_id, action=None):
+        return self.respond('PUT', payment_id, action)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Braspag API simulator')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--latency', default='constant:0',
+                        help='e.g. constant:0.05, uniform:0.01:0.1 or '
+                             'lognormal:0.05:0.5:2')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--throttle', type=float, default=None,
+                        help='requests per second per merchant')
+    args = parser.parse_args()
+
+    simulator = BraspagSimulator(
+        latency=parse_latency(args.latency), error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, throttle=args.throttle
+    )
+    port = simulator.listen(args.port)
+    print('Braspag simulator listening on http://127.0.0.1:{0}'.format(port))
+    IOLoop.current().start()
+
+
+if __name__ == '__main__':
+    main()
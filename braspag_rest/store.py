@@ -0,0 +1,225 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+import time
+import sqlite3
+import logging
+
+from .codec import get_codec
+from .constants import TERMINAL_STATUSES
+
+
+log = logging.getLogger('braspag')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transactions (
+    merchant_id TEXT NOT NULL,
+    transaction_id TEXT NOT NULL,
+    status INTEGER,
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (merchant_id, transaction_id)
+)
+'''
+
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS transactions_stored_at '
+    'ON transactions (stored_at)',
+    'CREATE INDEX IF NOT EXISTS transactions_expires_at '
+    'ON transactions (expires_at)',
+)
+
+
+class TransactionStore(object):
+    """
+    Write-through store for `get_transaction_data` responses, backed by a
+    SQLite file that every worker process on a host can share.
+
+    Braspag responses are stored as received, before formatting, so any
+    client can read them whatever its `records` option. Transactions on a
+    terminal status are kept for `terminal_ttl` seconds, an hour by
+    default, forever when None: captured payments may still be voided or
+    refunded. Any other status is kept for `pending_ttl` seconds, with `0`
+    (the default) not storing them at all.
+
+    The file holds at most about `max_size` transactions: once it grows
+    past that the oldest ones are dropped, checked every `check_every`
+    writes. `compact()` also drops expired transactions and returns the
+    freed pages to the filesystem.
+
+    Lookups are point queries on the primary key and take a few
+    microseconds, so they are run on the IOLoop thread. The database uses
+    WAL journaling so readers never wait for a writer in another process.
+    Each process opens its own connection, also after a fork.
+
+    A write lock held by another process is waited for `busy_timeout`
+    seconds at most, blocking the IOLoop meanwhile, so it is kept short.
+    Database errors, like a lock still held after it, are logged and taken
+    as a miss, or a skipped write, never failing the request.
+    """
+
+    def __init__(self, path, max_size=100000, terminal_ttl=3600,
+                 pending_ttl=0, check_every=1000, busy_timeout=0.05,
+                 codec=None, clock=time.time):
+        self.path = path
+        self.max_size = max_size
+        self.terminal_ttl = terminal_ttl
+        self.pending_ttl = pending_ttl
+        self.check_every = check_every
+        self.busy_timeout = busy_timeout
+        self.codec = get_codec(codec)
+        self.clock = clock
+
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def connection(self):
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None,
+            check_same_thread=False
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(SCHEMA)
+        for index in INDEXES:
+            connection.execute(index)
+        return connection
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def ttl(self, status):
+        """Return for how many seconds a transaction on `status` is stored,
+        None meaning forever
+        """
+        if status in TERMINAL_STATUSES:
+            return self.terminal_ttl
+        return self.pending_ttl
+
+    def _error(self, operation, error):
+        self.errors += 1
+        log.warning('TransactionStore %s failed on %s: %r',
+                    operation, self.path, error)
+
+    def get(self, merchant_id, transaction_id):
+        """Return the stored Braspag response for the transaction, or None"""
+        try:
+            row = self.connection.execute(
+                'SELECT body, expires_at FROM transactions '
+                'WHERE merchant_id = ? AND transaction_id = ?',
+                (merchant_id, transaction_id)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._error('get', e)
+            row = None
+
+        if row is None or (row[1] is not None and row[1] <= self.clock()):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.codec.loads(bytes(row[0]))
+
+    def set(self, merchant_id, transaction_id, response):
+        """Store a Braspag `/v2/sales/{id}` response, if its status is meant
+        to be stored
+        """
+        payment = response.get('Payment') or {}
+        status = payment.get('Status')
+        ttl = self.ttl(status)
+        if ttl == 0:
+            return
+
+        now = self.clock()
+        body = self.codec.dumps(response)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        try:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO transactions '
+                '(merchant_id, transaction_id, status, stored_at, '
+                'expires_at, body) VALUES (?, ?, ?, ?, ?, ?)',
+                (merchant_id, transaction_id, status, now,
+                 None if ttl is None else now + ttl, sqlite3.Binary(body))
+            )
+            self.writes += 1
+
+            self._writes += 1
+            if self._writes >= self.check_every:
+                self._writes = 0
+                self._enforce_size()
+        except sqlite3.Error as e:
+            self._error('set', e)
+
+    def invalidate(self, merchant_id, transaction_id):
+        try:
+            self.connection.execute(
+                'DELETE FROM transactions '
+                'WHERE merchant_id = ? AND transaction_id = ?',
+                (merchant_id, transaction_id)
+            )
+        except sqlite3.Error as e:
+            self._error('invalidate', e)
+
+    def clear(self):
+        self.connection.execute('DELETE FROM transactions')
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM transactions'
+        ).fetchone()[0]
+
+    def _enforce_size(self):
+        excess = len(self) - self.max_size
+        if excess <= 0:
+            return 0
+
+        cursor = self.connection.execute(
+            'DELETE FROM transactions WHERE rowid IN ('
+            'SELECT rowid FROM transactions ORDER BY stored_at LIMIT ?)',
+            (excess,)
+        )
+        self.evictions += cursor.rowcount
+        return cursor.rowcount
+
+    def compact(self):
+        """Drop expired transactions and the oldest ones over `max_size`,
+        then shrink the file. Returns how many transactions were dropped.
+        """
+        cursor = self.connection.execute(
+            'DELETE FROM transactions WHERE expires_at <= ?', (self.clock(),)
+        )
+        dropped = cursor.rowcount + self._enforce_size()
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.connection.execute('VACUUM')
+        return dropped
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'errors': self.errors,
+        }
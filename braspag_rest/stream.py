@@ -0,0 +1,197 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import re
+import json
+import codecs
+
+import six
+
+from tornado.httpclient import HTTPError
+from tornado.httpclient import HTTPResponse
+
+
+# a string, complete or cut by the end of the buffer, or a structural char
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*(")?|[\[\]{},]')
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_ENDS = frozenset([u' ', u'\t', u'\n', u'\r', u',', u']'])
+
+_decoder = json.JSONDecoder()
+
+
+class JSONArrayParser(object):
+    """
+    Incremental parser for json objects holding a large array, like the
+    `Payments` of a sales search.
+
+    Body chunks are given to `feed` as they arrive, e.g. from the
+    `streaming_callback` of an `HTTPRequest`. Every element of the array
+    under `key` is decoded on its own as soon as its last byte arrives,
+    handed to `callback`, and only the value it returns is kept, so the
+    whole body and its whole decoded form are never in memory at once.
+
+    Elements are decoded by the C scanner of the stdlib json module, which
+    can start at any offset of the buffer; only the rest of the document
+    is scanned here, a token at a time.
+
+    `close` returns the decoded document, the array holding what
+    `callback` returned for its elements. Bodies without the array, like
+    errors, are kept as they are, in `body`.
+    """
+
+    def __init__(self, key, callback=None):
+        self.key = key
+        self.callback = callback
+        self.items = []
+
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        # the document without the elements of the array
+        self._skeleton = []
+        # text not yet consumed: the part of the document scanned so far
+        # outside the array, or the start of the next element inside it
+        self._buffer = u''
+        self._pos = 0
+        self._depth = 0
+        self._last_string = None
+        self._in_array = False
+        self._found = False
+
+    @property
+    def body(self):
+        """The bytes received that are not elements of the array"""
+        text = u''.join(self._skeleton) + self._buffer
+        return text.encode('utf-8')
+
+    def feed(self, chunk):
+        self._buffer += self._decoder.decode(chunk)
+
+        while True:
+            if self._in_array:
+                if not self._feed_array():
+                    break
+            elif not self._feed_document():
+                break
+
+        if self._in_array and self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def _feed_document(self):
+        """Scan up to the array, returning False when more data is needed"""
+        buffer = self._buffer
+        for match in _TOKEN.finditer(buffer, self._pos):
+            token = match.group()
+            if token[0] == u'"':
+                if match.group(1) is None:
+                    # wait for the end of the string
+                    self._pos = match.start()
+                    return False
+                if self._depth == 1:
+                    self._last_string = token[1:-1]
+            elif token in u'[{':
+                self._depth += 1
+                if (token == u'[' and self._depth == 2 and
+                        self._last_string == self.key):
+                    self._pos = match.end()
+                    self._start_array()
+                    return True
+            elif token in u']}':
+                self._depth -= 1
+
+        self._pos = len(buffer)
+        return False
+
+    def _feed_array(self):
+        """Decode the next element, returning False when more data is
+        needed
+        """
+        buffer = self._buffer
+        pos = _WHITESPACE.match(buffer, self._pos).end()
+        if pos == len(buffer):
+            self._pos = pos
+            return False
+
+        if buffer[pos] == u']':
+            self._pos = pos
+            self._end_array()
+            return True
+        if buffer[pos] == u',':
+            self._pos = pos + 1
+            return True
+
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # an element cut short, decoded again with the next chunk
+            self._pos = pos
+            return False
+
+        if isinstance(item, (int, float)) and \
+                buffer[end:end + 1] not in _NUMBER_ENDS:
+            # a number, like `4.`, may go on in the next chunk
+            self._pos = pos
+            return False
+
+        self._pos = end
+        if self.callback is not None:
+            item = self.callback(item)
+        self.items.append(item)
+        return True
+
+    def _start_array(self):
+        self._in_array = True
+        self._found = True
+        self._skeleton.append(self._buffer[:self._pos])
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+
+    def _end_array(self):
+        # the closing bracket is part of the document
+        self._in_array = False
+        self._last_string = None
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+
+    def close(self):
+        """Return the decoded document. Raises `ValueError` when the body
+        is not valid json, e.g. when it was cut short.
+        """
+        self._buffer += self._decoder.decode(b'', True)
+        if self._in_array:
+            raise ValueError('Incomplete json document')
+
+        document = json.loads(u''.join(self._skeleton) + self._buffer)
+        if self._found:
+            document[self.key] = self.items
+        return document
+
+
+class StreamedResponse(object):
+    """
+    An `HTTPResponse` whose body went to a `JSONArrayParser` instead of
+    being buffered; any other attribute is the response's.
+    """
+
+    def __init__(self, response, parser):
+        self.response = response
+        self.parser = parser
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+def restore_error_body(error, parser):
+    """Put the body streamed to `parser` back on the response of an
+    `HTTPError`, where error handling and logging look for it.
+    """
+    response = getattr(error, 'response', None)
+    if not isinstance(error, HTTPError) or response is None:
+        return
+
+    error.response = HTTPResponse(
+        response.request, response.code, headers=response.headers,
+        buffer=six.BytesIO(parser.body), effective_url=response.effective_url,
+        reason=response.reason, request_time=response.request_time,
+        time_info=response.time_info
+    )
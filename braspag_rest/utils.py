@@ -8,7 +8,7 @@ def is_valid_guid(guid):
     VALID_PARTS_LEN = [8, 4, 4, 4, 12]
 
     if not isinstance(guid, six.string_types):
-        guid = unicode(guid)
+        guid = six.text_type(guid)
 
     if not all(c in VALID_CHARS for c in guid):
         return False
@@ -24,3 +24,8 @@ def mask_credit_card_number(card):
     card = str(card)
     asterisks = len(card) - 10
     return u'{0}{1}{2}'.format(card[:6], '*' * asterisks, card[-4:])
+
+
+def mask_value(value):
+    """Mask the whole value, e.g. a card security code"""
+    return u'*' * len(six.text_type(value))
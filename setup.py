@@ -2,7 +2,21 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 from setuptools import setup
+from setuptools.command.install_lib import install_lib
+
+
+class InstallLib(install_lib):
+    """Leaves the asyncio client, written with `async def`, out of the
+    byte-compiling on Python < 3.5, which can't import it anyway.
+    """
+
+    def byte_compile(self, files):
+        if sys.version_info < (3, 5):
+            aio = os.path.join('braspag_rest', 'aio.py')
+            files = [f for f in files if not f.endswith(aio)]
+        install_lib.byte_compile(self, files)
 
 
 cwd = os.path.abspath(os.path.dirname(__file__))
@@ -18,6 +32,7 @@ setup(
     author_email='daniel.urbano@luizalabs.com',
     url='https://github.com/luizalabs/mangos',
     packages=['braspag_rest'],
+    cmdclass={'install_lib': InstallLib},
     test_suite='tests.suite',
     tests_require=['Mock'],
     zip_safe=False,
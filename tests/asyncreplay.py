@@ -1,16 +1,19 @@
 #!/usr/bin/env python
 
 from tornado import gen
+from tornado.concurrent import Future
 from tornado.ioloop import IOLoop
 from tornado.httpclient import AsyncHTTPClient
 from tornado.httpclient import HTTPResponse
 from tornado.httpclient import HTTPRequest
 from tornado.httpclient import HTTPError
+from tornado.httputil import HTTPHeaders
 
-from six import StringIO
+from six import BytesIO
 
-import quopri
+import six
 import json
+import base64
 import hashlib
 
 import mock
@@ -22,88 +25,151 @@ from contextlib import contextmanager
 
 logger = logging.getLogger('braspag')
 
+# older recordings hashed every body to this
+LEGACY_BODY_HASH = '123'
+
+
+def get_body_hash(body):
+    if body is None:
+        body = b''
+    elif isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    return hashlib.md5(body).hexdigest()
+
+
+def request_key(method, url, body_hash):
+    return (method.upper(), url, body_hash)
+
+
+def encode_body(body):
+    """Return the recorded form of a body: text when it is utf-8, base64
+    otherwise
+    """
+    if body is None:
+        return {'body': None}
+    if isinstance(body, six.text_type):
+        return {'body': body}
+    try:
+        return {'body': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': base64.b64encode(body).decode('ascii')}
+
+
+def decode_body(data):
+    if data.get('body_base64') is not None:
+        return base64.b64decode(data['body_base64'])
+    body = data.get('body')
+    if body is None:
+        return b''
+    return body.encode('utf-8')
+
 
 class ReplayRecording(object):
     """
     Holds on to a set of request keys and their response values.
     Can be used to reproduce HTTP/HTTPS responses without using
     the network.
-    """
-    def __init__(self, jsonable=None):
-        self.request_responses = []
-        if jsonable:
-            self._from_jsonable(jsonable)
 
-    def _from_jsonable(self, jsonable):
-        self.request_responses = [(r['body_hash'], r['request'], r['response'])
-                                  for r in jsonable]
-
-    def get_body_hash(self, body):
-        return '123'
-        return str(hashlib.md5(body and body or '').hexdigest())
+    Requests are matched by method, url and the md5 of their body, with a
+    single dict lookup. Entries added since the recording was loaded are
+    kept apart, so saving only appends them to the file.
+    """
+    def __init__(self, entries=None):
+        self.index = {}
+        self.unsaved = []
+        # read from a json list, rewritten as json lines on save
+        self.legacy = False
+        for entry in entries or []:
+            self._add(entry)
+
+    def _add(self, entry):
+        request = entry['request']
+        body_hash = entry['body_hash']
+        if body_hash == LEGACY_BODY_HASH:
+            body_hash = get_body_hash(request.get('body'))
+        key = request_key(request['method'], request['url'], body_hash)
+        # the first recording of a request wins, like the old linear scan
+        self.index.setdefault(key, entry['response'])
+
+    def key(self, request):
+        return request_key(request.method, request.url,
+                           get_body_hash(request.body))
+
+    def __len__(self):
+        return len(self.index)
 
     def __getitem__(self, request):
-        """
-        Match requests by the tuple (url, method)
-        """
-        body_hash = self.get_body_hash(request.body)
-        for (rec_body_hash, rec_request, rec_response) in self.request_responses:
-            logger.debug(
-                'testing body hash %s -> %s -- url: %s -> %s method: %s -> %s\n' % (
-                    body_hash, rec_body_hash, request.url, rec_request['url'],
-                    request.method, rec_request['method'])
-                )
-            if rec_body_hash == body_hash and \
-                    rec_request['url'] == request.url and \
-                    rec_request['method'] == request.method:
-                logger.debug('found it!')
-                return rec_response
-        else:
-            logger.debug('response not found.')
-            raise KeyError
+        return self.index[self.key(request)]
 
     def __contains__(self, request):
-        try:
-            self[request]
-        except:
-            return False
-        else:
-            return True
+        return self.key(request) in self.index
+
+    def get(self, request):
+        return self.index.get(self.key(request))
 
     def __setitem__(self, request, response):
-        self.request_responses.append(
-            (self.get_body_hash(request.body), request, response)
-        )
-
-    def to_jsonable(self):
-        return [dict(
-            body_hash=body_hash,
-            request=request,
-            response=response
-        ) for body_hash, request, response in self.request_responses]
-
-    def to_httpresponse(self, request):
-        """Try and get a response that matches the request, create a HTTPResponse
-        object from it and return it.
+        entry = {
+            'body_hash': get_body_hash(request.body),
+            'request': encode_request(request),
+            'response': encode_response(response),
+        }
+        self._add(entry)
+        self.unsaved.append(entry)
+
+    def to_httpresponse(self, request, response_dict=None):
+        """Try and get a response that matches the request, create a
+        HTTPResponse object from it and return it.
         """
-        response_dict = self[request]
+        if response_dict is None:
+            response_dict = self[request]
         return HTTPResponse(
             request,
             response_dict['status']['code'],
-            headers=response_dict['headers'],
-            buffer=StringIO.StringIO(response_dict['body']),
+            headers=HTTPHeaders(response_dict['headers']),
+            buffer=BytesIO(decode_body(response_dict)),
             reason=response_dict['status']['message'])
 
 
+def encode_request(request):
+    data = {
+        'url': request.url,
+        'method': request.method,
+        'user_agent': request.user_agent,
+        'headers': dict(request.headers),
+    }
+    data.update(encode_body(request.body))
+    return data
+
+
+def encode_response(response):
+    data = {
+        'headers': dict(response.headers),
+        'status': {'code': response.code, 'message': response.reason},
+    }
+    data.update(encode_body(response.body))
+    return data
+
+
 class ReplayRecordingManager(object):
     """
-    Loads and saves replay recordings as to json files.
+    Loads and saves replay recordings as json files.
+
+    Recordings are json lines, one request per line, so saving appends the
+    new requests only. Each file is parsed once per process; older
+    recordings, a single json list, are still read and are rewritten as
+    json lines on their first save.
     """
+    _recordings = {}
+
     @classmethod
     def load(cls, recording_file_name):
+        recording = cls._recordings.get(recording_file_name)
+        if recording is not None:
+            return recording
+
         try:
             with open(recording_file_name) as fp:
-                recording = ReplayRecording(json.load(fp))
+                content = fp.read()
         except IOError:
             logger.debug("ReplayRecordingManager starting new %r",
                          os.path.basename(recording_file_name))
@@ -111,6 +177,16 @@ class ReplayRecordingManager(object):
         else:
             logger.debug("ReplayRecordingManager loaded from %r",
                          os.path.basename(recording_file_name))
+            if content.lstrip().startswith('['):
+                recording = ReplayRecording(json.loads(content))
+                recording.legacy = True
+            else:
+                recording = ReplayRecording(
+                    json.loads(line) for line in content.splitlines()
+                    if line.strip()
+                )
+
+        cls._recordings[recording_file_name] = recording
         return recording
 
     @classmethod
@@ -120,39 +196,69 @@ class ReplayRecordingManager(object):
         dirname, _ = os.path.split(recording_file_name)
         if not os.path.exists(dirname):
             os.makedirs(dirname)
-        with open(recording_file_name, 'w') as recording_file:
-            json.dump(
-                recording.to_jsonable(),
-                recording_file,
-                indent=4,
-                sort_keys=True,
-                cls=RequestResponseEncoder)
+
+        if recording.legacy:
+            with open(recording_file_name) as fp:
+                entries = json.load(fp)
+            mode = 'w'
+            recording.legacy = False
+        else:
+            entries = []
+            mode = 'a'
+
+        entries.extend(recording.unsaved)
+        with open(recording_file_name, mode) as recording_file:
+            for entry in entries:
+                recording_file.write(json.dumps(entry, sort_keys=True))
+                recording_file.write('\n')
+        recording.unsaved = []
+
+    @classmethod
+    def clear(cls):
+        """Forget the recordings loaded so far"""
+        cls._recordings.clear()
 
 
-class RequestResponseEncoder(json.JSONEncoder):
-    """Encoder that handles HTTPRequest and HTTPResponse objects.
+class ReplayHTTPClient(object):
     """
-    def default(self, obj):
-        if isinstance(obj, HTTPRequest):
-            return {
-                'url': obj.url,
-                'method': obj.method,
-                'body': obj.body,
-                'user_agent': obj.user_agent,
-                'headers': obj.headers
-            }
-        if isinstance(obj, HTTPResponse):
-            return {
-                'headers': obj.headers,
-                'status': {'code': obj.code, 'message': obj.reason},
-                'body': obj.body,
-                'body_quoted_printable': quopri.encodestring(obj.body)
-            }
-
-        return json.JSONEncoder.default(self, obj)
-
-
-def async_replay_patch(fetch_mock, recordfile):
+    Stand-in for `AsyncHTTPClient` answering every request from a
+    recording, without any I/O, so thousands of requests can be replayed
+    concurrently, e.g. by benchmarks. Requests not recorded fail with a
+    599 `HTTPError`.
+    """
+    def __init__(self, recording):
+        if not isinstance(recording, ReplayRecording):
+            recording = ReplayRecordingManager.load(recording)
+        self.recording = recording
+        self.requests = 0
+
+    def fetch(self, request, **kwargs):
+        if not isinstance(request, HTTPRequest):
+            request = HTTPRequest(request, **kwargs)
+        self.requests += 1
+
+        future = Future()
+        response_dict = self.recording.get(request)
+        if response_dict is None:
+            future.set_exception(
+                HTTPError(599, 'Request not recorded: {0} {1}'.format(
+                    request.method, request.url))
+            )
+            return future
+
+        response = self.recording.to_httpresponse(request, response_dict)
+        if response.code >= 400:
+            future.set_exception(
+                HTTPError(response.code, response=response)
+            )
+        else:
+            future.set_result(response)
+        return future
+
+
+def async_replay_patch(fetch_mock, recordfile, replay_only=False):
+    replay_client = ReplayHTTPClient(recordfile)
+
     @gen.coroutine
     def side_effect(request, **kwargs):
         """Replay http requests for all hosts except localhost.
@@ -175,18 +281,16 @@ def async_replay_patch(fetch_mock, recordfile):
                 response = e.response
             raise gen.Return(response)
 
-        recording = ReplayRecordingManager.load(recordfile)
-        if request in recording:
-            try:
-                response = recording.to_httpresponse(request)
-            except Exception as e:
-                logger.debug(
-                    ('Found recorded response, but cant parse it. '
-                     'Returning None.')
-                )
-                raise gen.Return(None)
-            else:
-                raise gen.Return(recording.to_httpresponse(request))
+        recording = replay_client.recording
+        response_dict = recording.get(request)
+        if response_dict is not None:
+            raise gen.Return(
+                recording.to_httpresponse(request, response_dict)
+            )
+
+        if replay_only:
+            response = yield replay_client.fetch(request)
+            raise gen.Return(response)
 
         logger.debug('Response not found in recording.')
 
@@ -194,6 +298,8 @@ def async_replay_patch(fetch_mock, recordfile):
         try:
             response = yield client.fetch(request)
         except HTTPError as e:
+            if e.response is None:
+                raise
             response = e.response
 
         recording[request] = response
@@ -205,9 +311,12 @@ def async_replay_patch(fetch_mock, recordfile):
 
 
 @contextmanager
-def asyncreplay(recordfile):
+def asyncreplay(recordfile, replay_only=False):
+    """Answer the requests of the block from `recordfile`, recording the
+    ones not there yet; with `replay_only` they fail instead.
+    """
     with mock.patch.object(AsyncHTTPClient(), 'fetch') as fetch_mock:
-        async_replay_patch(fetch_mock, recordfile)
+        async_replay_patch(fetch_mock, recordfile, replay_only)
         yield
 
 
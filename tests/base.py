@@ -4,9 +4,13 @@ from __future__ import absolute_import
 import six
 
 import re
+import json
 import codecs
 import os
 
+from tornado import gen
+from tornado.httpclient import HTTPError
+from tornado.httpclient import HTTPResponse
 from tornado.testing import AsyncTestCase
 from braspag_rest import BraspagRequest
 from .asyncreplay import asyncreplay
@@ -42,6 +46,66 @@ class BraspagTestCase(AsyncTestCase):
         return asyncreplay(self._replay_file_name())
 
 
+def sale_payload(payment_id, status=1, **payment):
+    """Return a Braspag sale body as returned by `/v2/sales/{id}`"""
+    data = {
+        'PaymentId': payment_id,
+        'Status': status,
+        'Amount': 15700,
+        'Provider': 'Simulado',
+        'Country': 'BRA',
+        'ReceivedDate': '2015-06-24 10:52:51',
+        'CreditCard': {
+            'CardNumber': '000000******0001',
+            'Holder': 'Jose da Silva',
+            'ExpirationDate': '05/2018',
+            'Brand': 'Undefined'
+        }
+    }
+    data.update(payment)
+    return {'MerchantOrderId': '2015062401', 'Payment': data}
+
+
+class FakeHTTPClient(object):
+    """Stand-in for `AsyncHTTPClient` that never touches the network.
+
+    Every request is answered by `handler(request)`, which returns a tuple
+    `(code, body)` or `(code, body, delay)`. Bodies that are not strings are
+    encoded as json. Requests with a `streaming_callback` get the body
+    `chunk_size` bytes at a time, like from the network.
+    """
+    def __init__(self, handler, chunk_size=16):
+        self.handler = handler
+        self.chunk_size = chunk_size
+        self.requests = []
+
+    @gen.coroutine
+    def fetch(self, request, **kwargs):
+        self.requests.append(request)
+        result = self.handler(request)
+        code, body = result[:2]
+        if len(result) > 2:
+            yield gen.sleep(result[2])
+
+        if not isinstance(body, (six.binary_type, six.text_type)):
+            body = json.dumps(body)
+        if isinstance(body, six.text_type):
+            body = body.encode('utf-8')
+
+        if getattr(request, 'streaming_callback', None) is not None:
+            for start in range(0, len(body), self.chunk_size):
+                request.streaming_callback(body[start:start + self.chunk_size])
+            body = b''
+
+        response = HTTPResponse(request, code, buffer=six.BytesIO(body))
+        if code == 599:
+            raise HTTPError(599, 'Timeout')
+        if code >= 400:
+            raise HTTPError(code, response=response)
+
+        raise gen.Return(response)
+
+
 class RegexpMatcher(object):
     def __init__(self, data_filepath):
         with codecs.open(data_filepath, 'rb', encoding='utf-8') as data_file:
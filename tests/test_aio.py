@@ -0,0 +1,158 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import unittest
+
+from .base import FakeHTTPClient
+from .base import HOMOLOGATION
+from .base import sale_payload
+from tornado.locks import Semaphore
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from braspag_rest import ASYNCIO
+from braspag_rest.core import BraspagRequest
+from braspag_rest.retry import RetryBudget
+from braspag_rest.retry import RetryPolicy
+from braspag_rest.hedging import HedgingPolicy
+from braspag_rest.exceptions import HTTPTimeoutError
+
+if ASYNCIO:
+    from braspag_rest.aio import AsyncioBraspagRequest
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+NOT_AVAILABLE_ID = u'abec4ae4-3315-45af-9111-ac1eecf75400'
+TIMEOUT_ID = u'abec4ae4-3315-45af-9111-ac1eecf75599'
+SLOW_ID = u'abec4ae4-3315-45af-9111-ac1eecf75999'
+
+
+@unittest.skipIf(not ASYNCIO, 'requires python 3.5+ and tornado 5+')
+class AsyncioBraspagRequestTest(AsyncTestCase):
+    def setUp(self):
+        super(AsyncioBraspagRequestTest, self).setUp()
+        self.http_client = FakeHTTPClient(self.handle)
+        self.braspag = AsyncioBraspagRequest(homologation=HOMOLOGATION)
+        self.braspag.http_client = self.http_client
+        self.tornado_braspag = BraspagRequest(homologation=HOMOLOGATION)
+        self.tornado_braspag.http_client = self.http_client
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        if payment_id == NOT_AVAILABLE_ID:
+            body = [{'Code': 308, 'Message': 'Transaction not available'}]
+            return 400, body
+        if payment_id == TIMEOUT_ID:
+            return 599, ''
+        if payment_id == SLOW_ID and len(self.http_client.requests) == 1:
+            return 200, sale_payload(payment_id), 0.5
+        return 200, sale_payload(payment_id), 0.01
+
+    @gen_test
+    def test_same_output_as_tornado_client(self):
+        for transaction_id in (TRANSACTION_ID, NOT_AVAILABLE_ID):
+            response = yield self.braspag.get_transaction_data(
+                transaction_id=transaction_id
+            )
+            expected = yield self.tornado_braspag.get_transaction_data(
+                transaction_id=transaction_id
+            )
+            self.assertEquals(response, expected)
+
+    @gen_test
+    def test_invalid_transaction_id(self):
+        with self.assertRaises(AssertionError):
+            yield self.braspag.get_transaction_data(transaction_id='')
+
+    @gen_test
+    def test_retry(self):
+        self.braspag.retry_policy = RetryPolicy(
+            backoff=0.001, budget=RetryBudget()
+        )
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.braspag.get_transaction_data(transaction_id=TIMEOUT_ID)
+        self.assertEquals(len(self.http_client.requests), 3)
+
+    @gen_test
+    def test_get_transactions_data_coalesces_requests(self):
+        results = yield self.braspag.get_transactions_data(
+            [TRANSACTION_ID, TRANSACTION_ID, TIMEOUT_ID], max_concurrency=3
+        )
+
+        self.assertTrue(results[TRANSACTION_ID]['success'])
+        self.assertIsInstance(results[TIMEOUT_ID], HTTPTimeoutError)
+        self.assertEquals(len(self.http_client.requests), 2)
+        self.assertEquals(self.braspag._in_flight, {})
+
+    @gen_test
+    def test_hedged_fetch(self):
+        self.braspag.hedging_policy = HedgingPolicy(
+            max_delay=0.02, min_samples=100
+        )
+        response = yield self.braspag.get_transaction_data(
+            transaction_id=SLOW_ID
+        )
+
+        self.assertTrue(response['success'])
+        self.assertEquals(len(self.http_client.requests), 2)
+        self.assertEquals(self.braspag.hedging_policy.hedge_wins, 1)
+
+    def test_methods_are_native(self):
+        import asyncio
+        for name in ('get_transaction_data', 'get_transactions_data',
+                     '_update_transaction', 'fetch', '_request'):
+            self.assertTrue(asyncio.iscoroutinefunction(
+                getattr(self.braspag, name)
+            ), name)
+
+    @gen_test
+    def test_capture(self):
+        response = yield self.braspag.capture_transaction(
+            transaction_id=TRANSACTION_ID
+        )
+        self.assertTrue(response['success'])
+        self.assertEquals(self.http_client.requests[0].method, 'PUT')
+
+    @gen_test
+    def test_cancelled_caller_keeps_shared_request(self):
+        import asyncio
+        first = asyncio.ensure_future(
+            self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        )
+        second = asyncio.ensure_future(
+            self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        )
+        yield asyncio.sleep(0)
+        first.cancel()
+
+        response = yield second
+        self.assertTrue(response['success'])
+        self.assertEquals(len(self.http_client.requests), 1)
+
+    @gen_test
+    def test_cancelled_while_waiting_for_a_slot(self):
+        import asyncio
+        self.braspag.max_concurrency = 1
+        self.braspag._concurrency = Semaphore(1)
+        # so the cancellation reaches the request itself
+        self.braspag.coalesce_requests = False
+
+        slow = asyncio.ensure_future(
+            self.braspag.get_transaction_data(transaction_id=SLOW_ID)
+        )
+        with self.assertRaises(asyncio.TimeoutError):
+            yield asyncio.wait_for(
+                self.braspag.get_transaction_data(
+                    transaction_id=TRANSACTION_ID
+                ), 0.05
+            )
+        yield slow
+        # the abandoned wait takes the slot once it's free, then gives it back
+        yield asyncio.sleep(0.01)
+
+        self.assertEquals(self.braspag._concurrency._value, 1)
+        response = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+        self.assertTrue(response['success'])
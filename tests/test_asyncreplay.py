@@ -0,0 +1,148 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+import json
+import shutil
+import tempfile
+
+from .asyncreplay import ReplayHTTPClient
+from .asyncreplay import ReplayRecording
+from .asyncreplay import ReplayRecordingManager
+from .asyncreplay import asyncreplay
+from .asyncreplay import get_body_hash
+from .base import BraspagTestCase
+from .base import sale_payload
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPError
+from tornado.httpclient import HTTPRequest
+from tornado.httpclient import HTTPResponse
+from tornado.httputil import HTTPHeaders
+from tornado.testing import gen_test
+
+from six import BytesIO
+
+
+TRANSACTION_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf7548{0}'.format(i) for i in range(3)
+]
+
+
+def recorded_response(request, code=200, body=b'{}'):
+    return HTTPResponse(
+        request, code, headers=HTTPHeaders({'Content-Type': 'text/json'}),
+        buffer=BytesIO(body), reason='OK'
+    )
+
+
+class AsyncReplayTest(BraspagTestCase):
+    def setUp(self):
+        super(AsyncReplayTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(ReplayRecordingManager.clear)
+        self.path = os.path.join(directory, 'recording.json')
+
+    def record(self, *entries):
+        recording = ReplayRecordingManager.load(self.path)
+        for request, code, body in entries:
+            recording[request] = recorded_response(request, code, body)
+        ReplayRecordingManager.save(recording, self.path)
+        return recording
+
+    def test_body_hash(self):
+        first = HTTPRequest('http://braspag/v2/sales/', 'POST', body='{"a":1}')
+        second = HTTPRequest('http://braspag/v2/sales/', 'POST',
+                             body='{"a":2}')
+        recording = self.record((first, 201, b'first'), (second, 201, b'2'))
+
+        self.assertEquals(recording.to_httpresponse(first).body, b'first')
+        self.assertEquals(recording.to_httpresponse(second).body, b'2')
+        self.assertNotIn(HTTPRequest('http://braspag/v2/sales/', 'POST',
+                                     body='{"a":3}'), recording)
+
+    def test_save_appends(self):
+        first = HTTPRequest('http://braspag/v2/sales/1')
+        self.record((first, 200, b'1'))
+        second = HTTPRequest('http://braspag/v2/sales/2')
+        self.record((second, 200, b'\xff\xfe'))
+
+        with open(self.path) as recording_file:
+            self.assertEquals(len(recording_file.readlines()), 2)
+
+        ReplayRecordingManager.clear()
+        recording = ReplayRecordingManager.load(self.path)
+        self.assertEquals(len(recording), 2)
+        self.assertEquals(recording.to_httpresponse(second).body, b'\xff\xfe')
+
+    def test_legacy_recordings(self):
+        request = HTTPRequest('http://braspag/v2/sales/', 'POST', body='{}')
+        with open(self.path, 'w') as recording_file:
+            json.dump([{
+                'body_hash': '123',
+                'request': {'url': request.url, 'method': 'POST',
+                            'body': '{}'},
+                'response': {'status': {'code': 201, 'message': 'Created'},
+                             'headers': {}, 'body': '{"legacy": true}'},
+            }], recording_file)
+
+        recording = ReplayRecordingManager.load(self.path)
+        self.assertEquals(recording[request]['status']['code'], 201)
+
+        other = HTTPRequest('http://braspag/v2/sales/1')
+        recording[other] = recorded_response(other)
+        ReplayRecordingManager.save(recording, self.path)
+        ReplayRecordingManager.clear()
+        self.assertEquals(len(ReplayRecordingManager.load(self.path)), 2)
+
+    @gen_test
+    def test_replay_only(self):
+        url = self.braspag.query_url + '/v2/sales/{0}'
+        self.record(*[
+            (HTTPRequest(url.format(transaction_id),
+                         headers=self.braspag.headers(None)),
+             200, json.dumps(sale_payload(transaction_id)).encode('utf-8'))
+            for transaction_id in TRANSACTION_IDS[:2]
+        ])
+
+        with asyncreplay(self.path, replay_only=True):
+            self.braspag.http_client = AsyncHTTPClient()
+            response = yield self.braspag.get_transaction_data(
+                transaction_id=TRANSACTION_IDS[0]
+            )
+            self.assertTrue(response['success'])
+
+            with self.assertRaises(HTTPError) as context:
+                yield self.braspag.get_transaction_data(
+                    transaction_id=TRANSACTION_IDS[2]
+                )
+            self.assertEquals(context.exception.code, 599)
+
+    @gen_test
+    def test_concurrent_replay(self):
+        url = self.braspag.query_url + '/v2/sales/{0}'
+        transaction_ids = [
+            u'abec4ae4-3315-45af-9111-ac1eecf{0:05d}'.format(i)
+            for i in range(2000)
+        ]
+        recording = ReplayRecording()
+        for transaction_id in transaction_ids:
+            request = HTTPRequest(url.format(transaction_id))
+            recording[request] = recorded_response(
+                request, body=json.dumps(
+                    sale_payload(transaction_id)
+                ).encode('utf-8')
+            )
+
+        self.braspag.http_client = ReplayHTTPClient(recording)
+        results = yield self.braspag.get_transactions_data(
+            transaction_ids, max_concurrency=500
+        )
+        self.assertEquals(len(results), 2000)
+        self.assertTrue(all(r['success'] for r in results.values()))
+        self.assertEquals(self.braspag.http_client.requests, 2000)
+
+    def test_get_body_hash(self):
+        self.assertEquals(get_body_hash(None), get_body_hash(b''))
+        self.assertEquals(get_body_hash(u'{}'), get_body_hash(b'{}'))
@@ -0,0 +1,242 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from tornado.testing import gen_test
+
+from braspag_rest.bulk import BulkProcessor
+from braspag_rest.bulk import CAPTURE
+from braspag_rest.bulk import REFUND
+from braspag_rest.bulk import VOID
+from braspag_rest.bulk import operation
+from braspag_rest.cache import TransactionCache
+from braspag_rest.retry import RetryPolicy
+from braspag_rest.constants import AUTHORIZED
+from braspag_rest.constants import PAYMENT_CONFIRMED
+from braspag_rest.constants import VOIDED
+from braspag_rest.simulator import BraspagSimulator
+from braspag_rest.simulator import create_client
+
+
+TRANSACTION_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf754{0:02d}'.format(i) for i in range(20)
+]
+INVALID_ID = u'abec4ae4-3315-45af-9111-ac1eecf75498'
+FLAKY_ID = u'abec4ae4-3315-45af-9111-ac1eecf75599'
+NOT_FOUND_ID = u'abec4ae4-3315-45af-9111-ac1eecf75497'
+
+
+class UpdateTransactionTest(BraspagTestCase):
+    def setUp(self):
+        super(UpdateTransactionTest, self).setUp()
+        self.simulator = BraspagSimulator(statuses={AUTHORIZED: 1})
+        self.braspag = create_client(self.simulator.listen(0))
+
+    def tearDown(self):
+        self.simulator.stop()
+        super(UpdateTransactionTest, self).tearDown()
+
+    @gen_test
+    def test_capture(self):
+        response = yield self.braspag.capture_transaction(
+            transaction_id=TRANSACTION_IDS[0], amount=1000
+        )
+        self.assertEquals(response, {
+            'success': True,
+            'transaction': {
+                'status': PAYMENT_CONFIRMED,
+                'return_code': '0',
+                'return_message': 'Operation Successful',
+            },
+        })
+        payment = self.simulator.sales[TRANSACTION_IDS[0]]['Payment']
+        self.assertEquals(payment['CapturedAmount'], 1000)
+
+    @gen_test
+    def test_void_and_refund(self):
+        response = yield self.braspag.void_transaction(
+            transaction_id=TRANSACTION_IDS[0]
+        )
+        self.assertEquals(response['transaction']['status'], VOIDED)
+
+        response = yield self.braspag.refund_transaction(
+            transaction_id=TRANSACTION_IDS[0]
+        )
+        self.assertEquals(response['success'], False)
+        self.assertEquals(response['errors'][0]['code'], 308)
+
+    @gen_test
+    def test_invalidates_cache(self):
+        self.braspag.cache = TransactionCache(pending_ttl=60)
+        data = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_IDS[0]
+        )
+        self.assertEquals(data['transaction']['status'], AUTHORIZED)
+
+        yield self.braspag.capture_transaction(
+            transaction_id=TRANSACTION_IDS[0]
+        )
+        data = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_IDS[0]
+        )
+        self.assertEquals(data['transaction']['status'], PAYMENT_CONFIRMED)
+
+    def test_update_resource(self):
+        self.assertEquals(
+            self.braspag._get_update_resource(
+                'capture', transaction_id=TRANSACTION_IDS[0], amount=100,
+                service_tax_amount=10
+            ),
+            '/v2/sales/{0}/capture?amount=100&serviceTaxAmount=10'.format(
+                TRANSACTION_IDS[0]
+            )
+        )
+
+
+class BulkProcessorTest(BraspagTestCase):
+    def setUp(self):
+        super(BulkProcessorTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.checkpoint = os.path.join(directory, 'checkpoint.jsonl')
+
+        self.flaky = True
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.braspag.retry_policy = RetryPolicy(max_attempts=1)
+
+    def handle(self, request):
+        payment_id = request.url.split('/')[-2]
+        if payment_id == INVALID_ID:
+            return 400, [{'Code': 308, 'Message': 'Not available'}]
+        if payment_id == NOT_FOUND_ID:
+            return 404, ''
+        if payment_id == FLAKY_ID and self.flaky:
+            return 503, ''
+        return 200, {'Status': PAYMENT_CONFIRMED}
+
+    def operations(self):
+        for transaction_id in TRANSACTION_IDS + [INVALID_ID, FLAKY_ID]:
+            yield operation(CAPTURE, transaction_id)
+
+    def test_operation_request_id(self):
+        first = operation(CAPTURE, TRANSACTION_IDS[0], 100)
+        self.assertEquals(first, operation(CAPTURE, TRANSACTION_IDS[0], 100))
+        self.assertNotEquals(first.request_id,
+                             operation(VOID, TRANSACTION_IDS[0]).request_id)
+        self.assertEquals(operation(REFUND, TRANSACTION_IDS[0],
+                                    request_id='abc').key, 'abc')
+        self.assertRaises(ValueError, operation, 'cancel', TRANSACTION_IDS[0])
+
+    def test_partial_refunds(self):
+        # two refunds of the same amount are different operations
+        self.assertRaises(ValueError, operation, REFUND, TRANSACTION_IDS[0],
+                          100)
+        self.assertRaises(ValueError, operation, VOID, TRANSACTION_IDS[0], 100)
+        first = operation(REFUND, TRANSACTION_IDS[0], 100, request_id='r1')
+        second = operation(REFUND, TRANSACTION_IDS[0], 100, request_id='r2')
+        self.assertNotEquals(first.key, second.key)
+        self.assertEquals(operation(REFUND, TRANSACTION_IDS[0]).key,
+                          operation(REFUND, TRANSACTION_IDS[0]).key)
+
+    @gen_test
+    def test_run(self):
+        outcomes = []
+        processor = BulkProcessor(self.braspag, max_concurrency=5)
+        results = yield processor.run(
+            self.operations(), callback=lambda op, o: outcomes.append(o)
+        )
+
+        self.assertEquals(len(results), 22)
+        self.assertEquals(len(outcomes), 22)
+        self.assertEquals(processor.stats(), {
+            'succeeded': 20, 'failed': 2, 'skipped': 0
+        })
+
+        invalid = results[operation(CAPTURE, INVALID_ID).key]
+        self.assertEquals(invalid, {
+            'success': False,
+            'errors': [{'code': 308, 'message': 'Not available'}],
+        })
+        flaky = results[operation(CAPTURE, FLAKY_ID).key]
+        self.assertTrue(flaky['retryable'])
+        self.assertEquals(flaky['errors'][0]['code'], 503)
+
+        # the same request id is sent for the same operation
+        request_ids = [r.headers['RequestId']
+                       for r in self.braspag.http_client.requests]
+        self.assertIn(operation(CAPTURE, TRANSACTION_IDS[0]).request_id,
+                      request_ids)
+
+    @gen_test
+    def test_resume_from_checkpoint(self):
+        processor = BulkProcessor(self.braspag, checkpoint=self.checkpoint)
+        yield processor.run(self.operations())
+        self.assertEquals(len(self.braspag.http_client.requests), 22)
+
+        self.flaky = False
+        processor = BulkProcessor(self.braspag, checkpoint=self.checkpoint)
+        results = yield processor.run(self.operations())
+
+        # only the operation that failed for a transient reason runs again
+        self.assertEquals(len(self.braspag.http_client.requests), 23)
+        self.assertEquals(processor.stats(), {
+            'succeeded': 1, 'failed': 0, 'skipped': 21
+        })
+        self.assertTrue(results[operation(CAPTURE, FLAKY_ID).key]['success'])
+        self.assertFalse(
+            results[operation(CAPTURE, INVALID_ID).key]['success']
+        )
+
+    @gen_test
+    def test_unexpected_errors(self):
+        operations = list(self.operations())
+        operations.insert(3, operation(CAPTURE, 'not-a-guid'))
+
+        processor = BulkProcessor(self.braspag, max_concurrency=5,
+                                  checkpoint=self.checkpoint)
+        results = yield processor.run(operations)
+
+        self.assertEquals(len(results), 23)
+        invalid = results[operation(CAPTURE, 'not-a-guid').key]
+        self.assertFalse(invalid['success'])
+        self.assertNotIn('retryable', invalid)
+        self.assertEquals(processor.stats(), {
+            'succeeded': 20, 'failed': 3, 'skipped': 0
+        })
+        # journaled, so not run again
+        self.assertIn(operation(CAPTURE, 'not-a-guid').key,
+                      processor.checkpoint.load())
+
+    @gen_test
+    def test_permanent_http_errors(self):
+        operations = [operation(CAPTURE, NOT_FOUND_ID),
+                      operation(CAPTURE, FLAKY_ID)]
+        processor = BulkProcessor(self.braspag, checkpoint=self.checkpoint)
+        results = yield processor.run(operations)
+
+        not_found = results[operation(CAPTURE, NOT_FOUND_ID).key]
+        self.assertEquals(not_found['errors'][0]['code'], 404)
+        self.assertNotIn('retryable', not_found)
+
+        # only the 503 is sent again
+        processor = BulkProcessor(self.braspag, checkpoint=self.checkpoint)
+        yield processor.run(operations)
+        self.assertEquals(len(self.braspag.http_client.requests), 3)
+        self.assertEquals(processor.stats(), {
+            'succeeded': 0, 'failed': 1, 'skipped': 1
+        })
+
+    @gen_test
+    def test_truncated_checkpoint(self):
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write('{"key": "abc", "outc')
+
+        processor = BulkProcessor(self.braspag, checkpoint=self.checkpoint)
+        results = yield processor.run(self.operations())
+        self.assertEquals(len(results), 22)
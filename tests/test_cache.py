@@ -0,0 +1,104 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest.cache import TransactionCache
+from braspag_rest.constants import AUTHORIZED
+from braspag_rest.constants import PAYMENT_CONFIRMED
+from braspag_rest.constants import VOIDED
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+def response(status):
+    return {'success': True, 'transaction': {'status': status}}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TransactionCacheTest(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = TransactionCache(
+            max_size=2, terminal_ttl=60, pending_ttl=5, clock=self.clock
+        )
+
+    def test_ttl_depends_on_status(self):
+        self.cache.set('confirmed', response(PAYMENT_CONFIRMED))
+        self.cache.set('authorized', response(AUTHORIZED))
+
+        self.clock.now += 10
+        self.assertIsNotNone(self.cache.get('confirmed'))
+        self.assertIsNone(self.cache.get('authorized'))
+        self.assertEquals(self.cache.expirations, 1)
+
+    def test_zero_ttl_is_not_cached(self):
+        cache = TransactionCache(pending_ttl=0)
+        cache.set('authorized', response(AUTHORIZED))
+        self.assertEquals(len(cache), 0)
+
+    def test_failed_responses_are_not_cached(self):
+        self.cache.set('failed', {'success': False, 'errors': []})
+        self.assertEquals(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', response(VOIDED))
+        self.cache.set('b', response(VOIDED))
+        self.cache.get('a')
+        self.cache.set('c', response(VOIDED))
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEquals(self.cache.stats(), {
+            'size': 2,
+            'hits': 2,
+            'misses': 1,
+            'evictions': 1,
+            'expirations': 0,
+        })
+
+
+class GetTransactionDataCacheTest(BraspagTestCase):
+    def setUp(self):
+        super(GetTransactionDataCacheTest, self).setUp()
+        self.braspag.cache = TransactionCache()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.status = PAYMENT_CONFIRMED
+
+    def handle(self, request):
+        return 200, sale_payload(TRANSACTION_ID, status=self.status)
+
+    @gen_test
+    def test_terminal_transaction_is_cached(self):
+        first = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+        second = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+
+        self.assertIs(first, second)
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+        self.assertEquals(self.braspag.cache.hits, 1)
+
+    @gen_test
+    def test_pending_transaction_is_not_cached(self):
+        self.status = AUTHORIZED
+        yield self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        yield self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
@@ -0,0 +1,149 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+from tornado.httpclient import HTTPError
+
+from braspag_rest import BraspagRequest
+from braspag_rest.circuitbreaker import CircuitBreaker
+from braspag_rest.circuitbreaker import CLOSED
+from braspag_rest.circuitbreaker import OPEN
+from braspag_rest.circuitbreaker import HALF_OPEN
+from braspag_rest.exceptions import CircuitBreakerOpenError
+from braspag_rest.exceptions import DeadlineExceededError
+from braspag_rest.exceptions import RateLimitExceededError
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(
+            'query', failure_rate=0.5, min_requests=4, window=10,
+            slow_call_duration=1, reset_timeout=5, clock=self.clock
+        )
+
+    def call(self, duration=0.1, error=None):
+        self.breaker.before_request()
+        self.breaker.record(duration, error)
+
+    def test_opens_on_error_rate(self):
+        self.call()
+        self.call()
+        self.call(error=HTTPTimeoutError(599))
+        self.assertEquals(self.breaker.state, CLOSED)
+
+        self.call(error=HTTPError(503))
+        self.assertEquals(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitBreakerOpenError):
+            self.breaker.before_request()
+
+    def test_client_errors_do_not_count(self):
+        for _ in range(4):
+            self.call(error=HTTPError(400))
+        self.assertEquals(self.breaker.state, CLOSED)
+
+    def test_opens_on_latency(self):
+        for _ in range(2):
+            self.call()
+            self.call(duration=2)
+        self.assertEquals(self.breaker.state, OPEN)
+
+    def test_old_calls_leave_the_window(self):
+        self.call(error=HTTPError(503))
+        self.call(error=HTTPError(503))
+        self.clock.now += 11
+        self.call()
+        self.call()
+        self.assertEquals(self.breaker.state, CLOSED)
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.call(error=HTTPError(503))
+
+        self.clock.now += 5
+        self.assertEquals(self.breaker.state, HALF_OPEN)
+        self.breaker.before_request()
+        # only one probe at a time
+        with self.assertRaises(CircuitBreakerOpenError):
+            self.breaker.before_request()
+
+        self.breaker.record(0.1, HTTPError(503))
+        self.assertEquals(self.breaker.state, OPEN)
+
+        self.clock.now += 5
+        self.call()
+        self.assertEquals(self.breaker.state, CLOSED)
+
+    def test_unsent_probe(self):
+        for _ in range(4):
+            self.call(error=HTTPError(503))
+
+        self.clock.now += 5
+        self.breaker.before_request()
+        self.breaker.record(0, DeadlineExceededError())
+        # not a successful probe, but the slot is free again
+        self.assertEquals(self.breaker.state, HALF_OPEN)
+        self.breaker.before_request()
+        self.breaker.record(0, RateLimitExceededError('query', 1.0))
+        self.assertEquals(self.breaker.state, HALF_OPEN)
+
+        self.call()
+        self.assertEquals(self.breaker.state, CLOSED)
+
+
+class RequestCircuitBreakerTest(BraspagTestCase):
+    def setUp(self):
+        super(RequestCircuitBreakerTest, self).setUp()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.braspag.circuit_breakers = {
+            'query': CircuitBreaker('query', min_requests=2),
+            'transaction': CircuitBreaker('transaction', min_requests=2),
+        }
+
+    def handle(self, request):
+        if request.url.startswith(self.braspag.query_url):
+            return 599, ''
+        return 200, sale_payload(TRANSACTION_ID)
+
+    @gen_test
+    def test_endpoints_are_tracked_separately(self):
+        for _ in range(2):
+            with self.assertRaises(HTTPTimeoutError):
+                yield self.braspag.get_transaction_data(
+                    transaction_id=TRANSACTION_ID
+                )
+
+        with self.assertRaises(CircuitBreakerOpenError):
+            yield self.braspag.get_transaction_data(
+                transaction_id=TRANSACTION_ID
+            )
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+
+        yield self.braspag._request('/v2/sales/', 'POST', {})
+        self.assertEquals(self.braspag.circuit_breaker_state(), {
+            'query': OPEN,
+            'transaction': CLOSED,
+        })
+
+    def test_circuit_breaker_option(self):
+        braspag = BraspagRequest(circuit_breaker={'reset_timeout': 3})
+        self.assertEquals(braspag.circuit_breakers['query'].reset_timeout, 3)
+        self.assertEquals(BraspagRequest().circuit_breaker_state(), {})
@@ -0,0 +1,100 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest.ratelimit import BULK
+from braspag_rest.exceptions import HTTPTimeoutError
+from braspag_rest.exceptions import DeadlineExceededError
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+OTHER_TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548c'
+
+
+class RequestCoalescingTest(BraspagTestCase):
+    def setUp(self):
+        super(RequestCoalescingTest, self).setUp()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.code = 200
+        self.latency = 0.01
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        if self.code == 400:
+            body = [{'Code': 308, 'Message': 'Transaction not available'}]
+            return 400, body, 0.01
+        if request.request_timeout < self.latency:
+            return 599, '', request.request_timeout
+        return self.code, sale_payload(payment_id), self.latency
+
+    def get(self, transaction_id=TRANSACTION_ID, **kwargs):
+        return self.braspag.get_transaction_data(
+            transaction_id=transaction_id, **kwargs
+        )
+
+    @gen_test
+    def test_concurrent_requests_share_one_fetch(self):
+        responses = yield [self.get(), self.get(), self.get()]
+
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+        self.assertEquals(responses[0], responses[1])
+        self.assertEquals(responses[0], responses[2])
+        self.assertEquals(self.braspag._in_flight, {})
+
+    @gen_test
+    def test_different_urls_are_not_coalesced(self):
+        yield [self.get(), self.get(OTHER_TRANSACTION_ID)]
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+
+    @gen_test
+    def test_sequential_requests_are_not_coalesced(self):
+        yield self.get()
+        yield self.get()
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+
+    @gen_test
+    def test_coalescing_disabled(self):
+        self.braspag.coalesce_requests = False
+        yield [self.get(), self.get()]
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+
+    @gen_test
+    def test_timeout_reaches_every_waiter(self):
+        self.code = 599
+        futures = [self.get(), self.get()]
+        for future in futures:
+            with self.assertRaises(HTTPTimeoutError):
+                yield future
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+
+    @gen_test
+    def test_braspag_errors_reach_every_waiter(self):
+        self.code = 400
+        responses = yield [self.get(), self.get()]
+        for response in responses:
+            self.assertFalse(response['success'])
+            self.assertEquals(response['errors'][0]['code'], 308)
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+
+    @gen_test
+    def test_shorter_deadlines_are_not_shared(self):
+        self.latency = 0.2
+        short = self.get(deadline=0.05)
+        responses = yield [self.get(), self.get(deadline=5)]
+
+        with self.assertRaises((HTTPTimeoutError, DeadlineExceededError)):
+            yield short
+        self.assertTrue(responses[0]['success'])
+        self.assertTrue(responses[1]['success'])
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+        self.assertEquals(self.braspag._in_flight, {})
+
+    @gen_test
+    def test_priorities_are_not_shared(self):
+        yield [self.get(), self.get(priority=BULK)]
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
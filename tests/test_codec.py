@@ -0,0 +1,75 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import json
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from tornado.testing import gen_test
+
+from braspag_rest import BraspagRequest
+from braspag_rest.codec import JSONCodec
+from braspag_rest.codec import get_codec
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class CountingCodec(JSONCodec):
+    def __init__(self):
+        self.loaded = []
+
+    def loads(self, data):
+        self.loaded.append(data)
+        return super(CountingCodec, self).loads(data)
+
+
+class CodecTest(TestCase):
+    def test_get_codec(self):
+        self.assertEquals(get_codec('json').name, 'json')
+        self.assertIn(get_codec().name, ('orjson', 'ujson', 'json'))
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_loads_bytes(self):
+        data = {u'Holder': u'Jos\xe9 da Silva', u'Amount': 100}
+        encoded = json.dumps(data).encode('utf-8')
+        for name in ('orjson', 'ujson', 'json'):
+            try:
+                codec = get_codec(name)
+            except ImportError:
+                continue
+            self.assertEquals(codec.loads(encoded), data)
+            self.assertEquals(codec.loads(codec.dumps(data)), data)
+
+    def test_client_codec(self):
+        self.assertEquals(BraspagRequest(codec='json').codec.name, 'json')
+
+        braspag = BraspagRequest(codec=JSONCodec())
+        self.assertEquals(braspag.ensure_json({'a': 1}), '{"a": 1}')
+        self.assertEquals(braspag.ensure_json('{"a": 1}'), '{"a": 1}')
+        self.assertEquals(braspag.ensure_json(b'{"a": 1}'), b'{"a": 1}')
+        self.assertIsNone(braspag.ensure_json(None))
+
+
+class ClientCodecTest(BraspagTestCase):
+    def setUp(self):
+        super(ClientCodecTest, self).setUp()
+        self.braspag.codec = CountingCodec()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+
+    def handle(self, request):
+        return 400, [{'Code': 308, 'Message': 'Transaction not available'}]
+
+    @gen_test
+    def test_error_body_uses_codec(self):
+        response = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+
+        self.assertFalse(response['success'])
+        self.assertEquals(len(self.braspag.codec.loaded), 1)
+        self.assertIsInstance(self.braspag.codec.loaded[0], bytes)
@@ -0,0 +1,133 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest.pool import ConnectionPool
+from braspag_rest.retry import RetryBudget
+from braspag_rest.retry import RetryPolicy
+from braspag_rest.deadline import Deadline
+from braspag_rest.circuitbreaker import is_failure
+from braspag_rest.exceptions import HTTPTimeoutError
+from braspag_rest.exceptions import DeadlineExceededError
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DeadlineTest(TestCase):
+    def test_remaining(self):
+        clock = Clock()
+        deadline = Deadline(2, clock=clock)
+        self.assertEquals(deadline.remaining(), 2)
+        self.assertFalse(deadline.expired)
+
+        clock.now += 3
+        self.assertEquals(deadline.remaining(), 0)
+        self.assertTrue(deadline.expired)
+        with self.assertRaises(DeadlineExceededError):
+            deadline.check()
+
+    def test_coerce(self):
+        deadline = Deadline(at=10)
+        self.assertIs(Deadline.coerce(deadline), deadline)
+        self.assertIsNone(Deadline.coerce(None))
+        self.assertLessEqual(Deadline.coerce(5).remaining(), 5)
+
+    def test_not_retryable_nor_a_failure(self):
+        error = DeadlineExceededError()
+        self.assertIsInstance(error, HTTPTimeoutError)
+        self.assertFalse(RetryPolicy().is_retryable(error))
+        self.assertFalse(is_failure(error))
+
+
+class DeadlinePropagationTest(BraspagTestCase):
+    def setUp(self):
+        super(DeadlinePropagationTest, self).setUp()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.responses = []
+
+    def handle(self, request):
+        return self.responses.pop(0)
+
+    def get(self, deadline, **kwargs):
+        return self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID, deadline=deadline, **kwargs
+        )
+
+    @gen_test
+    def test_timeouts_sized_from_deadline(self):
+        self.braspag.connect_timeout = 5
+        self.responses = [(200, sale_payload(TRANSACTION_ID))]
+        yield self.get(2)
+
+        request = self.braspag.http_client.requests[0]
+        self.assertLessEqual(request.request_timeout, 2)
+        self.assertLessEqual(request.connect_timeout, 2)
+        self.assertGreater(request.request_timeout, 1.9)
+
+    @gen_test
+    def test_expired_deadline_sends_nothing(self):
+        with self.assertRaises(DeadlineExceededError):
+            yield self.get(Deadline(at=0))
+        self.assertEquals(self.braspag.http_client.requests, [])
+
+    @gen_test
+    def test_no_retry_past_deadline(self):
+        self.braspag.retry_policy = RetryPolicy(
+            backoff=0.2, jitter=False, budget=RetryBudget()
+        )
+        self.responses = [(599, ''), (200, sale_payload(TRANSACTION_ID))]
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.get(0.1)
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+
+        # the retry the deadline cancelled spent no budget
+        self.assertEquals(self.braspag.retry_policy.budget.tokens, 10)
+        self.assertEquals(self.braspag.retry_policy.retries, 0)
+
+    @gen_test
+    def test_retries_within_deadline(self):
+        self.braspag.retry_policy = RetryPolicy(
+            backoff=0.01, jitter=False, budget=RetryBudget()
+        )
+        self.responses = [(599, ''), (200, sale_payload(TRANSACTION_ID))]
+        response = yield self.get(1)
+        self.assertTrue(response['success'])
+
+    @gen_test
+    def test_coalesced_waiter_uses_its_own_deadline(self):
+        self.responses = [(200, sale_payload(TRANSACTION_ID), 0.2)]
+        first = self.get(1)
+        with self.assertRaises(DeadlineExceededError):
+            yield self.get(0.05)
+
+        response = yield first
+        self.assertTrue(response['success'])
+
+    @gen_test
+    def test_queue_wait_counts_against_deadline(self):
+        self.braspag.http_client = ConnectionPool(
+            max_clients=1, http_client=self.braspag.http_client
+        )
+        self.responses = [(200, sale_payload(TRANSACTION_ID), 0.2)]
+        self.braspag.coalesce_requests = False
+
+        first = self.get(1)
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.get(0.05)
+        yield first
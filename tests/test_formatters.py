@@ -0,0 +1,220 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import random
+
+from datetime import datetime
+from unittest import TestCase
+
+from braspag_rest.core import BraspagResponse
+from braspag_rest.formatters import compile_formatter
+from braspag_rest.formatters import field
+from braspag_rest.formatters import parse_datetime
+
+
+def legacy_format_transactions(braspag_transactions):
+    """`BraspagResponse.format_transactions` before the field table"""
+    transactions = []
+
+    if not isinstance(braspag_transactions, list):
+        braspag_transactions = [braspag_transactions]
+
+    for transaction in braspag_transactions:
+        data = {
+            'status': int(transaction.get('Status')),
+            'braspag_transaction_id': transaction.get('PaymentId'),
+            'acquirer_transaction_id': transaction.get(
+                'AcquirerTransactionId'
+            ),
+            'authorization_code': transaction.get('AuthorizationCode'),
+            'proof_of_sale': transaction.get('ProofOfSale'),
+        }
+
+        credit_card = transaction.get('CreditCard', {})
+
+        if 'Amount' in transaction:
+            data['amount'] = int(transaction.get('Amount'))
+
+        if 'VoidedAmount' in transaction:
+            data['voided_amount'] = int(transaction.get('VoidedAmount'))
+
+        if 'CardNumber' in credit_card:
+            data['masked_credit_card_number'] = credit_card.get(
+                'CardNumber'
+            )
+
+        if 'Brand' in credit_card:
+            data['payment_method_name'] = credit_card.get('Brand')
+
+        if 'Holder' in credit_card:
+            data['holder_name'] = credit_card.get('Holder')
+
+        if 'ExpirationDate' in credit_card:
+            data['expiration_date'] = credit_card.get('ExpirationDate')
+
+        if 'ReturnCode' in transaction:
+            data['return_code'] = transaction.get('ReturnCode')
+
+        if 'ReturnMessage' in transaction:
+            data['return_message'] = transaction.get('ReturnMessage')
+
+        if 'Provider' in transaction:
+            data['payment_method'] = transaction.get('Provider')
+
+        if 'Capture' in transaction:
+            data['capture'] = transaction.get('Capture')
+
+        if 'Authenticate' in transaction:
+            data['autenticate'] = transaction.get('Authenticate')
+
+        if 'Type' in transaction:
+            data['transaction_type'] = transaction.get('Type')
+
+        if 'Installments' in transaction:
+            data['installments'] = int(transaction.get('Installments'))
+
+        if 'Country' in transaction:
+            data['country'] = transaction.get('Country')
+
+        if 'ServiceTaxAmount' in transaction:
+            data['service_tax_amount'] = int(
+                transaction.get('ServiceTaxAmount')
+            )
+
+        if 'ReceivedDate' in transaction:
+            data['received_date'] = datetime.strptime(
+                transaction.get('ReceivedDate'), '%Y-%m-%d %H:%M:%S'
+            )
+
+        if 'Interest' in transaction:
+            data['interest'] = transaction.get('Interest')
+
+        if 'ReasonCode' in transaction:
+            data['reason_code'] = transaction.get('ReasonCode')
+
+        if 'ReasonMessage' in transaction:
+            data['reason_message'] = transaction.get('ReasonMessage')
+
+        if 'ProviderReturnCode' in transaction:
+            data['acquirer_return_code'] = transaction.get(
+                'ProviderReturnCode'
+            )
+
+        if 'ProviderReturnMessage' in transaction:
+            data['acquirer_return_message'] = transaction.get(
+                'ProviderReturnMessage'
+            )
+
+        transactions.append(data)
+
+    return transactions
+
+
+PAYMENT = {
+    'PaymentId': 'abec4ae4-3315-45af-9111-ac1eecf7548b',
+    'AcquirerTransactionId': '0624105251960',
+    'AuthorizationCode': '123456',
+    'ProofOfSale': '105251960',
+    'Status': 2,
+    'Amount': 15700,
+    'VoidedAmount': 0,
+    'ReturnCode': '6',
+    'ReturnMessage': 'Operation Successful',
+    'Provider': 'Simulado',
+    'Capture': True,
+    'Authenticate': False,
+    'Type': 'CreditCard',
+    'Installments': 3,
+    'Country': 'BRA',
+    'ServiceTaxAmount': 0,
+    'ReceivedDate': '2015-06-24 10:52:51',
+    'Interest': 'ByMerchant',
+    'ReasonCode': 0,
+    'ReasonMessage': 'Successful',
+    'ProviderReturnCode': '6',
+    'ProviderReturnMessage': 'Operation Successful',
+    'CreditCard': {
+        'CardNumber': '000000******0001',
+        'Holder': 'Jose da Silva',
+        'ExpirationDate': '05/2018',
+        'Brand': 'Visa',
+    },
+}
+
+
+def random_payments(count, seed=42):
+    """Payments missing a random subset of the optional fields"""
+    rnd = random.Random(seed)
+    optional = [key for key in PAYMENT if key != 'Status']
+    for _ in range(count):
+        payment = dict((key, PAYMENT[key]) for key in optional
+                       if rnd.random() < 0.5)
+        payment['Status'] = rnd.choice([0, 1, 2, 3, 10, 11, 12, 13, 20])
+        if 'CreditCard' in payment:
+            payment['CreditCard'] = dict(
+                (key, value) for key, value in PAYMENT['CreditCard'].items()
+                if rnd.random() < 0.5
+            )
+        yield payment
+
+
+class FormatTransactionsTest(TestCase):
+    def assertIdentical(self, payments):
+        expected = legacy_format_transactions(payments)
+        formatted = BraspagResponse.format_transactions(payments)
+
+        self.assertEquals(formatted, expected)
+        for data, expected_data in zip(formatted, expected):
+            self.assertEquals(list(data.items()), list(expected_data.items()))
+
+    def test_full_payment(self):
+        self.assertIdentical([PAYMENT])
+        self.assertIdentical(PAYMENT)
+
+    def test_minimal_payment(self):
+        self.assertIdentical([{'Status': '1'}])
+
+    def test_random_payments(self):
+        self.assertIdentical(list(random_payments(500)))
+
+    def test_format_get_transactions_data(self):
+        responses = [{'MerchantOrderId': str(i), 'Payment': payment}
+                     for i, payment in enumerate(random_payments(10))]
+        self.assertEquals(
+            BraspagResponse.format_get_transactions_data(responses),
+            [BraspagResponse.format_get_transaction_data(response)
+             for response in responses]
+        )
+
+    def test_compile_formatter(self):
+        format_payment = compile_formatter([
+            field('id', 'PaymentId', optional=False),
+            field('amount', 'Amount', int),
+            field('brand', 'Brand', credit_card=True),
+        ])
+        self.assertEquals(
+            format_payment({'Amount': '10', 'CreditCard': {'Brand': 'Visa'}}),
+            {'id': None, 'amount': 10, 'brand': 'Visa'}
+        )
+
+
+class ParseDatetimeTest(TestCase):
+    def test_fixed_format(self):
+        self.assertEquals(
+            parse_datetime('2015-06-24 10:52:51'),
+            datetime(2015, 6, 24, 10, 52, 51)
+        )
+
+    def test_same_as_strptime(self):
+        for value in ['2015-6-4 1:02:03', '2016-02-29 23:59:59']:
+            self.assertEquals(
+                parse_datetime(value),
+                datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+            )
+
+    def test_invalid_dates(self):
+        for value in ['2015-13-01 10:00:00', '2015-02-30 10:00:00',
+                      '2015-06-24 10:52:51\n', '2015-06-24T10:52:51', '']:
+            with self.assertRaises(ValueError):
+                parse_datetime(value)
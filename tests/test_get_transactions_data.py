@@ -0,0 +1,76 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+TRANSACTION_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf7548{0}'.format(i) for i in range(6)
+]
+
+
+class GetTransactionsDataTest(BraspagTestCase):
+    def setUp(self):
+        super(GetTransactionsDataTest, self).setUp()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        if payment_id.endswith('5'):
+            return 599, ''
+        return 200, sale_payload(payment_id), 0.01
+
+    @gen_test
+    def test_get_transactions_data(self):
+        streamed = []
+        results = yield self.braspag.get_transactions_data(
+            TRANSACTION_IDS,
+            max_concurrency=2,
+            callback=lambda tid, result: streamed.append(tid)
+        )
+
+        self.assertEquals(sorted(streamed), sorted(TRANSACTION_IDS))
+        self.assertEquals(set(results), set(TRANSACTION_IDS))
+        for transaction_id in TRANSACTION_IDS[:5]:
+            result = results[transaction_id]
+            self.assertTrue(result['success'])
+            self.assertEquals(
+                result['transaction']['braspag_transaction_id'],
+                transaction_id
+            )
+        self.assertIsInstance(results[TRANSACTION_IDS[5]], HTTPTimeoutError)
+
+    @gen_test
+    def test_get_transactions_data_invalid_id(self):
+        results = yield self.braspag.get_transactions_data(['invalid'])
+        self.assertIsInstance(results['invalid'], AssertionError)
+        self.assertEquals(self.braspag.http_client.requests, [])
+
+    @gen_test
+    def test_get_transactions_data_bounded_concurrency(self):
+        client = self.braspag.http_client
+        original_fetch = client.fetch
+
+        def fetch(request, **kwargs):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            future = original_fetch(request, **kwargs)
+            future.add_done_callback(lambda f: self.track_done())
+            return future
+
+        client.fetch = fetch
+        yield self.braspag.get_transactions_data(
+            TRANSACTION_IDS, max_concurrency=3
+        )
+        self.assertEquals(self.max_in_flight, 3)
+
+    def track_done(self):
+        self.in_flight -= 1
@@ -0,0 +1,124 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado import gen
+from tornado.testing import gen_test
+
+from braspag_rest.hedging import HedgingPolicy
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class HedgingPolicyTest(TestCase):
+    def test_delay(self):
+        policy = HedgingPolicy(percentile=50, min_delay=0.01, max_delay=0.5,
+                               min_samples=3, refresh_every=1)
+        self.assertEquals(policy.delay(), 0.5)
+
+        for latency in (0.1, 0.2, 0.3):
+            policy.record_latency(latency)
+        self.assertEquals(policy.delay(), 0.2)
+
+        for latency in (0.001, 0.001, 0.001, 0.001):
+            policy.record_latency(latency)
+        self.assertEquals(policy.delay(), 0.01)
+
+    def test_delay_is_cached(self):
+        policy = HedgingPolicy(percentile=50, min_delay=0.01, max_delay=0.5,
+                               min_samples=3, refresh_every=4)
+        for latency in (0.1, 0.2, 0.3):
+            policy.record_latency(latency)
+        self.assertEquals(policy.delay(), 0.2)
+
+        for latency in (0.001, 0.001, 0.001):
+            policy.record_latency(latency)
+        self.assertEquals(policy.delay(), 0.2)
+
+        policy.record_latency(0.001)
+        self.assertEquals(policy.delay(), 0.01)
+
+    def test_hedge_budget(self):
+        policy = HedgingPolicy(max_hedge_ratio=0.5, burst=1)
+        self.assertTrue(policy.allow_hedge())
+        self.assertFalse(policy.allow_hedge())
+
+        policy.start_request()
+        policy.start_request()
+        self.assertTrue(policy.allow_hedge())
+        self.assertEquals(policy.hedges, 2)
+
+
+class HedgedFetchTest(BraspagTestCase):
+    def setUp(self):
+        super(HedgedFetchTest, self).setUp()
+        self.braspag.hedging_policy = HedgingPolicy(
+            max_delay=0.02, min_samples=100
+        )
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.responses = []
+
+    def handle(self, request):
+        return self.responses.pop(0)
+
+    def get(self):
+        return self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+
+    @gen_test
+    def test_fast_response_is_not_hedged(self):
+        self.responses = [(200, sale_payload(TRANSACTION_ID))]
+        response = yield self.get()
+
+        self.assertTrue(response['success'])
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+
+        # latencies are recorded by a done callback
+        yield gen.moment
+        self.assertEquals(self.braspag.hedging_policy.latencies.count, 1)
+
+    @gen_test
+    def test_slow_response_is_hedged(self):
+        self.responses = [
+            (200, sale_payload(TRANSACTION_ID, status=1), 0.5),
+            (200, sale_payload(TRANSACTION_ID, status=2)),
+        ]
+        response = yield self.get()
+
+        self.assertEquals(response['transaction']['status'], 2)
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+        self.assertEquals(self.braspag.hedging_policy.hedge_wins, 1)
+
+    @gen_test
+    def test_failed_hedge_waits_for_first_request(self):
+        self.responses = [
+            (200, sale_payload(TRANSACTION_ID), 0.05),
+            (599, ''),
+        ]
+        response = yield self.get()
+
+        self.assertTrue(response['success'])
+        self.assertEquals(self.braspag.hedging_policy.hedge_wins, 0)
+
+    @gen_test
+    def test_both_requests_fail(self):
+        self.responses = [(599, '', 0.05), (599, '')]
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.get()
+
+    @gen_test
+    def test_hedge_rate_is_capped(self):
+        self.braspag.hedging_policy.budget.tokens = 0
+        self.responses = [(200, sale_payload(TRANSACTION_ID), 0.05)]
+        response = yield self.get()
+
+        self.assertTrue(response['success'])
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
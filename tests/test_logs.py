@@ -0,0 +1,123 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import json
+import logging
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from tornado.testing import gen_test
+from tornado.httpclient import HTTPRequest
+from tornado.httpclient import HTTPResponse
+
+from braspag_rest.logs import RequestLogger
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+PAYLOAD = {
+    'MerchantOrderId': '2015062401',
+    'Payment': {
+        'Type': 'CreditCard',
+        'Amount': 15700,
+        'CreditCard': {
+            'CardNumber': '4551870000000183',
+            'SecurityCode': 123,
+            'Holder': 'Jose da Silva',
+        }
+    }
+}
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    @property
+    def messages(self):
+        return [record.getMessage() for record in self.records]
+
+
+class RequestLoggerTest(TestCase):
+    def setUp(self):
+        self.handler = ListHandler()
+        self.logger = logging.getLogger('braspag.test_logs')
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.DEBUG)
+        self.request = HTTPRequest(
+            'https://api.braspag.com.br/v2/sales/', method='POST',
+            body=json.dumps(PAYLOAD)
+        )
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_redacts_card_data(self):
+        request_logger = RequestLogger(self.logger)
+        request_logger.log(self.request, error=HTTPTimeoutError(599))
+
+        message, = self.handler.messages
+        self.assertIn('POST https://api.braspag.com.br/v2/sales/', message)
+        self.assertIn('"CardNumber": "455187******0183"', message)
+        self.assertIn('"SecurityCode": "***"', message)
+        self.assertNotIn('4551870000000183', message)
+        self.assertEquals(self.handler.records[0].levelno, logging.WARNING)
+
+    def test_truncates_bodies(self):
+        request_logger = RequestLogger(self.logger, max_body_length=10)
+        self.assertEquals(
+            request_logger.format_body(b'{"Amount": 15700}'),
+            u'{"Amount":... (17 chars)'
+        )
+
+    def test_level_gated(self):
+        self.logger.setLevel(logging.INFO)
+        request_logger = RequestLogger(self.logger)
+        request_logger.format_body = None  # would fail if called
+
+        request_logger.log(self.request, HTTPResponse(self.request, 200))
+        self.assertEquals(self.handler.records, [])
+
+    def test_sampling(self):
+        request_logger = RequestLogger(
+            self.logger, sample_rate=0, error_sample_rate=1
+        )
+        request_logger.log(self.request, error=HTTPTimeoutError(599))
+        self.assertEquals(len(self.handler.records), 1)
+
+        request_logger.log(self.request, HTTPResponse(self.request, 200))
+        self.assertEquals(len(self.handler.records), 1)
+
+
+class FetchLoggingTest(BraspagTestCase):
+    def setUp(self):
+        super(FetchLoggingTest, self).setUp()
+        self.handler = ListHandler()
+        self.braspag.log.addHandler(self.handler)
+        self.braspag.log.setLevel(logging.DEBUG)
+        self.braspag.http_client = FakeHTTPClient(
+            lambda request: (201, {'Payment': PAYLOAD['Payment']})
+        )
+
+    def tearDown(self):
+        self.braspag.log.removeHandler(self.handler)
+        self.braspag.log.setLevel(logging.NOTSET)
+        super(FetchLoggingTest, self).tearDown()
+
+    @gen_test
+    def test_fetch_logs_redacted_exchange(self):
+        yield self.braspag.fetch(
+            'https://api.braspag.com.br/v2/sales/', 'POST', PAYLOAD
+        )
+
+        message, = self.handler.messages
+        self.assertIn('-> 201', message)
+        self.assertEquals(message.count('455187******0183'), 2)
+        self.assertNotIn('4551870000000183', message)
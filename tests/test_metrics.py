@@ -0,0 +1,113 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest import metrics
+from braspag_rest.metrics import CallbackMetricsSink
+from braspag_rest.metrics import Histogram
+from braspag_rest.metrics import InMemoryMetricsSink
+from braspag_rest.retry import RetryBudget
+from braspag_rest.retry import RetryPolicy
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+TAGS = {'endpoint': 'query', 'method': 'GET'}
+
+
+class HistogramTest(TestCase):
+    def test_snapshot(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.add(value)
+
+        snapshot = histogram.snapshot()
+        self.assertEquals(snapshot['count'], 100)
+        self.assertEquals(snapshot['mean'], 50.5)
+        self.assertEquals(snapshot['min'], 1)
+        self.assertEquals(snapshot['max'], 100)
+        self.assertEquals(snapshot['p50'], 51)
+        self.assertEquals(snapshot['p99'], 99)
+
+    def test_bounded_samples(self):
+        histogram = Histogram(max_samples=10)
+        for value in range(1000):
+            histogram.add(value)
+
+        self.assertEquals(len(histogram.samples), 10)
+        self.assertEquals(histogram.count, 1000)
+        self.assertEquals(histogram.max, 999)
+
+    def test_empty(self):
+        self.assertIsNone(Histogram().percentile(50))
+
+
+class SinkTest(TestCase):
+    def test_in_memory_sink(self):
+        sink = InMemoryMetricsSink()
+        sink.timing('request.time', 0.5, method='GET', endpoint='query')
+        sink.increment('request.retries', method='GET')
+        sink.increment('request.retries', method='GET')
+
+        snapshot = sink.snapshot()
+        self.assertEquals(
+            snapshot['timings']['request.time{endpoint=query,method=GET}']
+            ['p50'], 0.5
+        )
+        self.assertEquals(
+            snapshot['counters'], {'request.retries{method=GET}': 2}
+        )
+
+    def test_callback_sink(self):
+        recorded = []
+        sink = CallbackMetricsSink(lambda *args: recorded.append(args))
+        sink.timing('request.time', 0.5, method='GET')
+        sink.increment('request.retries')
+
+        self.assertEquals(recorded, [
+            ('timing', 'request.time', 0.5, {'method': 'GET'}),
+            ('counter', 'request.retries', 1, {}),
+        ])
+
+
+class ClientMetricsTest(BraspagTestCase):
+    def setUp(self):
+        super(ClientMetricsTest, self).setUp()
+        self.sink = InMemoryMetricsSink()
+        self.braspag.metrics = self.sink
+        self.braspag.retry_policy = RetryPolicy(
+            backoff=0.001, budget=RetryBudget()
+        )
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.timeouts = 1
+
+    def handle(self, request):
+        if self.timeouts:
+            self.timeouts -= 1
+            return 599, ''
+        return 200, sale_payload(TRANSACTION_ID)
+
+    @gen_test
+    def test_get_transaction_data_metrics(self):
+        yield self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+
+        self.assertEquals(self.sink.counter(metrics.TIMEOUTS, **TAGS), 1)
+        self.assertEquals(self.sink.counter(metrics.RETRIES, **TAGS), 1)
+        self.assertEquals(
+            self.sink.counter(metrics.RESPONSES, code=200, **TAGS), 1
+        )
+        self.assertEquals(
+            self.sink.histogram(metrics.REQUEST_TIME, **TAGS).count, 2
+        )
+        self.assertEquals(
+            self.sink.histogram(metrics.DECODE_TIME, **TAGS).count, 1
+        )
+        self.assertEquals(
+            self.sink.histogram(metrics.FORMAT_TIME, **TAGS).count, 1
+        )
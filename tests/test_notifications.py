@@ -0,0 +1,148 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import json
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado import gen
+from tornado.queues import Queue
+from tornado.testing import AsyncHTTPTestCase
+from tornado.testing import gen_test
+from tornado.web import Application
+
+from braspag_rest.notifications import NotificationHandler
+from braspag_rest.notifications import NotificationReceiver
+from braspag_rest.notifications import PAYMENT_STATUS_CHANGED
+from braspag_rest.notifications import ANTIFRAUD_STATUS_CHANGED
+from braspag_rest.cache import TransactionCache
+from braspag_rest.constants import PAYMENT_CONFIRMED
+from braspag_rest.constants import VOIDED
+
+
+PAYMENT_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf7548{0}'.format(i) for i in range(3)
+]
+
+
+class NotificationReceiverTest(BraspagTestCase):
+    def setUp(self):
+        super(NotificationReceiverTest, self).setUp()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.deliveries = []
+        self.receiver = NotificationReceiver(
+            self.braspag, callback=lambda *d: self.deliveries.append(d),
+            coalesce_delay=0.01
+        )
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        return 200, sale_payload(payment_id, PAYMENT_CONFIRMED), 0.01
+
+    @gen_test
+    def test_coalesce_bursts(self):
+        for _ in range(3):
+            self.receiver.receive(PAYMENT_IDS[0])
+        self.receiver.receive(PAYMENT_IDS[0], ANTIFRAUD_STATUS_CHANGED)
+        self.receiver.receive(PAYMENT_IDS[1])
+
+        yield gen.sleep(0.05)
+
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+        deliveries = dict((d[0], d) for d in self.deliveries)
+        self.assertEquals(
+            deliveries[PAYMENT_IDS[0]][1],
+            set([PAYMENT_STATUS_CHANGED, ANTIFRAUD_STATUS_CHANGED])
+        )
+        self.assertEquals(
+            deliveries[PAYMENT_IDS[1]][2]['transaction']['status'],
+            PAYMENT_CONFIRMED
+        )
+        self.assertEquals(self.receiver.stats(), {
+            'pending': 0,
+            'received': 5,
+            'coalesced': 3,
+            'delivered': 2,
+            'dropped': 0,
+        })
+
+    @gen_test
+    def test_bypasses_cache(self):
+        self.braspag.cache = TransactionCache()
+        response = yield self.braspag.get_transaction_data(
+            transaction_id=PAYMENT_IDS[0]
+        )
+        self.assertEquals(response['transaction']['status'],
+                          PAYMENT_CONFIRMED)
+
+        # the captured payment is voided, and Braspag notifies it
+        self.handle = lambda request: (200, sale_payload(PAYMENT_IDS[0],
+                                                         VOIDED))
+        self.braspag.http_client.handler = self.handle
+        self.receiver.receive(PAYMENT_IDS[0])
+        yield self.receiver.flush()
+
+        self.assertEquals(self.deliveries[0][2]['transaction']['status'],
+                          VOIDED)
+
+    @gen_test
+    def test_notification_while_fetching(self):
+        self.receiver.receive(PAYMENT_IDS[0])
+        yield gen.sleep(0.015)
+        self.receiver.receive(PAYMENT_IDS[0])
+
+        yield gen.sleep(0.06)
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+        self.assertEquals(len(self.deliveries), 2)
+
+    @gen_test
+    def test_queue_without_client(self):
+        queue = Queue(maxsize=1)
+        receiver = NotificationReceiver(queue=queue)
+        receiver.receive(PAYMENT_IDS[0])
+        receiver.receive(PAYMENT_IDS[1])
+        yield receiver.flush()
+
+        self.assertEquals(
+            queue.get_nowait(),
+            (PAYMENT_IDS[0], set([PAYMENT_STATUS_CHANGED]), None)
+        )
+        self.assertEquals(receiver.dropped, 1)
+
+
+class NotificationHandlerTest(AsyncHTTPTestCase):
+    def get_app(self):
+        self.receiver = NotificationReceiver(coalesce_delay=60)
+        # like most applications, which Braspag must still reach
+        return Application([
+            (r'/notifications', NotificationHandler,
+             {'receiver': self.receiver, 'token': 'secret'}),
+        ], xsrf_cookies=True)
+
+    def post(self, body, token='secret'):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return self.fetch('/notifications?token={0}'.format(token),
+                          method='POST', body=body)
+
+    def test_valid_notification(self):
+        response = self.post({'PaymentId': PAYMENT_IDS[0], 'ChangeType': 1})
+        self.assertEquals(response.code, 200)
+        self.assertEquals(self.receiver.stats()['pending'], 1)
+
+    def test_invalid_notifications(self):
+        self.assertEquals(self.post('not json').code, 400)
+        self.assertEquals(self.post({'ChangeType': 1}).code, 400)
+        self.assertEquals(self.post({'PaymentId': 'abc'}).code, 400)
+        self.assertEquals(
+            self.post({'PaymentId': PAYMENT_IDS[0], 'ChangeType': 'x'}).code,
+            400
+        )
+        self.assertEquals(self.receiver.received, 0)
+
+    def test_invalid_token(self):
+        response = self.post({'PaymentId': PAYMENT_IDS[0]}, token='wrong')
+        self.assertEquals(response.code, 403)
+        self.assertEquals(self.receiver.received, 0)
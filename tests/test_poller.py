@@ -0,0 +1,110 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado import gen
+from tornado.testing import gen_test
+
+from braspag_rest.poller import StatusPoller
+from braspag_rest.poller import WatchedTransaction
+from braspag_rest.constants import AUTHORIZED
+from braspag_rest.constants import PENDING
+from braspag_rest.constants import PAYMENT_CONFIRMED
+
+
+TRANSACTION_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf7548{0}'.format(i) for i in range(3)
+]
+
+
+class StatusPollerTest(BraspagTestCase):
+    def setUp(self):
+        super(StatusPollerTest, self).setUp()
+        self.statuses = {}
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.changes = []
+        self.poller = StatusPoller(
+            self.braspag, min_interval=0.01, max_interval=0.05,
+            callback=lambda *change: self.changes.append(change)
+        )
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        statuses = self.statuses[payment_id]
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        if status is None:
+            return 500, ''
+        return 200, sale_payload(payment_id, status)
+
+    def test_interval(self):
+        poller = StatusPoller(None, min_interval=5, max_interval=600,
+                              age_ratio=0.1, intervals={PENDING: 60})
+        watched = WatchedTransaction(TRANSACTION_IDS[0], AUTHORIZED, 0)
+
+        self.assertEquals(poller.interval(watched, 10), 5)
+        self.assertEquals(poller.interval(watched, 1000), 100)
+        self.assertEquals(poller.interval(watched, 100000), 600)
+
+        watched.status = PENDING
+        self.assertEquals(poller.interval(watched, 10), 60)
+
+    @gen_test
+    def test_poll_until_terminal(self):
+        self.statuses[TRANSACTION_IDS[0]] = [
+            AUTHORIZED, AUTHORIZED, PAYMENT_CONFIRMED
+        ]
+        self.statuses[TRANSACTION_IDS[1]] = [PAYMENT_CONFIRMED]
+        self.poller.watch(TRANSACTION_IDS[0], AUTHORIZED)
+        self.poller.watch(TRANSACTION_IDS[1])
+        self.poller.callback = None
+        self.poller.start()
+
+        changes = []
+        for _ in range(2):
+            transaction_id, response = yield self.poller.changes.get()
+            changes.append(
+                (transaction_id, response['transaction']['status'])
+            )
+        self.poller.stop()
+
+        self.assertEquals(sorted(changes), [
+            (TRANSACTION_IDS[0], PAYMENT_CONFIRMED),
+            (TRANSACTION_IDS[1], PAYMENT_CONFIRMED),
+        ])
+        self.assertEquals(len(self.changes), 0)
+        self.assertEquals(len(self.poller), 0)
+        self.assertEquals(self.poller.checks, 4)
+
+    @gen_test
+    def test_errors_are_retried(self):
+        self.statuses[TRANSACTION_IDS[0]] = [None, PENDING]
+        self.poller.watch(TRANSACTION_IDS[0], AUTHORIZED)
+
+        yield self.poller.poll()
+        self.assertEquals(self.poller.errors, 1)
+        self.assertIn(TRANSACTION_IDS[0], self.poller)
+
+        yield gen.sleep(0.02)
+        yield self.poller.poll()
+        self.assertEquals(self.changes[0][0], TRANSACTION_IDS[0])
+        self.assertEquals(self.poller.stats(), {
+            'watched': 1,
+            'checks': 2,
+            'errors': 1,
+            # changes handed to the callback are not queued too
+            'changes': 0,
+        })
+
+    @gen_test
+    def test_unwatch(self):
+        self.statuses[TRANSACTION_IDS[0]] = [PAYMENT_CONFIRMED]
+        self.poller.watch(TRANSACTION_IDS[0])
+        self.poller.watch(TRANSACTION_IDS[1], PAYMENT_CONFIRMED)
+        self.poller.unwatch(TRANSACTION_IDS[0])
+
+        yield self.poller.poll()
+        self.assertEquals(len(self.braspag.http_client.requests), 0)
+        self.assertEquals(len(self.poller), 0)
@@ -0,0 +1,75 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest import BraspagRequest
+from braspag_rest.pool import ConnectionPool
+from braspag_rest.metrics import InMemoryMetricsSink
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+TRANSACTION_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf7548{0}'.format(i) for i in range(4)
+]
+
+
+class ConnectionPoolTest(BraspagTestCase):
+    def setUp(self):
+        super(ConnectionPoolTest, self).setUp()
+        self.fake_client = FakeHTTPClient(self.handle)
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        return 200, sale_payload(payment_id), 0.02
+
+    def create_client(self, **kwargs):
+        pool = ConnectionPool(http_client=self.fake_client, **kwargs)
+        return BraspagRequest(homologation=True, pool=pool)
+
+    def test_timeouts(self):
+        braspag = BraspagRequest(request_timeout=3, connect_timeout=1)
+        request = braspag._get_request('http://localhost/', 'GET', None)
+
+        self.assertEquals(request.request_timeout, 3)
+        self.assertEquals(request.connect_timeout, 1)
+
+    @gen_test
+    def test_max_per_host(self):
+        sink = InMemoryMetricsSink()
+        braspag = self.create_client(max_per_host=1, metrics=sink)
+        yield braspag.get_transactions_data(TRANSACTION_IDS)
+
+        stats = braspag.pool.stats()
+        self.assertEquals(stats['requests'], 4)
+        self.assertEquals(stats['in_flight'], 0)
+        self.assertEquals(stats['queued'], 0)
+        self.assertGreaterEqual(stats['queue_wait_max'], 0.05)
+
+        histogram = sink.histogram(
+            'pool.queue_wait', host='apiqueryhomolog.braspag.com.br'
+        )
+        self.assertEquals(histogram.count, 4)
+        self.assertEquals(histogram.max, stats['queue_wait_max'])
+
+    @gen_test
+    def test_queue_timeout(self):
+        braspag = self.create_client(max_clients=1, queue_timeout=0.01)
+        results = yield braspag.get_transactions_data(TRANSACTION_IDS[:2])
+
+        errors = [r for r in results.values()
+                  if isinstance(r, HTTPTimeoutError)]
+        self.assertEquals(len(errors), 1)
+        self.assertEquals(len(self.fake_client.requests), 1)
+
+    @gen_test
+    def test_keep_alive_disabled(self):
+        braspag = self.create_client(keep_alive=False)
+        yield braspag.get_transaction_data(transaction_id=TRANSACTION_IDS[0])
+
+        request = self.fake_client.requests[0]
+        self.assertEquals(request.headers['Connection'], 'close')
@@ -0,0 +1,106 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from tornado import gen
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from braspag_rest.ratelimit import BULK
+from braspag_rest.ratelimit import INTERACTIVE
+from braspag_rest.ratelimit import RateLimiter
+from braspag_rest.exceptions import DeadlineExceededError
+from braspag_rest.exceptions import RateLimitExceededError
+from braspag_rest.deadline import Deadline
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class RateLimiterTest(AsyncTestCase):
+    @gen_test
+    def test_burst_then_queue(self):
+        limiter = RateLimiter(rate=100, burst=2)
+        yield limiter.acquire('merchant', 'query')
+        yield limiter.acquire('merchant', 'query')
+
+        waiting = limiter.acquire('merchant', 'query')
+        self.assertFalse(waiting.done())
+        yield waiting
+
+    @gen_test
+    def test_separate_buckets(self):
+        limiter = RateLimiter(rate=1, burst=1, max_wait=0.01,
+                              limits={'other': (1, 2)})
+        yield limiter.acquire('merchant', 'query')
+        yield limiter.acquire('merchant', 'transaction')
+        yield limiter.acquire('other', 'query')
+        yield limiter.acquire('other', 'query')
+
+        with self.assertRaises(RateLimitExceededError):
+            yield limiter.acquire('merchant', 'query')
+        self.assertEquals(limiter.rejected, 1)
+
+    @gen_test
+    def test_priority(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        yield limiter.acquire('merchant', 'query')
+
+        order = []
+
+        @gen.coroutine
+        def acquire(name, priority):
+            yield limiter.acquire('merchant', 'query', priority=priority)
+            order.append(name)
+
+        yield [
+            acquire('bulk 1', BULK),
+            acquire('bulk 2', BULK),
+            acquire('interactive', INTERACTIVE),
+        ]
+        self.assertEquals(order, ['interactive', 'bulk 1', 'bulk 2'])
+
+    @gen_test
+    def test_deadline(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        yield limiter.acquire('merchant', 'query')
+        with self.assertRaises(DeadlineExceededError):
+            yield limiter.acquire('merchant', 'query',
+                                  deadline=Deadline(0.01))
+        self.assertEquals(limiter.bucket('merchant', 'query').waiters, [])
+
+    def test_adapts_to_throttling(self):
+        limiter = RateLimiter(rate=10, min_rate=2, increase_step=1)
+        bucket = limiter.bucket('merchant', 'query')
+
+        limiter.record('merchant', 'query', 429)
+        self.assertEquals(bucket.rate, 5)
+        limiter.record('merchant', 'query', 429)
+        limiter.record('merchant', 'query', 429)
+        self.assertEquals(bucket.rate, 2)
+
+        for _ in range(20):
+            limiter.record('merchant', 'query', 200)
+        self.assertEquals(bucket.rate, 10)
+        self.assertEquals(limiter.throttled, 3)
+
+
+class ClientRateLimitTest(BraspagTestCase):
+    def setUp(self):
+        super(ClientRateLimitTest, self).setUp()
+        self.braspag.rate_limiter = RateLimiter(rate=1, burst=1)
+        self.braspag.http_client = FakeHTTPClient(
+            lambda request: (429, [])
+        )
+
+    @gen_test
+    def test_throttled_responses_lower_the_rate(self):
+        result = yield self.braspag.get_transactions_data([TRANSACTION_ID])
+
+        self.assertEquals(result[TRANSACTION_ID].code, 429)
+        bucket = self.braspag.rate_limiter.bucket(
+            self.braspag.merchant_id, 'query'
+        )
+        self.assertEquals(bucket.rate, 0.5)
@@ -0,0 +1,98 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from datetime import datetime
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from .test_formatters import PAYMENT
+from .test_formatters import random_payments
+from tornado.testing import gen_test
+
+from braspag_rest.core import BraspagResponse
+from braspag_rest.cache import TransactionCache
+from braspag_rest.records import SaleResult
+from braspag_rest.records import Transaction
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class TransactionRecordTest(TestCase):
+    def test_to_dict_is_identical(self):
+        payments = [PAYMENT] + list(random_payments(200))
+        records = BraspagResponse.format_transactions(payments, records=True)
+        expected = BraspagResponse.format_transactions(payments)
+
+        for record, data in zip(records, expected):
+            self.assertIsInstance(record, Transaction)
+            self.assertEquals(list(record.to_dict().items()),
+                              list(data.items()))
+            self.assertEquals(record, data)
+
+    def test_field_access(self):
+        record = BraspagResponse.format_transactions(
+            {'Status': 1, 'Amount': 100}, records=True
+        )[0]
+
+        self.assertEquals(record.amount, 100)
+        self.assertEquals(record['amount'], 100)
+        self.assertIsNone(record.voided_amount)
+        self.assertIsNone(record.get('voided_amount'))
+        self.assertNotIn('voided_amount', record)
+        self.assertIsNone(record.received_date)
+        with self.assertRaises(KeyError):
+            record['voided_amount']
+        with self.assertRaises(AttributeError):
+            record.unknown_field
+        with self.assertRaises(AttributeError):
+            record.__dict__
+
+    def test_received_date_is_lazy(self):
+        record = BraspagResponse.format_transactions(
+            {'Status': 1, 'ReceivedDate': '2015-06-24 10:52:51'}, records=True
+        )[0]
+
+        self.assertEquals(record._received_date_raw, '2015-06-24 10:52:51')
+        with self.assertRaises(AttributeError):
+            record._received_date
+        self.assertEquals(record.received_date,
+                          datetime(2015, 6, 24, 10, 52, 51))
+        self.assertIs(record._received_date, record.received_date)
+
+    def test_sale_result(self):
+        response = sale_payload(TRANSACTION_ID)
+        result = BraspagResponse.format_get_transaction_data(
+            response, records=True
+        )
+
+        self.assertIsInstance(result, SaleResult)
+        self.assertTrue(result.success)
+        self.assertEquals(result.transaction.braspag_transaction_id,
+                          TRANSACTION_ID)
+        self.assertEquals(
+            result.to_dict(),
+            BraspagResponse.format_get_transaction_data(response)
+        )
+
+
+class GetTransactionDataRecordsTest(BraspagTestCase):
+    def setUp(self):
+        super(GetTransactionDataRecordsTest, self).setUp()
+        self.braspag.records = True
+        self.braspag.cache = TransactionCache()
+        self.braspag.http_client = FakeHTTPClient(
+            lambda request: (200, sale_payload(TRANSACTION_ID, status=2))
+        )
+
+    @gen_test
+    def test_get_transaction_data(self):
+        result = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+        self.assertIsInstance(result, SaleResult)
+        self.assertEquals(result.transaction.status, 2)
+        self.assertEquals(len(self.braspag.cache), 1)
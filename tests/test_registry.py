@@ -0,0 +1,115 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado import gen
+from tornado.testing import gen_test
+
+from braspag_rest import MerchantRegistry
+from braspag_rest import TransactionCache
+from braspag_rest.pool import ConnectionPool
+
+
+TRANSACTION_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf7548{0}'.format(i) for i in range(6)
+]
+
+
+class ConcurrencyTrackingClient(FakeHTTPClient):
+    """Keeps the highest number of requests in flight for each merchant"""
+    def __init__(self, handler):
+        super(ConcurrencyTrackingClient, self).__init__(handler)
+        self.in_flight = {}
+        self.max_in_flight = {}
+
+    @gen.coroutine
+    def fetch(self, request, **kwargs):
+        merchant_id = request.headers['MerchantId']
+        self.in_flight[merchant_id] = self.in_flight.get(merchant_id, 0) + 1
+        self.max_in_flight[merchant_id] = max(
+            self.max_in_flight.get(merchant_id, 0),
+            self.in_flight[merchant_id]
+        )
+        try:
+            response = yield super(ConcurrencyTrackingClient, self).fetch(
+                request, **kwargs
+            )
+        finally:
+            self.in_flight[merchant_id] -= 1
+        raise gen.Return(response)
+
+
+class MerchantRegistryTest(BraspagTestCase):
+    def setUp(self):
+        super(MerchantRegistryTest, self).setUp()
+        self.fake_client = ConcurrencyTrackingClient(self.handle)
+        self.registry = MerchantRegistry(
+            ConnectionPool(http_client=self.fake_client), homologation=True
+        )
+
+    def handle(self, request):
+        payment_id = request.url.rsplit('/', 1)[-1]
+        return 200, sale_payload(payment_id), 0.01
+
+    def test_register(self):
+        first = self.registry.register('merchant-1', 'key-1')
+        second = self.registry.register('merchant-2', 'key-2')
+
+        self.assertEquals(len(self.registry), 2)
+        self.assertIn('merchant-1', self.registry)
+        self.assertIs(self.registry.get('merchant-1'), first)
+        self.assertIs(first.http_client, second.http_client)
+        self.assertIn('homolog', first.query_url)
+
+        self.registry.unregister('merchant-1')
+        self.assertNotIn('merchant-1', self.registry)
+        self.assertRaises(KeyError, self.registry.get, 'merchant-1')
+
+    def test_headers(self):
+        client = self.registry.register('merchant-1', 'key-1')
+
+        headers = client.headers('request-id')
+        self.assertEquals(headers['MerchantId'], 'merchant-1')
+        self.assertEquals(headers['MerchantKey'], 'key-1')
+        self.assertEquals(headers['RequestId'], 'request-id')
+        self.assertNotIn('RequestId', client._static_headers)
+
+        client.merchant_key = 'key-2'
+        self.assertEquals(client.headers(None)['MerchantKey'], 'key-2')
+
+    @gen_test
+    def test_max_concurrency_per_merchant(self):
+        self.registry.max_concurrency_per_merchant = 2
+        self.registry.register('merchant-1', 'key-1')
+        self.registry.register('merchant-2', 'key-2', max_concurrency=3)
+
+        yield [
+            self.registry.get('merchant-1').get_transactions_data(
+                TRANSACTION_IDS
+            ),
+            self.registry.get('merchant-2').get_transactions_data(
+                TRANSACTION_IDS
+            ),
+        ]
+
+        self.assertEquals(len(self.fake_client.requests), 12)
+        self.assertEquals(self.fake_client.max_in_flight['merchant-1'], 2)
+        self.assertEquals(self.fake_client.max_in_flight['merchant-2'], 3)
+
+    @gen_test
+    def test_shared_cache(self):
+        cache = TransactionCache(pending_ttl=60)
+        self.registry.client_options['cache'] = cache
+        self.registry.register('merchant-1', 'key-1')
+        self.registry.register('merchant-2', 'key-2')
+
+        for merchant_id in ('merchant-1', 'merchant-2'):
+            yield self.registry.get(merchant_id).get_transaction_data(
+                transaction_id=TRANSACTION_IDS[0]
+            )
+
+        self.assertEquals(len(self.fake_client.requests), 2)
+        self.assertEquals(cache.stats()['size'], 2)
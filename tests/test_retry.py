@@ -0,0 +1,125 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import socket
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+from tornado.httpclient import HTTPError
+
+from braspag_rest.retry import RetryBudget
+from braspag_rest.retry import RetryPolicy
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+REQUEST_ID = u'782a56e2-2dae-11e2-b3ee-080027d29772'
+
+
+class RetryPolicyTest(TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(budget=RetryBudget())
+
+    def test_retryable_errors(self):
+        self.assertTrue(self.policy.is_retryable(HTTPTimeoutError(599)))
+        self.assertTrue(self.policy.is_retryable(HTTPError(503)))
+        self.assertTrue(self.policy.is_retryable(socket.error()))
+        self.assertFalse(self.policy.is_retryable(HTTPError(404)))
+        self.assertFalse(self.policy.is_retryable(ValueError()))
+
+    def test_writes_need_a_request_id(self):
+        error = HTTPError(503)
+        self.assertTrue(self.policy.should_retry(error, 1, 'GET'))
+        self.assertFalse(self.policy.should_retry(error, 1, 'PUT'))
+        self.assertTrue(
+            self.policy.should_retry(error, 1, 'PUT', request_id=REQUEST_ID)
+        )
+
+    def test_max_attempts(self):
+        error = HTTPError(503)
+        self.assertTrue(self.policy.should_retry(error, 2, 'GET'))
+        self.assertFalse(self.policy.should_retry(error, 3, 'GET'))
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=0.1, max_backoff=0.3, jitter=False)
+        self.assertEquals(
+            [policy.delay(attempt) for attempt in range(2, 6)],
+            [0.1, 0.2, 0.3, 0.3]
+        )
+
+        policy.jitter = True
+        for _ in range(20):
+            self.assertTrue(0 <= policy.delay(3) <= 0.2)
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=1)
+        policy = RetryPolicy(budget=budget)
+        error = HTTPError(503)
+
+        self.assertTrue(policy.should_retry(error, 1, 'GET'))
+        self.assertFalse(policy.should_retry(error, 1, 'GET'))
+        self.assertEquals(policy.budget_exhausted, 1)
+
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(policy.should_retry(error, 1, 'GET'))
+
+
+class FetchRetryTest(BraspagTestCase):
+    def setUp(self):
+        super(FetchRetryTest, self).setUp()
+        self.braspag.retry_policy = RetryPolicy(
+            backoff=0.001, budget=RetryBudget()
+        )
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+        self.failures = 0
+
+    def handle(self, request):
+        if self.failures:
+            self.failures -= 1
+            return 599, ''
+        return 200, sale_payload(TRANSACTION_ID)
+
+    @gen_test
+    def test_transient_timeout_is_retried(self):
+        self.failures = 2
+        response = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+
+        self.assertTrue(response['success'])
+        self.assertEquals(len(self.braspag.http_client.requests), 3)
+        self.assertEquals(self.braspag.retry_policy.retries, 2)
+
+    @gen_test
+    def test_gives_up_after_max_attempts(self):
+        self.failures = 3
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.braspag.get_transaction_data(
+                transaction_id=TRANSACTION_ID
+            )
+        self.assertEquals(len(self.braspag.http_client.requests), 3)
+
+    @gen_test
+    def test_writes_are_not_retried_without_request_id(self):
+        self.failures = 1
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.braspag.fetch('https://localhost/', 'PUT', {})
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+
+    @gen_test
+    def test_writes_reuse_request_id(self):
+        self.failures = 1
+        yield self.braspag.fetch(
+            'https://localhost/', 'PUT', {}, request_id=REQUEST_ID
+        )
+
+        requests = self.braspag.http_client.requests
+        self.assertEquals(len(requests), 2)
+        for request in requests:
+            self.assertEquals(request.headers['RequestId'], REQUEST_ID)
@@ -0,0 +1,169 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import unittest
+
+from datetime import date
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from tornado.testing import gen_test
+
+from braspag_rest import ASYNCIO
+from braspag_rest.records import Transaction
+from braspag_rest.exceptions import BraspagException
+from braspag_rest.exceptions import HTTPTimeoutError
+
+if ASYNCIO:
+    from braspag_rest.aio import AsyncioBraspagRequest
+
+
+PAYMENT_IDS = [
+    u'abec4ae4-3315-45af-9111-ac1eecf754{0:02d}'.format(i) for i in range(25)
+]
+
+
+def payment(payment_id):
+    return {'PaymentId': payment_id, 'ReceivedDate': '2015-06-24 10:52:51'}
+
+
+class SalesSearchTest(BraspagTestCase):
+    def setUp(self):
+        super(SalesSearchTest, self).setUp()
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+
+    def handle(self, request):
+        query = dict(
+            part.split('=') for part in request.url.split('?')[1].split('&')
+        )
+        if query.get('merchantOrderId') == 'invalid':
+            return 400, [{'Code': 101, 'Message': 'Invalid order'}]
+        if 'merchantOrderId' in query:
+            return 200, {'Payments': [payment(PAYMENT_IDS[0])]}
+
+        size = int(query['pageSize'])
+        start = (int(query['pageIndex']) - 1) * size
+        payments = [payment(p) for p in PAYMENT_IDS[start:start + size]]
+        return 200, {'Payments': payments}
+
+    @gen_test
+    def test_find_sales_by_order_id(self):
+        cursor = self.braspag.find_sales_by_order_id('2015062401')
+        sales = []
+        while (yield cursor.fetch_next):
+            sales.append(cursor.next_object())
+
+        self.assertEquals(len(sales), 1)
+        self.assertEquals(sales[0]['braspag_transaction_id'], PAYMENT_IDS[0])
+        self.assertFalse(cursor.alive)
+        self.assertEquals(
+            self.braspag.http_client.requests[0].url,
+            'https://apiqueryhomolog.braspag.com.br/v2/sales'
+            '?merchantOrderId=2015062401'
+        )
+
+    @gen_test
+    def test_find_sales_pages(self):
+        cursor = self.braspag.find_sales(
+            date(2015, 6, 1), '2015-06-30', page_size=10
+        )
+
+        first = yield cursor.to_list(5)
+        # the second page is prefetched while the first is consumed
+        self.assertEquals(len(self.braspag.http_client.requests), 2)
+        self.assertIn('initialDate=2015-06-01',
+                      self.braspag.http_client.requests[0].url)
+
+        rest = yield cursor.to_list()
+        self.assertEquals(
+            [sale['braspag_transaction_id'] for sale in first + rest],
+            PAYMENT_IDS
+        )
+        self.assertEquals(cursor.pages, 3)
+
+    @gen_test
+    def test_records(self):
+        self.braspag.records = True
+        cursor = self.braspag.find_sales_by_order_id('2015062401')
+        sales = yield cursor.to_list()
+        self.assertIsInstance(sales[0], Transaction)
+
+    @gen_test
+    def test_errors(self):
+        cursor = self.braspag.find_sales_by_order_id('invalid')
+        with self.assertRaises(BraspagException):
+            yield cursor.fetch_next
+
+    @gen_test
+    def test_retry_failed_page(self):
+        handle = self.handle
+        failures = [599]
+
+        def flaky(request):
+            if 'pageIndex=2' in request.url and failures:
+                return failures.pop(), ''
+            return handle(request)
+        self.braspag.http_client.handler = flaky
+
+        cursor = self.braspag.find_sales('2015-06-01', '2015-06-30',
+                                         page_size=10)
+        first = yield cursor.to_list(10)
+        with self.assertRaises(HTTPTimeoutError):
+            yield cursor.to_list()
+
+        # the failed page is asked for again, not skipped
+        rest = yield cursor.to_list()
+        self.assertEquals(
+            [sale['braspag_transaction_id'] for sale in first + rest],
+            PAYMENT_IDS
+        )
+
+    @gen_test
+    def test_stream(self):
+        cursor = self.braspag.find_sales(
+            '2015-06-01', '2015-06-30', page_size=10, stream=True
+        )
+        sales = yield cursor.to_list()
+        self.assertEquals(
+            [sale['braspag_transaction_id'] for sale in sales], PAYMENT_IDS
+        )
+        request = self.braspag.http_client.requests[0]
+        self.assertIsNotNone(request.streaming_callback)
+        self.assertEquals(request.headers['Accept-Encoding'], 'gzip')
+
+    @gen_test
+    def test_stream_errors(self):
+        cursor = self.braspag.find_sales_by_order_id('invalid', stream=True)
+        with self.assertRaises(BraspagException) as context:
+            yield cursor.fetch_next
+        # the streamed error body is kept for the exception
+        self.assertIn(b'Invalid order', context.exception.response.body)
+
+    @unittest.skipIf(not ASYNCIO, 'requires python 3.5+ and tornado 5+')
+    @gen_test
+    def test_async_iterator(self):
+        braspag = AsyncioBraspagRequest(homologation=True)
+        braspag.http_client = self.braspag.http_client
+        cursor = braspag.find_sales('2015-06-01', '2015-06-30', page_size=7)
+
+        sales = []
+        iterator = cursor.__aiter__()
+        while True:
+            try:
+                sale = yield iterator.__anext__()
+            except StopAsyncIteration:  # noqa: F821
+                break
+            sales.append(sale['braspag_transaction_id'])
+        self.assertEquals(sales, PAYMENT_IDS)
+
+    @unittest.skipIf(not ASYNCIO, 'requires python 3.5+ and tornado 5+')
+    @gen_test
+    def test_async_stream(self):
+        braspag = AsyncioBraspagRequest(homologation=True)
+        braspag.http_client = self.braspag.http_client
+        cursor = braspag.find_sales(
+            '2015-06-01', '2015-06-30', page_size=10, stream=True
+        )
+        sales = yield cursor.to_list()
+        self.assertEquals(len(sales), len(PAYMENT_IDS))
@@ -0,0 +1,133 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import random
+
+from unittest import TestCase
+
+from tornado import gen
+from tornado.httpclient import HTTPError
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from braspag_rest.simulator import BraspagSimulator
+from braspag_rest.simulator import Throttle
+from braspag_rest.simulator import create_client
+from braspag_rest.simulator import parse_latency
+from braspag_rest.constants import AUTHORIZED
+from braspag_rest.constants import PAYMENT_CONFIRMED
+from braspag_rest.exceptions import HTTPTimeoutError
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LatencyTest(TestCase):
+    def test_parse_latency(self):
+        rnd = random.Random(42)
+        self.assertEquals(parse_latency('constant:0.05')(rnd), 0.05)
+
+        latency = parse_latency('uniform:0.01:0.02')
+        self.assertTrue(0.01 <= latency(rnd) <= 0.02)
+
+        latency = parse_latency('lognormal:0.05:2:0.1')
+        samples = [latency(rnd) for _ in range(1000)]
+        self.assertEquals(max(samples), 0.1)
+
+        self.assertRaises(ValueError, parse_latency, 'gaussian:1')
+
+    def test_throttle(self):
+        clock = Clock()
+        throttle = Throttle(2, clock=clock)
+        self.assertEquals([throttle.allow('a') for _ in range(3)],
+                          [True, True, False])
+        self.assertTrue(throttle.allow('b'))
+
+        clock.now += 0.5
+        self.assertTrue(throttle.allow('a'))
+        self.assertFalse(throttle.allow('a'))
+
+
+class BraspagSimulatorTest(AsyncTestCase):
+    def setUp(self):
+        super(BraspagSimulatorTest, self).setUp()
+        self.simulators = []
+
+    def tearDown(self):
+        for simulator in self.simulators:
+            simulator.stop()
+        super(BraspagSimulatorTest, self).tearDown()
+
+    def create_client(self, **kwargs):
+        self.simulator = BraspagSimulator(**kwargs)
+        self.simulators.append(self.simulator)
+        port = self.simulator.listen(0)
+        return create_client(port, request_timeout=0.2)
+
+    @gen_test
+    def test_get_transaction_data(self):
+        braspag = self.create_client(statuses={PAYMENT_CONFIRMED: 1})
+        response = yield braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+
+        self.assertTrue(response['success'])
+        self.assertEquals(response['transaction']['braspag_transaction_id'],
+                          TRANSACTION_ID)
+        self.assertEquals(response['transaction']['status'],
+                          PAYMENT_CONFIRMED)
+        self.assertEquals(self.simulator.responses, {200: 1})
+
+    @gen_test
+    def test_sales_are_kept(self):
+        braspag = self.create_client()
+        sale = self.simulator.create_sale({
+            'MerchantOrderId': '2015062401',
+            'Payment': {'Amount': 100, 'CreditCard': {
+                'CardNumber': '4551870000000183', 'SecurityCode': '123'
+            }},
+        })
+        payment_id = sale['Payment']['PaymentId']
+        self.assertEquals(sale['Payment']['Status'], AUTHORIZED)
+
+        self.simulator.update_sale(payment_id, 'capture')
+        response = yield braspag.get_transaction_data(
+            transaction_id=payment_id
+        )
+        self.assertEquals(response['order_id'], '2015062401')
+        self.assertEquals(response['transaction']['status'],
+                          PAYMENT_CONFIRMED)
+        self.assertEquals(
+            response['transaction']['masked_credit_card_number'],
+            '455187******0183'
+        )
+
+    @gen_test
+    def test_faults(self):
+        braspag = self.create_client(error_rate=1)
+        with self.assertRaises(HTTPError) as context:
+            yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        self.assertEquals(context.exception.code, 500)
+
+        braspag = self.create_client(timeout_rate=1, hang=0.3)
+        with self.assertRaises(HTTPTimeoutError):
+            yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        # let the hanging request finish
+        yield gen.sleep(0.15)
+
+    @gen_test
+    def test_throttling(self):
+        braspag = self.create_client(throttle=1)
+        yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        with self.assertRaises(HTTPError) as context:
+            yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        self.assertEquals(context.exception.code, 429)
@@ -0,0 +1,168 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+
+from unittest import TestCase
+
+from .base import BraspagTestCase
+from .base import FakeHTTPClient
+from .base import sale_payload
+from tornado.testing import gen_test
+
+from braspag_rest.cache import TransactionCache
+from braspag_rest.store import TransactionStore
+from braspag_rest.records import SaleResult
+from braspag_rest.constants import AUTHORIZED
+from braspag_rest.constants import PAYMENT_CONFIRMED
+
+
+TRANSACTION_ID = u'abec4ae4-3315-45af-9111-ac1eecf7548b'
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StoreTestMixin(object):
+    def create_store(self, **kwargs):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'transactions.db')
+        store = TransactionStore(self.path, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+
+class TransactionStoreTest(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.store = self.create_store(clock=self.clock)
+
+    def test_terminal_transactions_are_stored(self):
+        payload = sale_payload(TRANSACTION_ID, PAYMENT_CONFIRMED)
+        self.store.set('merchant', TRANSACTION_ID, payload)
+
+        self.assertEquals(self.store.get('merchant', TRANSACTION_ID), payload)
+        self.assertIsNone(self.store.get('other', TRANSACTION_ID))
+
+    def test_pending_transactions_are_not_stored(self):
+        self.store.set('merchant', TRANSACTION_ID,
+                       sale_payload(TRANSACTION_ID, AUTHORIZED))
+        self.assertEquals(len(self.store), 0)
+
+    def test_pending_ttl(self):
+        store = self.create_store(pending_ttl=5, clock=self.clock)
+        store.set('merchant', TRANSACTION_ID,
+                  sale_payload(TRANSACTION_ID, AUTHORIZED))
+        self.assertIsNotNone(store.get('merchant', TRANSACTION_ID))
+
+        self.clock.now += 10
+        self.assertIsNone(store.get('merchant', TRANSACTION_ID))
+        self.assertEquals(store.compact(), 1)
+        self.assertEquals(len(store), 0)
+
+    def test_shared_between_connections(self):
+        payload = sale_payload(TRANSACTION_ID, PAYMENT_CONFIRMED)
+        self.store.set('merchant', TRANSACTION_ID, payload)
+
+        other = TransactionStore(self.path, clock=self.clock)
+        self.addCleanup(other.close)
+        self.assertEquals(other.get('merchant', TRANSACTION_ID), payload)
+
+        other.invalidate('merchant', TRANSACTION_ID)
+        self.assertIsNone(self.store.get('merchant', TRANSACTION_ID))
+
+    def test_size_bound(self):
+        store = self.create_store(max_size=3, check_every=2, clock=self.clock)
+        for i in range(6):
+            self.clock.now += 1
+            store.set('merchant', str(i),
+                      sale_payload(str(i), PAYMENT_CONFIRMED))
+
+        self.assertEquals(len(store), 3)
+        self.assertIsNone(store.get('merchant', '0'))
+        self.assertIsNotNone(store.get('merchant', '5'))
+        self.assertEquals(store.stats(), {
+            'size': 3,
+            'hits': 1,
+            'misses': 1,
+            'writes': 6,
+            'evictions': 3,
+            'errors': 0,
+        })
+
+    def test_terminal_ttl(self):
+        # captured payments may still be voided, so they expire too
+        self.store.set('merchant', TRANSACTION_ID,
+                       sale_payload(TRANSACTION_ID, PAYMENT_CONFIRMED))
+        self.clock.now += 3601
+        self.assertIsNone(self.store.get('merchant', TRANSACTION_ID))
+
+    def test_locked_database(self):
+        payload = sale_payload(TRANSACTION_ID, PAYMENT_CONFIRMED)
+        self.store.set('merchant', TRANSACTION_ID, payload)
+
+        # another worker process holding the write lock
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        self.addCleanup(other.execute, 'ROLLBACK')
+
+        start = time.time()
+        self.store.set('merchant', 'other', payload)
+        self.store.invalidate('merchant', TRANSACTION_ID)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEquals(self.store.errors, 2)
+
+        # WAL readers are not blocked
+        self.assertEquals(self.store.get('merchant', TRANSACTION_ID), payload)
+
+
+class GetTransactionDataStoreTest(StoreTestMixin, BraspagTestCase):
+    def setUp(self):
+        super(GetTransactionDataStoreTest, self).setUp()
+        self.store = self.create_store()
+        self.braspag.store = self.store
+        self.braspag.http_client = FakeHTTPClient(self.handle)
+
+    def handle(self, request):
+        return 200, sale_payload(TRANSACTION_ID, PAYMENT_CONFIRMED)
+
+    @gen_test
+    def test_served_from_store(self):
+        first = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+        second = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+        self.assertEquals(first, second)
+        self.assertEquals(second['transaction']['status'], PAYMENT_CONFIRMED)
+
+    @gen_test
+    def test_store_fills_cache(self):
+        yield self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+
+        self.braspag.cache = TransactionCache()
+        self.braspag.records = True
+        response = yield self.braspag.get_transaction_data(
+            transaction_id=TRANSACTION_ID
+        )
+        yield self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+
+        self.assertIsInstance(response, SaleResult)
+        self.assertEquals(len(self.braspag.http_client.requests), 1)
+        self.assertEquals(self.store.hits, 1)
+        self.assertEquals(self.braspag.cache.hits, 1)
@@ -0,0 +1,118 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import json
+
+from unittest import TestCase
+
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from braspag_rest.stream import JSONArrayParser
+from braspag_rest.simulator import BraspagSimulator
+from braspag_rest.simulator import create_client
+
+
+class JSONArrayParserTest(TestCase):
+    def setUp(self):
+        self.document = {
+            'Payments': [
+                {'PaymentId': str(i), 'Tricky': u'"]}{,\\ Jo\xe3o',
+                 'Nested': [i, {'Payments': []}]}
+                for i in range(30)
+            ],
+            'Links': [{'Method': 'GET'}],
+            'Name': 'Payments',
+        }
+        self.body = json.dumps(self.document).encode('utf-8')
+
+    def parse(self, chunk_size, **kwargs):
+        parser = JSONArrayParser('Payments', **kwargs)
+        for start in range(0, len(self.body), chunk_size):
+            parser.feed(self.body[start:start + chunk_size])
+        return parser
+
+    def test_chunks(self):
+        for chunk_size in (1, 2, 5, 64, len(self.body)):
+            parser = self.parse(chunk_size)
+            self.assertEquals(parser.close(), self.document)
+
+    def test_callback(self):
+        received = []
+
+        def callback(payment):
+            received.append(payment['PaymentId'])
+            return payment['PaymentId']
+
+        parser = self.parse(3, callback=callback)
+        # elements are handed over before the body ends
+        self.assertEquals(len(received), 30)
+        self.assertEquals(parser.items, received)
+        self.assertEquals(parser.close()['Payments'], received)
+        # only what is not in the array is left as the body
+        self.assertNotIn(b'PaymentId', parser.body)
+
+    def test_no_array(self):
+        parser = JSONArrayParser('Payments')
+        parser.feed(b'[{"Code": 101, "Message": "Invalid"}]')
+        self.assertEquals(parser.close(), [{'Code': 101,
+                                            'Message': 'Invalid'}])
+
+        parser = JSONArrayParser('Payments')
+        parser.feed(b'{"Payments": [ ]}')
+        self.assertEquals(parser.close(), {'Payments': []})
+
+    def test_scalars(self):
+        body = b'{"Payments": [1, 23, 4.5e3, -0.25, "a\\\\", true, null]}'
+        for chunk_size in (1, 2, 3):
+            parser = JSONArrayParser('Payments')
+            for start in range(0, len(body), chunk_size):
+                parser.feed(body[start:start + chunk_size])
+            self.assertEquals(parser.close()['Payments'],
+                              [1, 23, 4500.0, -0.25, u'a\\', True, None])
+
+    def test_incomplete(self):
+        parser = JSONArrayParser('Payments')
+        parser.feed(self.body[:-20])
+        self.assertRaises(ValueError, parser.close)
+
+
+class CompressedTransferTest(AsyncTestCase):
+    def setUp(self):
+        super(CompressedTransferTest, self).setUp()
+        self.simulator = BraspagSimulator()
+        self.braspag = create_client(self.simulator.listen(0))
+        for i in range(40):
+            self.simulator.create_sale({
+                'MerchantOrderId': str(i % 2),
+                'Payment': {'Amount': 100 + i},
+            })
+
+    def tearDown(self):
+        self.simulator.stop()
+        super(CompressedTransferTest, self).tearDown()
+
+    @gen_test
+    def test_gzip(self):
+        url = self.braspag.query_url + '/v2/sales?merchantOrderId=1'
+        response = yield self.braspag.fetch(url, 'GET', None, query=True)
+        self.assertEquals(response.headers['X-Consumed-Content-Encoding'],
+                          'gzip')
+        self.assertEquals(len(json.loads(response.body)['Payments']), 20)
+
+        self.braspag.compress = False
+        response = yield self.braspag.fetch(url, 'GET', None, query=True)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Accept-Encoding', response.request.headers)
+
+    @gen_test
+    def test_stream(self):
+        cursor = self.braspag.find_sales(
+            '2015-06-01', '2015-06-30', page_size=15, stream=True
+        )
+        sales = yield cursor.to_list()
+        self.assertEquals(
+            sorted(sale['amount'] for sale in sales), list(range(100, 140))
+        )
+        self.assertEquals(cursor.pages, 3)